@@ -0,0 +1,506 @@
+"""
+Parser benchmark suite.
+
+Generates synthetic gem5 stats.txt files (core count, memory controllers, dump
+blocks and size from about 1 MB to several GB are configurable) and measures,
+for each file:
+
+- the original two-pass regex parser (find_active_cpu + extract_cpu_statistics
+  as they were before the single-pass engine), unless --skip-legacy is given,
+- stat_parser.parse_stats_file in each scan mode,
+- the end-to-end time of main.py for each category.
+
+Parsers report seconds, lines/sec, MB/sec and peak RSS; each one runs in a fresh
+process so the peak memory is its own. Results can be stored as JSON and compared
+with an earlier run, e.g. before and after a commit.
+
+Usage:
+    python3 benchmark.py [FILE ...] [--size 1MB,100MB,1GB] [--cpus N] [--mem-ctrls N] [--dumps N]
+                         [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import stat_parser
+
+
+def legacy_find_active_cpu(file_path):
+    cpu_data = {}
+    pattern_cycles = re.compile(r'system\.clusters\.(cpu\d+)\.numCycles\s+(\d+)')
+    pattern_insts_committed = re.compile(r'system\.clusters\.(cpu\d+)\.committedInsts\s+(\d+)')
+
+    with open(file_path, 'r') as file:
+        for line in file:
+            if match := pattern_cycles.search(line):
+                cpu_data.setdefault(match.group(1), {'cycles': 0, 'committedInsts': 0})['cycles'] = int(match.group(2))
+            if match := pattern_insts_committed.search(line):
+                cpu_data.setdefault(match.group(1), {'cycles': 0, 'committedInsts': 0})['committedInsts'] = int(
+                    match.group(2))
+
+    return max(cpu_data, key=lambda x: (cpu_data[x]['cycles'], cpu_data[x]['committedInsts']))
+
+
+def legacy_extract_cpu_statistics(file_path, active_cpu):
+    cpu = rf'system\.clusters\.{active_cpu}\.'
+    scalar_patterns = [
+        ('numCycles', int, re.compile(cpu + r'numCycles\s+(\d+)')),
+        ('instsIssued', int, re.compile(cpu + r'instsIssued\s+(\d+)')),
+        ('committedInsts', int, re.compile(cpu + r'committedInsts\s+(\d+)')),
+        ('cpi', float, re.compile(cpu + r'cpi\s+([\d\.]+)')),
+        ('ipc', float, re.compile(cpu + r'ipc\s+([\d\.]+)')),
+        ('lsq_forw_loads', int, re.compile(cpu + r'lsq\d+\.forwLoads\s+(\d+)')),
+        ('lsq_squashed_loads', int, re.compile(cpu + r'lsq\d+\.squashedLoads\s+(\d+)')),
+        ('lsq_squashed_stores', int, re.compile(cpu + r'lsq\d+\.squashedStores\s+(\d+)')),
+        ('lsq_ignored_responses', int, re.compile(cpu + r'lsq\d+\.ignoredResponses\s+(\d+)')),
+        ('lsq_mem_order_violations', int, re.compile(cpu + r'lsq\d+\.memOrderViolation\s+(\d+)')),
+        ('lsq_rescheduled_loads', int, re.compile(cpu + r'lsq\d+\.rescheduledLoads\s+(\d+)')),
+        ('lsq_blocked_by_cache', int, re.compile(cpu + r'lsq\d+\.blockedByCache\s+(\d+)')),
+        ('cache_hits', int, re.compile(cpu + r'dcache\.overallHits::total\s+(\d+)')),
+        ('cache_misses', int, re.compile(cpu + r'dcache\.overallMisses::total\s+(\d+)')),
+        ('cache_miss_rate', float, re.compile(cpu + r'dcache\.overallMissRate::total\s+([\d\.]+)')),
+        ('cache_miss_latency', float, re.compile(cpu + r'dcache\.overallAvgMissLatency::total\s+([\d\.]+)')),
+        ('btb_lookups', int, re.compile(cpu + r'branchPred\.BTBLookups\s+(\d+)')),
+        ('btb_hits', int, re.compile(cpu + r'branchPred\.BTBHits\s+(\d+)')),
+        ('btb_hit_ratio', float, re.compile(cpu + r'branchPred\.BTBHitRatio\s+([\d\.]+)')),
+    ]
+    pattern_fu_busy = re.compile(cpu + r'statFuBusy::(\w+)\s+(\d+)\s+([\d\.]+)%')
+    pattern_mem_dep_unit = re.compile(cpu + r'MemDepUnit__(\d+)\.(\w+)\s+(\d+)')
+    mem_patterns = [
+        ('bw_read', int, re.compile(r'system\.mem_ctrls(\d+)\.dram\.bwRead::total\s+(\d+)')),
+        ('bw_write', int, re.compile(r'system\.mem_ctrls(\d+)\.dram\.bwWrite::total\s+(\d+)')),
+        ('read_bursts', int, re.compile(r'system\.mem_ctrls(\d+)\.dram\.readBursts\s+(\d+)')),
+        ('write_bursts', int, re.compile(r'system\.mem_ctrls(\d+)\.dram\.writeBursts\s+(\d+)')),
+        ('queue_latency', float, re.compile(r'system\.mem_ctrls(\d+)\.dram\.avgQueueLatency\s+([\d\.]+)')),
+        ('accesses', int, re.compile(r'system\.mem_ctrls(\d+)\.dram\.accesses::total\s+(\d+)')),
+    ]
+
+    stats = {}
+    mem_ctrl_data = {}
+    with open(file_path, 'r') as file:
+        for line in file:
+            for key, convert, pattern in scalar_patterns:
+                if match := pattern.search(line):
+                    stats[key] = convert(match.group(1))
+            if match := pattern_fu_busy.search(line):
+                stats.setdefault('FU_Busy', {})[match.group(1)] = {'count': int(match.group(2)),
+                                                                  'rate': float(match.group(3))}
+            if match := pattern_mem_dep_unit.search(line):
+                stats.setdefault('MemDepUnit', {}).setdefault(match.group(1), {})[match.group(2)] = int(
+                    match.group(3))
+            for key, convert, pattern in mem_patterns:
+                if match := pattern.search(line):
+                    mem_ctrl_data.setdefault(match.group(1), {})[key] = convert(match.group(2))
+
+    return stat_parser.build_cpu_statistics({active_cpu: stats}, mem_ctrl_data, active_cpu)
+
+
+LSQ_STATS = ["forwLoads", "squashedLoads", "squashedStores", "ignoredResponses", "memOrderViolation",
+             "rescheduledLoads", "blockedByCache"]
+FU_TYPES = ["No_OpClass", "IntAlu", "IntMult", "IntDiv", "FloatAdd", "MemRead", "MemWrite"]
+
+# Lines handed to one write() call while generating
+WRITE_BATCH = 8192
+
+
+def stat_line(name, value, desc="Synthetic statistic"):
+    return f"{name:<60} {value:>20} # {desc}\n"
+
+
+def distribution_lines(name, counts, bucket_size=None, desc="Synthetic distribution"):
+    """
+    Lines of a gem5 vector (bucket_size None: one line per index) or distribution
+    (summary lines, then bucket_size-wide buckets) over the given bucket counts.
+    """
+    samples = sum(counts)
+    lines = []
+    if bucket_size is not None:
+        mean = sum((index + 0.5) * bucket_size * count for index, count in enumerate(counts)) / samples if samples \
+            else float('nan')
+        lines += [stat_line(f"{name}::samples", samples, desc), stat_line(f"{name}::mean", f"{mean:.6f}", desc)]
+    cumulative = 0
+    for index, count in enumerate(counts):
+        cumulative += count
+        label = str(index) if bucket_size is None else f"{index * bucket_size}-{(index + 1) * bucket_size - 1}"
+        share = count / samples * 100 if samples else 0.0
+        lines.append(f"{name + '::' + label:<60} {count:>20} {share:>11.2f}% "
+                     f"{cumulative / samples * 100 if samples else 0.0:>11.2f}% # {desc}\n")
+    lines.append(stat_line(f"{name}::total", samples, desc))
+    return lines
+
+
+def skewed_counts(rng, buckets, scale):
+    """
+    Bucket counts falling off geometrically, like most latency and queue-length histograms.
+    """
+    return [int(rng.randint(0, 10 ** 4) * scale * 0.6 ** index) for index in range(buckets)]
+
+
+def dump_block_lines(rng, dump_index, num_cpus, num_mem_ctrls):
+    """
+    Header and tracked stats of one synthetic dump block. Counters grow with the
+    dump index like the cumulative stats of a real run.
+    """
+    scale = dump_index + 1
+    lines = ["\n", "---------- Begin Simulation Statistics ----------\n",
+             stat_line("simSeconds", f"{0.052141 * scale:.6f}", "Number of seconds simulated (Second)")]
+
+    for cpu_id in range(num_cpus):
+        cpu = f"system.clusters.cpu{cpu_id}"
+        cycles = rng.randint(10 ** 6, 10 ** 8) * scale
+        insts = rng.randint(10 ** 5, cycles)
+        lines += [
+            stat_line(f"{cpu}.numCycles", cycles),
+            stat_line(f"{cpu}.instsIssued", insts + rng.randint(0, 10 ** 5)),
+            stat_line(f"{cpu}.committedInsts", insts),
+            stat_line(f"{cpu}.cpi", f"{cycles / insts:.6f}"),
+            stat_line(f"{cpu}.ipc", f"{insts / cycles:.6f}"),
+        ]
+        for stat in LSQ_STATS:
+            lines.append(stat_line(f"{cpu}.lsq0.{stat}", rng.randint(0, 10 ** 5) * scale))
+        for fu_type in FU_TYPES:
+            lines.append(f"{cpu + '.statFuBusy::' + fu_type:<60} {rng.randint(0, 10 ** 4) * scale:>20} "
+                         f"{rng.uniform(0, 50):>11.2f}% {rng.uniform(50, 100):>11.2f}% # FU busy\n")
+        lines += distribution_lines(f"{cpu}.lsq0.loadToUse", skewed_counts(rng, 12, scale), bucket_size=10)
+        for event in ["insertedLoads", "insertedStores", "conflictingLoads", "conflictingStores"]:
+            lines.append(stat_line(f"{cpu}.MemDepUnit__0.{event}", rng.randint(0, 10 ** 6) * scale))
+        for cache in ("dcache", "icache"):
+            lines += [
+                stat_line(f"{cpu}.{cache}.overallHits::total", rng.randint(0, 10 ** 7) * scale),
+                stat_line(f"{cpu}.{cache}.overallMisses::total", rng.randint(0, 10 ** 5) * scale),
+                stat_line(f"{cpu}.{cache}.overallMissRate::total", f"{rng.random():.6f}"),
+                stat_line(f"{cpu}.{cache}.overallAvgMissLatency::total", f"{rng.uniform(1e3, 1e5):.6f}"),
+            ]
+        lines += [
+            stat_line(f"{cpu}.branchPred.BTBLookups", rng.randint(0, 10 ** 6) * scale),
+            stat_line(f"{cpu}.branchPred.BTBHits", rng.randint(0, 10 ** 6) * scale),
+            stat_line(f"{cpu}.branchPred.BTBHitRatio", f"{rng.random():.6f}"),
+        ]
+        for tlb, events in (("dtb", ("readHits", "readMisses", "writeHits", "writeMisses")),
+                            ("itb", ("instHits", "instMisses"))):
+            for event in events:
+                lines.append(stat_line(f"{cpu}.mmu.{tlb}.{event}", rng.randint(0, 10 ** 6) * scale))
+
+    lines += [
+        stat_line("system.l2.overallHits::total", rng.randint(0, 10 ** 7) * scale),
+        stat_line("system.l2.overallMisses::total", rng.randint(0, 10 ** 6) * scale),
+        stat_line("system.l2.overallMissRate::total", f"{rng.random():.6f}"),
+        stat_line("system.l2.overallAvgMissLatency::total", f"{rng.uniform(1e3, 1e5):.6f}"),
+    ]
+    for mem_ctrl_id in range(num_mem_ctrls):
+        dram = f"system.mem_ctrls{mem_ctrl_id}.dram"
+        lines += [
+            stat_line(f"{dram}.bwRead::total", f"{rng.uniform(1e6, 1e9):.6f}"),
+            stat_line(f"{dram}.bwWrite::total", f"{rng.uniform(1e6, 1e9):.6f}"),
+            stat_line(f"{dram}.readBursts", rng.randint(0, 10 ** 6) * scale),
+            stat_line(f"{dram}.writeBursts", rng.randint(0, 10 ** 6) * scale),
+            stat_line(f"{dram}.avgQueueLatency", f"{rng.uniform(1e3, 1e5):.2f}"),
+            stat_line(f"{dram}.accesses::total", rng.randint(0, 10 ** 6) * scale),
+        ]
+        lines += distribution_lines(f"{dram}.bytesPerActivate", skewed_counts(rng, 16, scale), bucket_size=64)
+        mem_ctrl = f"system.mem_ctrls{mem_ctrl_id}"
+        lines += distribution_lines(f"{mem_ctrl}.rdQLenPdf", skewed_counts(rng, 32, scale))
+        lines += distribution_lines(f"{mem_ctrl}.wrQLenPdf", skewed_counts(rng, 64, scale))
+        lines += distribution_lines(f"{mem_ctrl}.rdPerTurnAround", skewed_counts(rng, 8, scale), bucket_size=8)
+        lines += distribution_lines(f"{mem_ctrl}.wrPerTurnAround", skewed_counts(rng, 8, scale), bucket_size=8)
+    return lines
+
+
+def generate_stats_file(path, target_lines=None, num_cpus=4, num_mem_ctrls=2, seed=0, num_dumps=1,
+                        target_bytes=None):
+    """
+    Write a synthetic gem5 stats.txt of roughly target_lines lines or target_bytes
+    bytes, split over num_dumps dump blocks. Every block holds the tracked stats of
+    each CPU and memory controller plus filler stats, so the mix resembles a
+    full-system dump. Lines are written in batches, so multi-GB files need little
+    memory. Returns the number of lines written.
+    """
+    rng = random.Random(seed)
+    filler_prefixes = [f"system.clusters.cpu{cpu_id}.{unit}" for cpu_id in range(num_cpus)
+                       for unit in ("rename", "iew", "commit", "rob", "fetch", "icache", "mmu.dtb")]
+    filler_prefixes += ["system.l2", "system.membus", "system.workload"]
+    end_line = "---------- End Simulation Statistics   ----------\n"
+
+    num_lines = 0
+    filler_id = 0
+    with open(path, 'w') as file:
+        for dump_index in range(num_dumps):
+            lines = dump_block_lines(rng, dump_index, num_cpus, num_mem_ctrls)
+            block_bytes = sum(len(line) for line in lines)
+            if target_bytes is not None:
+                budget = max(0, target_bytes // num_dumps - block_bytes - len(end_line))
+            else:
+                budget = max(0, (target_lines or 0) // num_dumps - len(lines) - 1)
+            while budget > 0:
+                line = stat_line(f"{rng.choice(filler_prefixes)}.stat{filler_id % 997}::{filler_id % 13}",
+                                 rng.randint(0, 10 ** 6))
+                filler_id += 1
+                lines.append(line)
+                budget -= len(line) if target_bytes is not None else 1
+                if len(lines) >= WRITE_BATCH:
+                    file.write(''.join(lines))
+                    num_lines += len(lines)
+                    lines = []
+            lines.append(end_line)
+            file.write(''.join(lines))
+            num_lines += len(lines)
+    return num_lines
+
+
+def parse_size(text):
+    """
+    Parse a file size such as 500KB, 100MB or 5GB (binary units) into bytes.
+    """
+    text = text.strip().upper()
+    for suffix, factor in (("KB", 2 ** 10), ("MB", 2 ** 20), ("GB", 2 ** 30), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def format_size(num_bytes):
+    for suffix, factor in (("GB", 2 ** 30), ("MB", 2 ** 20), ("KB", 2 ** 10)):
+        if num_bytes >= factor:
+            return f"{num_bytes / factor:g}{suffix}"
+    return f"{num_bytes}B"
+
+
+def count_lines(file_path):
+    with open(file_path, 'rb') as file:
+        return sum(chunk.count(b'\n') for chunk in iter(lambda: file.read(2 ** 24), b''))
+
+
+def time_best(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def legacy_parse(file_path):
+    active_cpu = legacy_find_active_cpu(file_path)
+    return active_cpu, legacy_extract_cpu_statistics(file_path, active_cpu)
+
+
+def active_cpu_result(result):
+    """
+    (active_cpu, stats) without the per-core stats of the other cores, which the
+    legacy parser never collected.
+    """
+    active_cpu, stats = result
+    return active_cpu, {key: value for key, value in stats.items() if key != 'cpus'}
+
+
+def same_statistics(result, reference, legacy_reference=False):
+    """
+    Compare two active-CPU results. The legacy parser only extracts the stats it was
+    written for, so against it only those are compared.
+    """
+    if legacy_reference:
+        active_cpu, stats = result
+        stats = {key: value for key, value in stats.items() if key in reference[1]}
+        reference_ctrls = reference[1].get('mem_ctrl_data', {})
+        stats['mem_ctrl_data'] = {
+            mem_ctrl_id: {key: value for key, value in mem_ctrl.items() if key in reference_ctrls.get(mem_ctrl_id, {})}
+            for mem_ctrl_id, mem_ctrl in stats.get('mem_ctrl_data', {}).items()}
+        result = active_cpu, stats
+    return result == reference
+
+
+def peak_rss_bytes():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def timed_parse(parser_name, file_path, repeat):
+    """
+    Run one parser repeat times in this process. Returns (best seconds, peak RSS in
+    bytes, active-CPU result).
+    """
+    if parser_name == "legacy":
+        seconds, result = time_best(lambda: legacy_parse(file_path), repeat)
+    else:
+        seconds, result = time_best(lambda: stat_parser.parse_stats_file(file_path, scan=parser_name), repeat)
+    return seconds, peak_rss_bytes(), active_cpu_result(result)
+
+
+def measure_parser(parser_name, file_path, repeat):
+    """
+    timed_parse in a freshly spawned process, so the peak RSS belongs to this parser alone.
+    """
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(timed_parse, parser_name, file_path, repeat).result()
+
+
+def measure_main(file_path, category, repeat, output_format, work_dir):
+    """
+    Best end-to-end wall time of `main.py FILE --category CATEGORY`, interpreter start-up included.
+    """
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    command = [sys.executable, main_path, os.path.abspath(file_path), "--category", category, "--no-cache",
+               "--format", output_format]
+    seconds, _ = time_best(lambda: subprocess.run(command, cwd=work_dir, stdout=subprocess.DEVNULL, check=True),
+                           repeat)
+    return seconds
+
+
+def benchmark_file(file_path, repeat, parsers=None, categories=(), output_format="none"):
+    """
+    Benchmark the parsers and main.py categories on one file, printing a report.
+    Returns the results as a JSON-serialisable dict.
+    """
+    parsers = parsers or ["legacy"] + stat_parser.SCAN_MODES
+    num_lines = count_lines(file_path)
+    num_bytes = os.path.getsize(file_path)
+    result = {"file": os.path.basename(file_path), "bytes": num_bytes, "lines": num_lines, "parsers": {},
+              "main": {}}
+
+    print(f"\n{file_path}: {num_lines} lines, {num_bytes / 2 ** 20:.1f} MB")
+    reference = None
+    for parser_name in parsers:
+        seconds, peak_rss, parsed = measure_parser(parser_name, file_path, repeat)
+        result["parsers"][parser_name] = {
+            "seconds": seconds,
+            "lines_per_sec": num_lines / seconds,
+            "mb_per_sec": num_bytes / 2 ** 20 / seconds,
+            "peak_rss_mb": peak_rss / 2 ** 20,
+        }
+        label = "legacy two-pass:" if parser_name == "legacy" else f"single-pass {parser_name}:"
+        print(f"  {label:<19} {seconds:8.3f} s  {num_lines / seconds:14,.0f} lines/sec  "
+              f"{num_bytes / 2 ** 20 / seconds:9.1f} MB/sec  peak RSS {peak_rss / 2 ** 20:7.1f} MB")
+        if reference is None:
+            reference = parser_name, parsed
+        elif not same_statistics(parsed, reference[1], reference[0] == "legacy"):
+            print(f"  WARNING: {parser_name} disagrees with {reference[0]} on the extracted statistics")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for category in categories:
+            seconds = measure_main(file_path, category, repeat, output_format, work_dir)
+            result["main"][category] = seconds
+            print(f"  main.py --category {category:<17} {seconds:8.3f} s")
+    return result
+
+
+def compare_results(baseline, current):
+    """
+    Print the change of every timing and peak RSS against a baseline results document,
+    matching files by name.
+    """
+    baseline_files = {entry["file"]: entry for entry in baseline["files"]}
+    print(f"\nChange against {baseline.get('commit') or 'baseline'} (negative is faster/smaller):")
+    for entry in current["files"]:
+        before = baseline_files.get(entry["file"])
+        if before is None:
+            continue
+        print(f"  {entry['file']}:")
+        for parser_name, metrics in entry["parsers"].items():
+            old = before["parsers"].get(parser_name)
+            if old is None:
+                continue
+            print(f"    {parser_name:<8} time {percent_change(old['seconds'], metrics['seconds'])}"
+                  f"  peak RSS {percent_change(old['peak_rss_mb'], metrics['peak_rss_mb'])}")
+        for category, seconds in entry["main"].items():
+            if category in before["main"]:
+                print(f"    main.py {category:<17} {percent_change(before['main'][category], seconds)}")
+
+
+def percent_change(old, new):
+    return f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark the gem5 stat parser.")
+    parser.add_argument("file_paths", nargs='*', help="Stat files to benchmark (default: synthetic files)",
+                        metavar="FILE")
+    parser.add_argument("--size", default=None, metavar="SIZES",
+                        help="Comma-separated sizes of the synthetic files, e.g. 1MB,100MB,1GB,5GB")
+    parser.add_argument("--lines", type=int, default=200000,
+                        help="Lines in the synthetic stats file when --size is not given")
+    parser.add_argument("--cpus", type=int, default=4, help="CPUs in the synthetic files")
+    parser.add_argument("--mem-ctrls", type=int, default=2, help="Memory controllers in the synthetic files")
+    parser.add_argument("--dumps", type=int, default=1, help="Dump blocks in the synthetic files")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic values")
+    parser.add_argument("--work-dir", metavar="DIR",
+                        help="Keep synthetic files here and reuse them on later runs (default: a temporary "
+                             "directory)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best time is reported")
+    parser.add_argument("--skip-legacy", action="store_true",
+                        help="Do not time the legacy two-pass parser (about 100k lines/sec)")
+    parser.add_argument("--categories", default="", metavar="LIST",
+                        help="main.py categories to time end to end, comma-separated, or 'all' for each one")
+    parser.add_argument("--format", default="none", choices=["xlsx", "csv", "json", "none"],
+                        help="--format of the timed main.py runs (default: %(default)s)")
+    parser.add_argument("--output", metavar="JSON", help="Store the results in this JSON file")
+    parser.add_argument("--compare", metavar="JSON", help="Compare the results with an earlier --output file")
+    args = parser.parse_args()
+
+    parsers = stat_parser.SCAN_MODES if args.skip_legacy else ["legacy"] + stat_parser.SCAN_MODES
+    if args.categories == "all":
+        import main
+        categories = main.CATEGORIES
+    else:
+        categories = [category for category in args.categories.split(",") if category]
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "files": [],
+    }
+    with contextlib.ExitStack() as stack:
+        if args.file_paths:
+            file_paths = args.file_paths
+        else:
+            work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory())
+            os.makedirs(work_dir, exist_ok=True)
+            sizes = [parse_size(size) for size in args.size.split(",")] if args.size else [None]
+            file_paths = []
+            for size in sizes:
+                extent = format_size(size) if size is not None else f"{args.lines}lines"
+                file_path = os.path.join(work_dir, f"stats-{extent}-c{args.cpus}-m{args.mem_ctrls}-d{args.dumps}"
+                                                   f"-s{args.seed}.txt")
+                if not os.path.exists(file_path):
+                    print(f"Generating {file_path}")
+                    generate_stats_file(file_path, args.lines, args.cpus, args.mem_ctrls, args.seed, args.dumps,
+                                        size)
+                file_paths.append(file_path)
+
+        for file_path in file_paths:
+            results["files"].append(benchmark_file(file_path, args.repeat, parsers, categories, args.format))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=1)
+        print(f"\nResults saved as {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            compare_results(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main_benchmark()
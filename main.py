@@ -1,201 +1,106 @@
-import re
 import argparse
-from tabulate import tabulate
-from colorama import Fore, Style, init
-from openpyxl import Workbook
-from openpyxl.chart import BarChart, Reference
-import xlsxwriter
-import xlsxwriter
-from xlsxwriter.utility import xl_col_to_name
-
-init()
+import collections
+import csv
+import functools
+import json
+import math
+import re
+import sys
+import time
+
+import stat_cache
+import stat_derive
+import stat_diff
+import stat_dist
+import stat_export
+import stat_parser
+import stat_profile
+import stat_schema
+import stat_sweep
+
+# Command-line front end: tables, workbooks and JSON on top of stat_parser.
+#
+# tabulate, colorama and xlsxwriter are imported where they are used, so a run
+# only loads the renderer it needs. Together they take longer to import than
+# everything else, which a --format json run from a script pays on every call.
+
+
+def parse_dump_selection(text):
+    """
+    Parse a --dumps value: 'all', a single index ('3', '-1') or a Python-style
+    range ('2:10', '-5:', '::2'). Returns None for all dumps, otherwise a slice.
+    """
+    if text == 'all':
+        return None
+    try:
+        if ':' not in text:
+            index = int(text)
+            return slice(index, index + 1 or None)
+        parts = [int(part) if part else None for part in text.split(':')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid dump selection: {text!r}")
+    if len(parts) > 3 or (len(parts) == 3 and parts[2] is not None and parts[2] <= 0):
+        raise argparse.ArgumentTypeError(f"invalid dump selection: {text!r}")
+    return slice(*parts)
+
+
+def report_active_cpu(active_cpu, stats):
+    print(
+        f"Active CPU is {active_cpu} with {stats.get('numCycles', 0)} cycles and {stats.get('committedInsts', 0)} committed instructions")
 
 
 def find_active_cpu(file_path):
     """
     Find the active core by the number of clocks and instructions.
     """
-    cpu_data = {}
-    pattern_cycles = re.compile(r'system\.clusters\.(cpu\d+)\.numCycles\s+(\d+)')
-    pattern_insts_committed = re.compile(r'system\.clusters\.(cpu\d+)\.committedInsts\s+(\d+)')
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            if match := pattern_cycles.search(line):
-                cpu = match.group(1)
-                cycles = int(match.group(2))
-                if cpu not in cpu_data:
-                    cpu_data[cpu] = {'cycles': cycles, 'committedInsts': 0}
-                else:
-                    cpu_data[cpu]['cycles'] = cycles
-            if match := pattern_insts_committed.search(line):
-                cpu = match.group(1)
-                committed_insts = int(match.group(2))
-                if cpu not in cpu_data:
-                    cpu_data[cpu] = {'cycles': 0, 'committedInsts': committed_insts}
-                else:
-                    cpu_data[cpu]['committedInsts'] = committed_insts
-
-    active_cpu = max(cpu_data, key=lambda x: (cpu_data[x]['cycles'], cpu_data[x]['committedInsts']))
-    print(
-        f"Active CPU is {active_cpu} with {cpu_data[active_cpu]['cycles']} cycles and {cpu_data[active_cpu]['committedInsts']} committed instructions")
+    active_cpu, stats = stat_parser.parse_stats_file(file_path)
+    report_active_cpu(active_cpu, stats)
     return active_cpu
 
 
 def extract_cpu_statistics(file_path, active_cpu):
-    stats = {}
-
-    # CPU statistics
-    pattern_cycles = re.compile(rf'system\.clusters\.{active_cpu}\.numCycles\s+(\d+)')
-    pattern_insts_issued = re.compile(rf'system\.clusters\.{active_cpu}\.instsIssued\s+(\d+)')
-    pattern_insts_committed = re.compile(rf'system\.clusters\.{active_cpu}\.committedInsts\s+(\d+)')
-    pattern_cpi = re.compile(rf'system\.clusters\.{active_cpu}\.cpi\s+([\d\.]+)')
-    pattern_ipc = re.compile(rf'system\.clusters\.{active_cpu}\.ipc\s+([\d\.]+)')
-
-    # Load/Store Queue statistics
-    pattern_lsq_forw_loads = re.compile(rf'system\.clusters\.{active_cpu}\.lsq\d+\.forwLoads\s+(\d+)')
-    pattern_lsq_squashed_loads = re.compile(rf'system\.clusters\.{active_cpu}\.lsq\d+\.squashedLoads\s+(\d+)')
-    pattern_lsq_squashed_stores = re.compile(rf'system\.clusters\.{active_cpu}\.lsq\d+\.squashedStores\s+(\d+)')
-    pattern_lsq_ignored_responses = re.compile(rf'system\.clusters\.{active_cpu}\.lsq\d+\.ignoredResponses\s+(\d+)')
-    pattern_lsq_mem_order_violations = re.compile(rf'system\.clusters\.{active_cpu}\.lsq\d+\.memOrderViolation\s+(\d+)')
-    pattern_lsq_rescheduled_loads = re.compile(rf'system\.clusters\.{active_cpu}\.lsq\d+\.rescheduledLoads\s+(\d+)')
-    pattern_lsq_blocked_by_cache = re.compile(rf'system\.clusters\.{active_cpu}\.lsq\d+\.blockedByCache\s+(\d+)')
-
-    # Functional Unit usage patterns
-    pattern_fu_busy = re.compile(rf'system\.clusters\.{active_cpu}\.statFuBusy::(\w+)\s+(\d+)\s+([\d\.]+)%')
-
-    # Cache patterns
-    pattern_cache_hits = re.compile(rf'system\.clusters\.{active_cpu}\.dcache\.overallHits::total\s+(\d+)')
-    pattern_cache_misses = re.compile(rf'system\.clusters\.{active_cpu}\.dcache\.overallMisses::total\s+(\d+)')
-    pattern_cache_miss_rate = re.compile(rf'system\.clusters\.{active_cpu}\.dcache\.overallMissRate::total\s+([\d\.]+)')
-    pattern_cache_latency = re.compile(
-        rf'system\.clusters\.{active_cpu}\.dcache\.overallAvgMissLatency::total\s+([\d\.]+)')
-
-    # Memory Dependency Unit patterns
-    pattern_mem_dep_unit = re.compile(rf'system\.clusters\.{active_cpu}\.MemDepUnit__(\d+)\.(\w+)\s+(\d+)')
-
-    # Branch prediction patterns
-    pattern_bp_btb_lookups = re.compile(rf'system\.clusters\.{active_cpu}\.branchPred\.BTBLookups\s+(\d+)')
-    pattern_bp_btb_hits = re.compile(rf'system\.clusters\.{active_cpu}\.branchPred\.BTBHits\s+(\d+)')
-    pattern_bp_btb_hit_ratio = re.compile(rf'system\.clusters\.{active_cpu}\.branchPred\.BTBHitRatio\s+([\d\.]+)')
-
-    # Memory Controller patterns
-    pattern_mem_bw_read = re.compile(r'system\.mem_ctrls(\d+)\.dram\.bwRead::total\s+(\d+)')
-    pattern_mem_bw_write = re.compile(r'system\.mem_ctrls(\d+)\.dram\.bwWrite::total\s+(\d+)')
-    pattern_mem_read_bursts = re.compile(r'system\.mem_ctrls(\d+)\.dram\.readBursts\s+(\d+)')
-    pattern_mem_write_bursts = re.compile(r'system\.mem_ctrls(\d+)\.dram\.writeBursts\s+(\d+)')
-    pattern_mem_queue_latency = re.compile(r'system\.mem_ctrls(\d+)\.dram\.avgQueueLatency\s+([\d\.]+)')
-    pattern_mem_accesses = re.compile(r'system\.mem_ctrls(\d+)\.dram\.accesses::total\s+(\d+)')
-
-    mem_ctrl_data = {}
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            # CPU statistics
-            if match := pattern_cycles.search(line):
-                stats['numCycles'] = int(match.group(1))
-            if match := pattern_insts_issued.search(line):
-                stats['instsIssued'] = int(match.group(1))
-            if match := pattern_insts_committed.search(line):
-                stats['committedInsts'] = int(match.group(1))
-            if match := pattern_cpi.search(line):
-                stats['cpi'] = float(match.group(1))
-            if match := pattern_ipc.search(line):
-                stats['ipc'] = float(match.group(1))
-
-            # Load/Store Queue statistics
-            if match := pattern_lsq_forw_loads.search(line):
-                stats['lsq_forw_loads'] = int(match.group(1))
-            if match := pattern_lsq_squashed_loads.search(line):
-                stats['lsq_squashed_loads'] = int(match.group(1))
-            if match := pattern_lsq_squashed_stores.search(line):
-                stats['lsq_squashed_stores'] = int(match.group(1))
-            if match := pattern_lsq_ignored_responses.search(line):
-                stats['lsq_ignored_responses'] = int(match.group(1))
-            if match := pattern_lsq_mem_order_violations.search(line):
-                stats['lsq_mem_order_violations'] = int(match.group(1))
-            if match := pattern_lsq_rescheduled_loads.search(line):
-                stats['lsq_rescheduled_loads'] = int(match.group(1))
-            if match := pattern_lsq_blocked_by_cache.search(line):
-                stats['lsq_blocked_by_cache'] = int(match.group(1))
-
-            # Functional Unit statistics
-            if match := pattern_fu_busy.search(line):
-                fu_type = match.group(1)
-                fu_busy_count = int(match.group(2))
-                fu_busy_rate = float(match.group(3))
-                if 'FU_Busy' not in stats:
-                    stats['FU_Busy'] = {}
-                stats['FU_Busy'][fu_type] = {'count': fu_busy_count, 'rate': fu_busy_rate}
-
-            # Cache statistics
-            if match := pattern_cache_hits.search(line):
-                stats['cache_hits'] = int(match.group(1))
-            if match := pattern_cache_misses.search(line):
-                stats['cache_misses'] = int(match.group(1))
-            if match := pattern_cache_miss_rate.search(line):
-                stats['cache_miss_rate'] = float(match.group(1))
-            if match := pattern_cache_latency.search(line):
-                stats['cache_miss_latency'] = float(match.group(1))
-
-            # Memory Dependency Unit statistics
-            if match := pattern_mem_dep_unit.search(line):
-                unit_id = match.group(1)
-                event_type = match.group(2)
-                value = int(match.group(3))
-                if 'MemDepUnit' not in stats:
-                    stats['MemDepUnit'] = {}
-                if unit_id not in stats['MemDepUnit']:
-                    stats['MemDepUnit'][unit_id] = {}
-                stats['MemDepUnit'][unit_id][event_type] = value
-
-            # Branch prediction statistics
-            if match := pattern_bp_btb_lookups.search(line):
-                stats['btb_lookups'] = int(match.group(1))
-            if match := pattern_bp_btb_hits.search(line):
-                stats['btb_hits'] = int(match.group(1))
-            if match := pattern_bp_btb_hit_ratio.search(line):
-                stats['btb_hit_ratio'] = float(match.group(1))
-
-            # Memory Controller statistics
-            if match := pattern_mem_bw_read.search(line):
-                mem_ctrl_id = match.group(1)
-                bw_read = int(match.group(2))
-                if mem_ctrl_id not in mem_ctrl_data:
-                    mem_ctrl_data[mem_ctrl_id] = {}
-                mem_ctrl_data[mem_ctrl_id]['bw_read'] = bw_read
-            if match := pattern_mem_bw_write.search(line):
-                mem_ctrl_id = match.group(1)
-                bw_write = int(match.group(2))
-                mem_ctrl_data[mem_ctrl_id]['bw_write'] = bw_write
-            if match := pattern_mem_read_bursts.search(line):
-                mem_ctrl_id = match.group(1)
-                read_bursts = int(match.group(2))
-                mem_ctrl_data[mem_ctrl_id]['read_bursts'] = read_bursts
-            if match := pattern_mem_write_bursts.search(line):
-                mem_ctrl_id = match.group(1)
-                write_bursts = int(match.group(2))
-                mem_ctrl_data[mem_ctrl_id]['write_bursts'] = write_bursts
-            if match := pattern_mem_queue_latency.search(line):
-                mem_ctrl_id = match.group(1)
-                queue_latency = float(match.group(2))
-                mem_ctrl_data[mem_ctrl_id]['queue_latency'] = queue_latency
-            if match := pattern_mem_accesses.search(line):
-                mem_ctrl_id = match.group(1)
-                accesses = int(match.group(2))
-                mem_ctrl_data[mem_ctrl_id]['accesses'] = accesses
-
-    # Calculate total bandwidth and balance
-    total_read_bw = sum(mem_ctrl['bw_read'] for mem_ctrl in mem_ctrl_data.values())
-    total_write_bw = sum(mem_ctrl['bw_write'] for mem_ctrl in mem_ctrl_data.values())
-    for mem_ctrl_id, mem_ctrl in mem_ctrl_data.items():
-        read_share = (mem_ctrl['bw_read'] / total_read_bw * 100) if total_read_bw else 0
-        write_share = (mem_ctrl['bw_write'] / total_write_bw * 100) if total_write_bw else 0
-        mem_ctrl['read_share'] = read_share
-        mem_ctrl['write_share'] = write_share
-
-    stats['mem_ctrl_data'] = mem_ctrl_data
-    return stats
+    return stat_parser.parse_stats_file(file_path, active_cpu)[1]
+
+
+# With more files than this, --layout auto puts files on rows instead of columns.
+MAX_COLUMN_FILES = 8
+
+
+def transpose_table(headers, rows, label="File"):
+    """
+    Turn a metric-per-row table with one column per file into a file-per-row table.
+    """
+    new_headers = [label] + [row[0] for row in rows]
+    new_rows = [[column_label] + [row[col] for row in rows] for col, column_label in enumerate(headers[1:], start=1)]
+    return new_headers, new_rows
+
+
+@stat_profile.timed("tabulate")
+def format_table(rows, headers):
+    from tabulate import tabulate
+    return tabulate(rows, headers=headers, tablefmt="grid")
+
+
+@functools.lru_cache(maxsize=None)
+def terminal_colors():
+    """
+    colorama's (Fore, Style), initialised on first use.
+    """
+    from colorama import Fore, Style, init
+    init()
+    return Fore, Style
+
+
+def print_table(rows, headers, layout="columns", label="File", echo=True):
+    """
+    Print a table, transposing it first for the rows layout. Returns (rows, headers) as printed;
+    with echo=False the table is only laid out.
+    """
+    if layout == "rows":
+        headers, rows = transpose_table(headers, rows, label)
+    if echo:
+        print(format_table(rows, headers))
+    return rows, headers
 
 
 def filter_non_zero_rows(rows):
@@ -204,224 +109,283 @@ def filter_non_zero_rows(rows):
     """
     return [row for row in rows if any(value != 'N/A' and value != 0 for value in row[1:])]
 
+# Categories drawn as one chart over all their metrics, with the chart title
+COMBINED_CHART_TITLES = {
+    "cpu": "CPU General Statistics",
+    "fu": "Functional Unit Usage",
+    "bp": "Branch Prediction Statistics",
+    "icache": "Instruction Cache Statistics",
+    "l2cache": "L2 Cache Statistics",
+    "tlb": "TLB Statistics",
+}
+
+# Categories drawn as one chart per metric row, with the chart title suffix
+ROW_CHART_TITLES = {
+    "lsq": "Statistics",
+    "cache": "Cache Statistics",
+}
+
+# Charts per sheet for categories that chart every row, controller or file
+DEFAULT_MAX_CHARTS = 10
+
+OUTPUT_FORMATS = ["xlsx", "csv", "json", "none"]
+
+
+@stat_profile.timed("xlsx")
+def new_workbook(file_name):
+    """
+    Workbook in constant_memory mode: every row is flushed to disk once the next
+    one is started, so memory stays flat however many files are compared. Rows
+    must therefore be written in order and exactly once.
+    """
+    import xlsxwriter
+    return xlsxwriter.Workbook(file_name, {'constant_memory': True})
+
+
+def add_column_chart(workbook, sheet_name, row_count, file_labels, title, x_axis):
+    """
+    Column chart of the rows 2..row_count+1 of a sheet with one series per file column.
+    """
+    from xlsxwriter.utility import xl_col_to_name
+    chart = workbook.add_chart({'type': 'column'})
+    for i, file_label in enumerate(file_labels):
+        chart.add_series({
+            'name': file_label,
+            'categories': f"'{sheet_name}'!A2:A{row_count + 1}",
+            'values': f"'{sheet_name}'!{xl_col_to_name(i + 1)}2:{xl_col_to_name(i + 1)}{row_count + 1}",
+        })
+    chart.set_title({'name': title})
+    chart.set_x_axis({'name': x_axis})
+    chart.set_y_axis({'name': 'Value'})
+    return chart
+
+
+@stat_profile.timed("xlsx")
 def save_to_excel(stats_list, file_labels, category, mem_ctrl_table, rows_ipc_cpi=None, headers_general=None,
-                  headers_ipc_cpi=None):
-    file_name = f"{category}_statistics.xlsx"
-    workbook = xlsxwriter.Workbook(file_name)
+                  headers_ipc_cpi=None, layout="columns", workbook=None, max_charts=DEFAULT_MAX_CHARTS):
+    """
+    Write the category's sheets and charts. Without a workbook a new
+    {category}_statistics.xlsx is created and closed; a given workbook is left open
+    so several categories can share it. Categories charted per row, controller or
+    file get at most max_charts charts (0: none).
+    """
+    from xlsxwriter.utility import xl_col_to_name
 
-    worksheet_general = workbook.add_worksheet(f"{category}_general")
+    owns_workbook = workbook is None
+    if owns_workbook:
+        file_name = f"{category}_statistics.xlsx"
+        workbook = new_workbook(file_name)
+
+    sheet_name = f"{category}_general"
+    worksheet_general = workbook.add_worksheet(sheet_name)
     worksheet_general.write_row(0, 0, headers_general)
 
     for row_idx, row in enumerate(mem_ctrl_table, start=1):
         worksheet_general.write_row(row_idx, 0, row)
 
     if category == "cpu":
-        worksheet_general.write_row(0, 0, headers_general)
-
-        for row_idx, row in enumerate(mem_ctrl_table, start=1):
-            worksheet_general.write_row(row_idx, 0, row)
-
-        general_chart = workbook.add_chart({'type': 'column'})
-        for i, file_label in enumerate(file_labels):
-            general_chart.add_series({
-                'name': file_label,
-                'categories': f"'{category}_general'!A2:A{len(mem_ctrl_table) + 1}",
-                'values': f"'{category}_general'!{xl_col_to_name(i + 1)}2:" \
-                          f"{xl_col_to_name(i + 1)}{len(mem_ctrl_table) + 1}",
-            })
-
-        general_chart.set_title({'name': 'CPU General Statistics'})
-        general_chart.set_x_axis({'name': 'Metrics'})
-        general_chart.set_y_axis({'name': 'Value'})
-        worksheet_general.insert_chart('E2', general_chart)
-
         worksheet_ipc_cpi = workbook.add_worksheet(f"{category}_ipc_cpi")
         worksheet_ipc_cpi.write_row(0, 0, headers_ipc_cpi)
-
         for row_idx, row in enumerate(rows_ipc_cpi, start=1):
             worksheet_ipc_cpi.write_row(row_idx, 0, row)
 
-        ipc_cpi_chart = workbook.add_chart({'type': 'column'})
-        for i, file_label in enumerate(file_labels):
-            ipc_cpi_chart.add_series({
-                'name': file_label,
-                'categories': f"'{category}_ipc_cpi'!A2:A{len(rows_ipc_cpi) + 1}",
-                'values': f"'{category}_ipc_cpi'!{xl_col_to_name(i + 1)}2:" \
-                          f"{xl_col_to_name(i + 1)}{len(rows_ipc_cpi) + 1}",
-            })
-
-        ipc_cpi_chart.set_title({'name': 'CPU IPC and CPI Statistics'})
-        ipc_cpi_chart.set_x_axis({'name': 'Metrics (CPI, IPC)'})
-        ipc_cpi_chart.set_y_axis({'name': 'Value'})
-        worksheet_ipc_cpi.insert_chart('E2', ipc_cpi_chart)
-
-    elif category == "lsq":
-        for row_idx, row in enumerate(mem_ctrl_table, start=1):
-            worksheet_general.write_row(row_idx, 0, row)
-
+    if layout == "rows" or max_charts == 0:
+        # Rows layout: per-file chart series do not scale to sweeps, so only the data is written.
+        pass
+
+    elif category in COMBINED_CHART_TITLES:
+        x_axis = 'Functional Units' if category == "fu" else 'Metrics'
+        worksheet_general.insert_chart('E2', add_column_chart(
+            workbook, sheet_name, len(mem_ctrl_table), file_labels, COMBINED_CHART_TITLES[category], x_axis))
+        if category == "cpu":
+            worksheet_ipc_cpi.insert_chart('E2', add_column_chart(
+                workbook, f"{category}_ipc_cpi", len(rows_ipc_cpi), file_labels, 'CPU IPC and CPI Statistics',
+                'Metrics (CPI, IPC)'))
+
+    elif category in ROW_CHART_TITLES:
+        for row_idx, row in enumerate(mem_ctrl_table[:max_charts], start=1):
             chart = workbook.add_chart({'type': 'column'})
             for i, file_label in enumerate(file_labels):
                 chart.add_series({
                     'name': file_label,
-                    'categories': f"'{category}_general'!A{row_idx + 1}",
-                    'values': f"'{category}_general'!{xl_col_to_name(i + 1)}{row_idx + 1}",
+                    'categories': f"'{sheet_name}'!A{row_idx + 1}",
+                    'values': f"'{sheet_name}'!{xl_col_to_name(i + 1)}{row_idx + 1}",
                 })
-            chart.set_title({'name': f'{row[0]} Statistics'})
+            chart.set_title({'name': f'{row[0]} {ROW_CHART_TITLES[category]}'})
             chart.set_x_axis({'name': 'Files'})
             chart.set_y_axis({'name': 'Value'})
             worksheet_general.insert_chart(f"E{row_idx * 10}", chart)
 
-    elif category == "fu":
-        for row_idx, row in enumerate(mem_ctrl_table, start=1):
-            worksheet_general.write_row(row_idx, 0, row)
-
-        chart = workbook.add_chart({'type': 'column'})
-        for i, file_label in enumerate(file_labels):
-            chart.add_series({
-                'name': file_label,
-                'categories': f"'{category}_general'!A2:A{len(mem_ctrl_table) + 1}",
-                'values': f"'{category}_general'!{xl_col_to_name(i + 1)}2:" \
-                          f"{xl_col_to_name(i + 1)}{len(mem_ctrl_table) + 1}",
-            })
-
-        chart.set_title({'name': 'Functional Unit Usage'})
-        chart.set_x_axis({'name': 'Functional Units'})
-        chart.set_y_axis({'name': 'Usage Count'})
-        worksheet_general.insert_chart('E2', chart)
-
-    elif category == "cache":
-        for row_idx, row in enumerate(mem_ctrl_table, start=1):
-            worksheet_general.write_row(row_idx, 0, row)
-
+    elif category == "mem_ctrl":
+        num_metrics = 4
+        controller_rows = [(idx, row_data) for idx, row_data in enumerate(mem_ctrl_table, start=1)
+                           if row_data[0].startswith("Memory Controller")]
+        for idx, row_data in controller_rows[:max_charts]:
             chart = workbook.add_chart({'type': 'column'})
-            for i, file_label in enumerate(file_labels):
-                chart.add_series({
-                    'name': file_label,
-                    'categories': f"'{category}_general'!A{row_idx + 1}",
-                    'values': f"'{category}_general'!{xl_col_to_name(i + 1)}{row_idx + 1}",
-                })
-            chart.set_title({'name': f'{row[0]} Cache Statistics'})
-            chart.set_x_axis({'name': 'Files'})
+            mem_ctrl_name = row_data[0]
+
+            for metric_idx in range(num_metrics):
+                for file_idx, file_label in enumerate(file_labels):
+                    col = 1 + (file_idx * num_metrics) + metric_idx
+                    metric_name = headers_general[col]
+                    chart.add_series({
+                        'name': f"{file_label} {metric_name}",
+                        'categories': [sheet_name, idx, 0, idx, 0],
+                        'values': [sheet_name, idx, col, idx, col],
+                    })
+
+            chart.set_title({'name': f"{mem_ctrl_name} Statistics"})
+            chart.set_x_axis({'name': 'Metric'})
             chart.set_y_axis({'name': 'Value'})
-            worksheet_general.insert_chart(f"E{row_idx * 10}", chart)
+            chart.set_legend({'position': 'right'})
 
-    elif category == "bp":
-        for row_idx, row in enumerate(mem_ctrl_table, start=1):
-            worksheet_general.write_row(row_idx, 0, row)
-
-        chart = workbook.add_chart({'type': 'column'})
-        for i, file_label in enumerate(file_labels):
-            chart.add_series({
-                'name': file_label,
-                'categories': f"'{category}_general'!A2:A{len(mem_ctrl_table) + 1}",
-                'values': f"'{category}_general'!{xl_col_to_name(i + 1)}2:" \
-                          f"{xl_col_to_name(i + 1)}{len(mem_ctrl_table) + 1}",
-            })
-
-        chart.set_title({'name': 'Branch Prediction Statistics'})
-        chart.set_x_axis({'name': 'Metrics'})
-        chart.set_y_axis({'name': 'Value'})
-        worksheet_general.insert_chart('E2', chart)
+            worksheet_general.insert_chart(f"E{idx * 10}", chart)
 
-    elif category == "mem_ctrl":
-        num_metrics = 4
-        for idx, row_data in enumerate(mem_ctrl_table, start=1):
-            if row_data[0].startswith("Memory Controller"):
-                chart = workbook.add_chart({'type': 'column'})
-                mem_ctrl_name = row_data[0]
-
-                for metric_idx in range(num_metrics):
-                    for file_idx, file_label in enumerate(file_labels):
-                        col = 1 + (file_idx * num_metrics) + metric_idx
-                        metric_name = headers_general[col]
-                        chart.add_series({
-                            'name': f"{file_label} {metric_name}",
-                            'categories': [f"{category}_general", idx, 0, idx, 0],
-                            'values': [f"{category}_general", idx, col, idx, col],
-                        })
-
-                chart.set_title({'name': f"{mem_ctrl_name} Statistics"})
-                chart.set_x_axis({'name': 'Metric'})
-                chart.set_y_axis({'name': 'Value'})
-                chart.set_legend({'position': 'right'})
-
-                worksheet_general.insert_chart(f"E{idx * 10}", chart)
-    #TODO: add piecharts.
     elif category == "mem_ctrl_balance":
         try:
-            read_share_col = headers_general.index("Read % Share")
-            write_share_col = headers_general.index("Write % Share")
-            print(f"Read % Share Column Index: {read_share_col}, Write % Share Column Index: {write_share_col}")
+            share_cols = {share: headers_general.index(f"{share} % Share") for share in ("Read", "Write")}
         except ValueError as e:
             print("Error finding columns for 'Read % Share' or 'Write % Share':", e)
-            workbook.close()
+            if owns_workbook:
+                workbook.close()
             return
 
-        for file_idx, file_label in enumerate(file_labels):
-            read_pie_chart = workbook.add_chart({'type': 'pie'})
-            read_pie_chart.set_title({'name': f"{file_label} Read Share Distribution"})
-            read_pie_chart.add_series({
-                'categories': f"'{category}_general'!A2:A{len(mem_ctrl_table) + 1}",
-                'values': f"'{category}_general'!{xl_col_to_name(read_share_col)}2:" \
-                          f"{xl_col_to_name(read_share_col)}{len(mem_ctrl_table) + 1}",
+        # Two pie charts per file, read then write; all of them count against max_charts.
+        pie_charts = [(file_idx, file_label, share) for file_idx, file_label in enumerate(file_labels)
+                      for share in share_cols][:max_charts]
+        for file_idx, file_label, share in pie_charts:
+            share_col = xl_col_to_name(share_cols[share])
+            pie_chart = workbook.add_chart({'type': 'pie'})
+            pie_chart.set_title({'name': f"{file_label} {share} Share Distribution"})
+            pie_chart.add_series({
+                'categories': f"'{sheet_name}'!A2:A{len(mem_ctrl_table) + 1}",
+                'values': f"'{sheet_name}'!{share_col}2:{share_col}{len(mem_ctrl_table) + 1}",
                 'data_labels': {'percentage': True}
             })
-            worksheet_general.insert_chart(f"E{file_idx * 20 + 1}", read_pie_chart)
-
-            write_pie_chart = workbook.add_chart({'type': 'pie'})
-            write_pie_chart.set_title({'name': f"{file_label} Write Share Distribution"})
-            write_pie_chart.add_series({
-                'categories': f"'{category}_general'!A2:A{len(mem_ctrl_table) + 1}",
-                'values': f"'{category}_general'!{xl_col_to_name(write_share_col)}2:" \
-                          f"{xl_col_to_name(write_share_col)}{len(mem_ctrl_table) + 1}",
-                'data_labels': {'percentage': True}
-            })
-            worksheet_general.insert_chart(f"E{(file_idx * 20) + 15}", write_pie_chart)
+            worksheet_general.insert_chart(f"E{file_idx * 20 + (1 if share == 'Read' else 15)}", pie_chart)
 
-    workbook.close()
-    print(f"Excel file saved as {file_name}")
+    if owns_workbook:
+        workbook.close()
+        print(f"Excel file saved as {file_name}")
 
 
+@stat_profile.timed("xlsx")
+def save_table_sheet(workbook, sheet_name, headers, rows):
+    """
+    Write a table to its own worksheet, without charts.
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, headers)
+    for row_idx, row in enumerate(rows, start=1):
+        worksheet.write_row(row_idx, 0, row)
+
+
+@stat_profile.timed("csv")
+def save_csv_tables(tables):
+    """
+    Write the tables collected by display_statistics ({sheet: (headers, rows)}) as
+    one {sheet}.csv per table.
+    """
+    for sheet_name, (headers, rows) in tables.items():
+        file_name = f"{sheet_name}.csv"
+        with open(file_name, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(headers)
+            writer.writerows(rows)
+        print(f"CSV file saved as {file_name}")
+
+
+def json_document(file_labels, active_cpus, tables, interval_tables):
+    """
+    Everything a run displays as one JSON-serialisable document: the active CPU of
+    each file, the category tables and the per-interval tables of files with more
+    than one dump.
+    """
+    return {
+        "files": [{"label": file_label, "active_cpu": active_cpu}
+                  for file_label, active_cpu in zip(file_labels, active_cpus)],
+        "tables": {sheet_name: {"headers": headers, "rows": rows} for sheet_name, (headers, rows) in tables.items()},
+        "intervals": {file_label: {"headers": stat_parser.DUMP_INTERVAL_HEADERS, "rows": rows}
+                      for file_label, rows in zip(file_labels, interval_tables) if len(rows) >= 2},
+    }
+
+
+IPC_CPI_KEYS = ('cpi', 'ipc')
+
+DIST_HEADERS = ["File", "Distribution", "Samples", "Mean"] + [f"P{percent}" for percent in stat_dist.PERCENTILES] + \
+    ["Max"]
+DIST_CDF_HEADERS = ["File", "Distribution", "Upper Bound", "Cumulative (%)"]
+
+# Categories rendered straight from their labelled schema entries
+SCALAR_CATEGORIES = ["lsq", "cache", "bp", "icache", "l2cache", "tlb"]
+
+
+def schema_rows(category, stats_list, only=None, exclude=()):
+    """
+    One [label, value per file] row for each displayed schema entry of the category.
+    """
+    return [[label] + [stats.get(key, 'N/A') for stats in stats_list]
+            for key, label in stat_schema.category_entries(category)
+            if (only is None or key in only) and key not in exclude]
+
+
+def distribution_rows(file_label, stats):
+    """
+    Summary rows (DIST_HEADERS) and CDF rows (DIST_CDF_HEADERS) of the distribution
+    stats of one file: the active core's and system-wide ones first, then those of
+    each memory controller, after its average queue latency.
+    """
+    rows = []
+    cdf_rows = []
+    entries = stat_schema.category_entries("dist")
 
-def display_statistics(stats_list, file_labels, category):
+    def add(name, distribution):
+        if not isinstance(distribution, stat_dist.Distribution):
+            return
+        values = distribution.summary_values().values()
+        rows.append([file_label, name] + [value if value is not None else 'N/A' for value in values])
+        cdf_rows.extend([file_label, name, high, cumulative * 100] for high, cumulative in distribution.cdf())
+
+    for key, label in entries:
+        add(label, stats.get(key))
+    for mem_ctrl_id, mem_ctrl in sorted(stats['mem_ctrl_data'].items()):
+        if 'queue_latency' in mem_ctrl:
+            rows.append([file_label, f"Memory Controller {mem_ctrl_id} Queue Latency (average)", 'N/A',
+                         mem_ctrl['queue_latency']] + ['N/A'] * (len(DIST_HEADERS) - 4))
+        for key, label in entries:
+            add(f"Memory Controller {mem_ctrl_id} {label}", mem_ctrl.get(key))
+    return rows, cdf_rows
+
+
+def display_statistics(stats_list, file_labels, category, layout="columns", workbook=None,
+                       max_charts=DEFAULT_MAX_CHARTS, echo=True):
+    """
+    Print the category's tables (unless echo is False) and add them to the workbook,
+    if one is given. Returns the tables as {sheet name: (headers, rows)}.
+    """
+    tables = {}
     headers = ["Metric"] + file_labels
     rows = []
 
     if category == "cpu":
-        rows_general = [
-            ["Cycles"] + [stats.get('numCycles', 'N/A') for stats in stats_list],
-            ["Instructions Issued"] + [stats.get('instsIssued', 'N/A') for stats in stats_list],
-            ["Instructions Committed"] + [stats.get('committedInsts', 'N/A') for stats in stats_list]
-        ]
-
-        rows_ipc_cpi = [
-            ["CPI"] + [stats.get('cpi', 'N/A') for stats in stats_list],
-            ["IPC"] + [stats.get('ipc', 'N/A') for stats in stats_list]
-        ]
+        rows_general = schema_rows(category, stats_list, exclude=IPC_CPI_KEYS)
+        rows_ipc_cpi = schema_rows(category, stats_list, only=IPC_CPI_KEYS)
 
         headers_general = ["Metric"] + file_labels
         headers_ipc_cpi = ["Metric"] + file_labels
-        print("\nGeneral CPU Statistics:")
-        print(tabulate(rows_general, headers=headers_general, tablefmt="grid"))
-
-        print("\nIPC and CPI Statistics:")
-        print(tabulate(rows_ipc_cpi, headers=headers_ipc_cpi, tablefmt="grid"))
+        if echo:
+            print("\nGeneral CPU Statistics:")
+        rows_general, headers_general = print_table(rows_general, headers_general, layout, echo=echo)
 
-        save_to_excel(stats_list, file_labels, category, rows_general, rows_ipc_cpi, headers_general, headers_ipc_cpi)
-
-    elif category == "lsq":
-        rows = [
-            ["Forwarded Loads"] + [stats.get('lsq_forw_loads', 'N/A') for stats in stats_list],
-            ["Squashed Loads"] + [stats.get('lsq_squashed_loads', 'N/A') for stats in stats_list],
-            ["Squashed Stores"] + [stats.get('lsq_squashed_stores', 'N/A') for stats in stats_list],
-            ["Ignored Responses"] + [stats.get('lsq_ignored_responses', 'N/A') for stats in stats_list],
-            ["Memory Order Violations"] + [stats.get('lsq_mem_order_violations', 'N/A') for stats in stats_list],
-            ["Rescheduled Loads"] + [stats.get('lsq_rescheduled_loads', 'N/A') for stats in stats_list],
-            ["Blocked By Cache"] + [stats.get('lsq_blocked_by_cache', 'N/A') for stats in stats_list],
-        ]
-        print(tabulate(rows, headers=headers, tablefmt="grid"))
-        save_to_excel(stats_list, file_labels, category, rows, [], headers, [])
+        if echo:
+            print("\nIPC and CPI Statistics:")
+        rows_ipc_cpi, headers_ipc_cpi = print_table(rows_ipc_cpi, headers_ipc_cpi, layout, echo=echo)
 
+        tables[f"{category}_general"] = (headers_general, rows_general)
+        tables[f"{category}_ipc_cpi"] = (headers_ipc_cpi, rows_ipc_cpi)
+        if workbook is not None:
+            save_to_excel(stats_list, file_labels, category, rows_general, rows_ipc_cpi, headers_general,
+                          headers_ipc_cpi, layout, workbook, max_charts)
 
     elif category == "fu":
 
@@ -429,36 +393,28 @@ def display_statistics(stats_list, file_labels, category):
 
         rows = []
 
-        for fu_type in stats_list[0].get('FU_Busy', {}):
+        fu_types = dict.fromkeys(fu_type for stats in stats_list for fu_type in stats.get('FU_Busy', {}))
+
+        for fu_type in fu_types:
             row = [fu_type] + [stats.get('FU_Busy', {}).get(fu_type, {}).get('count', 0) for stats in stats_list]
 
             rows.append(row)
 
         rows = filter_non_zero_rows(rows)
 
-        print(tabulate(rows, headers=headers_fu, tablefmt="grid"))
-
-        save_to_excel(stats_list, file_labels, category, rows, [], headers_fu, [])
+        rows, headers_fu = print_table(rows, headers_fu, layout, echo=echo)
 
+        tables[f"{category}_general"] = (headers_fu, rows)
+        if workbook is not None:
+            save_to_excel(stats_list, file_labels, category, rows, [], headers_fu, [], layout, workbook, max_charts)
 
-    elif category == "cache":
-        rows = [
-            ["Cache Hits"] + [stats.get('cache_hits', 'N/A') for stats in stats_list],
-            ["Cache Misses"] + [stats.get('cache_misses', 'N/A') for stats in stats_list],
-            ["Cache Miss Rate"] + [stats.get('cache_miss_rate', 'N/A') for stats in stats_list],
-            ["Cache Miss Latency"] + [stats.get('cache_miss_latency', 'N/A') for stats in stats_list],
-        ]
-        print(tabulate(rows, headers=headers, tablefmt="grid"))
-        save_to_excel(stats_list, file_labels, category, rows, [], headers, [])
 
-    elif category == "bp":
-        rows = [
-            ["BTB Lookups"] + [stats.get('btb_lookups', 'N/A') for stats in stats_list],
-            ["BTB Hits"] + [stats.get('btb_hits', 'N/A') for stats in stats_list],
-            ["BTB Hit Ratio"] + [stats.get('btb_hit_ratio', 'N/A') for stats in stats_list],
-        ]
-        print(tabulate(rows, headers=headers, tablefmt="grid"))
-        save_to_excel(stats_list, file_labels, category, rows, [], headers, [])
+    elif category in SCALAR_CATEGORIES:
+        rows = schema_rows(category, stats_list)
+        rows, headers = print_table(rows, headers, layout, echo=echo)
+        tables[f"{category}_general"] = (headers, rows)
+        if workbook is not None:
+            save_to_excel(stats_list, file_labels, category, rows, [], headers, [], layout, workbook, max_charts)
 
 
     elif category == "mem_ctrl":
@@ -499,9 +455,12 @@ def display_statistics(stats_list, file_labels, category):
 
             mem_ctrl_table.append(row)
 
-        print(tabulate(mem_ctrl_table, headers=headers_mem_ctrl, tablefmt="grid"))
+        mem_ctrl_table, headers_mem_ctrl = print_table(mem_ctrl_table, headers_mem_ctrl, layout, "Metric", echo)
 
-        save_to_excel(stats_list, file_labels, category, mem_ctrl_table, [], headers_mem_ctrl, [])
+        tables[f"{category}_general"] = (headers_mem_ctrl, mem_ctrl_table)
+        if workbook is not None:
+            save_to_excel(stats_list, file_labels, category, mem_ctrl_table, [], headers_mem_ctrl, [], layout,
+                          workbook, max_charts)
 
 
     elif category == "mem_ctrl_balance":
@@ -522,32 +481,580 @@ def display_statistics(stats_list, file_labels, category):
         headers_mem_ctrl_balance = ["Memory Controller", "Read Bandwidth (Bytes/s)", "Write Bandwidth (Bytes/s)",
                                     "Read Bursts",
                                     "Write Bursts", "Queue Latency", "Total Accesses", "Read % Share", "Write % Share"]
-        print(tabulate(mem_ctrl_balance_table, headers=headers_mem_ctrl_balance, tablefmt="grid"))
-        save_to_excel(stats_list, file_labels, category, mem_ctrl_balance_table, [], headers_mem_ctrl_balance, [])
+        if echo:
+            print(format_table(mem_ctrl_balance_table, headers_mem_ctrl_balance))
+        tables[f"{category}_general"] = (headers_mem_ctrl_balance, mem_ctrl_balance_table)
+        if workbook is not None:
+            save_to_excel(stats_list, file_labels, category, mem_ctrl_balance_table, [], headers_mem_ctrl_balance, [],
+                          workbook=workbook, max_charts=max_charts)
+
+    elif category == "dist":
+        rows = []
+        cdf_rows = []
+        for file_label, stats in zip(file_labels, stats_list):
+            file_rows, file_cdf_rows = distribution_rows(file_label, stats)
+            rows.extend(file_rows)
+            cdf_rows.extend(file_cdf_rows)
+        if echo:
+            print(format_table(rows, DIST_HEADERS))
+        tables[f"{category}_general"] = (DIST_HEADERS, rows)
+        tables[f"{category}_cdf"] = (DIST_CDF_HEADERS, cdf_rows)
+        if workbook is not None:
+            save_table_sheet(workbook, f"{category}_general", DIST_HEADERS, rows)
+            save_table_sheet(workbook, f"{category}_cdf", DIST_CDF_HEADERS, cdf_rows)
+
+    return tables
+
+
+def core_metric_names(category, stats_list):
+    """
+    (flattened stat name, row label) pairs shown in the per-core table of a category.
+    """
+    if category == "fu":
+        fu_types = dict.fromkeys(fu_type for stats in stats_list for core_stats in stats.get('cpus', {}).values()
+                                 for fu_type in core_stats.get('FU_Busy', {}))
+        return [(f"FU_Busy.{fu_type}.count", fu_type) for fu_type in fu_types]
+    return stat_schema.category_entries(category)
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Extract and display specific statistics from gem5 stat files.")
-    parser.add_argument("file_paths", nargs='+', help="Paths to the stat files (up to 3)", metavar="FILE")
-    parser.add_argument("--category", choices=["cpu", "lsq", "fu", "cache", "bp", "mem_ctrl", "mem_ctrl_balance"],
-                        required=True, help="Category of statistics to display")
+def display_core_statistics(stats_list, file_labels, category, cpus=None, workbook=None, echo=True):
+    """
+    Print one per-core table of the category for every file: a column per selected
+    core (cpus: core numbers, or None for all) followed by the sum, mean, min and
+    max over those cores. Returns the tables as {sheet name: (headers, rows)}.
+    """
+    tables = {}
+    names = core_metric_names(category, stats_list)
+    for file_idx, (stats, file_label) in enumerate(zip(stats_list, file_labels)):
+        cores = stat_parser.core_names(stats, cpus)
+        if not cores:
+            continue
+        headers = ["Metric"] + cores + [aggregate.capitalize() for aggregate in stat_parser.AGGREGATES]
+        rows = []
+        for name, label in names:
+            aggregates = stat_parser.aggregate_cores(stats, name, cpus)
+            if not aggregates:
+                continue
+            row = [label]
+            for cpu in cores:
+                value = stat_parser.core_value(stats['cpus'][cpu], name)
+                row.append('N/A' if value is None else value)
+            rows.append(row + [aggregates[aggregate] for aggregate in stat_parser.AGGREGATES])
+        if category == "fu":
+            rows = filter_non_zero_rows(rows)
+
+        if echo:
+            print(f"\nPer-Core {category} Statistics for {file_label}:")
+        layout = "rows" if len(cores) > MAX_COLUMN_FILES else "columns"
+        rows, headers = print_table(rows, headers, layout, "Core", echo)
+        sheet_name = f"{category}_cores{file_idx}" if len(stats_list) > 1 else f"{category}_cores"
+        tables[sheet_name] = (headers, rows)
+        if workbook is not None:
+            save_table_sheet(workbook, sheet_name, headers, rows)
+    return tables
+
+
+def display_dump_intervals(interval_tables, file_labels):
+    """
+    Print the per-interval table of every file that had more than one dump selected.
+    """
+    for file_label, rows in zip(file_labels, interval_tables):
+        if len(rows) < 2:
+            continue
+        print(f"\nPer-Interval Statistics for {file_label}:")
+        print(format_table(rows, stat_parser.DUMP_INTERVAL_HEADERS))
 
-    args = parser.parse_args()
 
-    if len(args.file_paths) > 3:
-        print("Please provide up to 3 stat files for comparison.")
-        return
+FOLLOW_HEADERS = ["Dump", "Interval IPC", "Cache Miss Rate", "DRAM Read BW (Bytes/s)", "DRAM Write BW (Bytes/s)"]
+
+
+def follow_statistics(file_path, poll_interval=2.0, max_rows=20):
+    """
+    Show IPC, cache miss rate and DRAM bandwidth of each new dump of a stat file that is
+    still being written, until interrupted. On a terminal the table of the last max_rows
+    dumps is redrawn in place; otherwise only new rows are printed.
+    """
+    rows = collections.deque(maxlen=max_rows)
+    previous = None
+    redraw = sys.stdout.isatty()
+    print(f"Following {file_path} (Ctrl-C to stop)")
+    try:
+        for batch in stat_parser.follow_stats_dumps(file_path, poll_interval):
+            new_rows = []
+            for dump_index, active_cpu, stats in batch:
+                interval_row = stat_parser.dump_interval_row(dump_index, stats, previous)
+                new_rows.append([dump_index, interval_row[1], stats.get('cache_miss_rate', 'N/A'),
+                                 interval_row[3], interval_row[5]])
+                previous = stats
+            rows.extend(new_rows)
+            if redraw:
+                print("\033[2J\033[H", end="")
+                print(f"Following {file_path}: {rows[-1][0] + 1} dumps, updated {time.strftime('%H:%M:%S')}")
+            print(format_table(rows if redraw else new_rows, FOLLOW_HEADERS), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+CATEGORIES = ["cpu", "lsq", "fu", "cache", "bp", "mem_ctrl", "mem_ctrl_balance", "icache", "l2cache", "tlb", "dist"]
+
+
+def parse_categories(text):
+    """
+    Parse --category: one category, a comma-separated list, or 'all'.
+    """
+    if text == "all":
+        return list(CATEGORIES)
+    categories = [category.strip() for category in text.split(",") if category.strip()]
+    unknown = [category for category in categories if category not in CATEGORIES]
+    if unknown or not categories:
+        raise argparse.ArgumentTypeError(
+            f"invalid category {', '.join(unknown) or text!r} (choose from {', '.join(CATEGORIES)} or all)")
+    return list(dict.fromkeys(categories))
+
+
+def parse_cpu_selection(text):
+    """
+    Parse a --cpus value: 'all', or a comma-separated list of core numbers, 'cpuN'
+    names and ranges like 0-7. Returns None for all cores, otherwise a set of numbers.
+    """
+    if text == 'all':
+        return None
+    cpus = set()
+    try:
+        for part in text.split(','):
+            bounds = [bound.strip() for bound in part.split('-')]
+            bounds = [int(bound[len('cpu'):] if bound.startswith('cpu') else bound) for bound in bounds]
+            if len(bounds) > 2:
+                raise ValueError(part)
+            cpus.update(range(bounds[0], bounds[-1] + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid CPU selection: {text!r}")
+    return cpus
+
+
+def non_negative_int(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative integer, got {text}")
+    return value
+
+
+def category_tables(stats_list, file_labels, category):
+    """
+    The tables of one category, as display_statistics returns them, without printing;
+    for the stat server.
+    """
+    if category not in CATEGORIES:
+        raise ValueError(f"unknown category {category!r} (choose from {', '.join(CATEGORIES)})")
+    return display_statistics(stats_list, file_labels, category, echo=False)
+
+
+def config_key_list(text):
+    try:
+        return stat_sweep.parse_config_keys(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def sweep_table(file_labels, file_paths, configs, config_keys):
+    """
+    The runs of a sweep with their config values, as a (headers, rows) table.
+    """
+    headers = ["Run", "Path"] + config_keys
+    rows = [[file_label, file_path] + [stat_sweep.format_config_value(key, config[key]) if key in config else 'N/A'
+                                       for key in config_keys]
+            for file_label, file_path, config in zip(file_labels, file_paths, configs)]
+    return headers, rows
+
+
+def print_sweep_summary(file_paths, configs, config_keys):
+    print(f"Found {len(file_paths)} runs")
+    for key in config_keys:
+        raw_values = sorted({config[key] for config in configs if key in config},
+                            key=lambda value: stat_sweep.sort_key([value]))
+        values = [stat_sweep.format_config_value(key, value) for value in raw_values]
+        if values:
+            shown = ', '.join(values[:8]) + (', ...' if len(values) > 8 else '')
+            print(f"  {key}: {len(values)} value{'s' if len(values) > 1 else ''} ({shown})")
+
+
+def derived_metric(text):
+    try:
+        return stat_derive.parse_definition(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 
+def derived_metric_file(path):
+    try:
+        return stat_derive.read_definitions(path)
+    except OSError as e:
+        raise argparse.ArgumentTypeError(f"cannot read {path}: {e.strerror}")
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"{path}: {e}")
+
+
+def add_derived_stats(stats_list, rows, values):
+    """
+    Store the derived metrics of each file's last dump under stats['derived'], leaving
+    out undefined (NaN) values, so grouping and export treat them like parsed stats.
+    """
+    last_rows = {file_index: row for row, (file_index, dump_index) in enumerate(rows)}
+    for file_index, row in last_rows.items():
+        stats_list[file_index]['derived'] = {name: float(column[row]) for name, column in values.items()
+                                             if not math.isnan(column[row])}
+
+
+def derived_table(stats_list, file_labels, metric_names):
+    """
+    One [metric, value per file] row for each derived metric.
+    """
+    return ["Metric"] + file_labels, [[name] + [stats.get('derived', {}).get(name, 'N/A') for stats in stats_list]
+                                      for name in metric_names]
+
+
+def derived_dumps_table(file_labels, rows, values):
+    """
+    The derived metrics of every selected dump of every file, a row per dump.
+    """
+    headers = ["File", "Dump"] + list(values)
+    table = [[file_labels[file_index], dump_index] + [float(column[row]) if not math.isnan(column[row]) else 'N/A'
+                                                      for column in values.values()]
+             for row, (file_index, dump_index) in enumerate(rows)]
+    return headers, table
+
+
+def report_files(args):
+    """
+    Parse the files of a (non-follow) run and show, save or export their statistics.
+    """
+    file_paths = args.file_paths
+    if args.sweep:
+        with stat_profile.stage("discover"):
+            file_paths = stat_sweep.discover_runs(args.file_paths, args.pattern)
+        if not file_paths:
+            print(f"No files named {args.pattern} found under {', '.join(args.file_paths)}")
+            return
+    # A sweep reads every named config key; plain runs only those used for labels and groups.
+    config_keys = list(dict.fromkeys((list(stat_sweep.CONFIG_KEYS) if args.sweep else []) + (args.label_by or []) +
+                                     (args.group_by or [])))
+    configs = None
+    if config_keys:
+        with stat_profile.stage("config"):
+            configs = list(stat_parser.iter_files(stat_sweep.read_run_config, file_paths, args.jobs, config_keys))
+
+    cache = None
+    if not args.no_cache:
+        cache = stat_cache.StatCache(args.cache_dir, args.cache_size * 2 ** 20, stat_parser.CACHE_VERSION)
+    # An index scan only reads the displayed categories; an export needs every stat.
+    categories = None
+    if args.export is None and args.category is not None:
+        categories = ["mem_ctrl" if category == "mem_ctrl_balance" else category for category in args.category]
+    try:
+        with stat_profile.stage("parse"):
+            profiles = stat_profile.ACTIVE.files if stat_profile.ACTIVE is not None else None
+            records = stat_parser.parse_files(file_paths, args.dumps, args.jobs, cache, args.scan,
+                                              profiles=profiles, categories=categories)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    finally:
+        if cache is not None:
+            cache.close()
+
+    # JSON goes to stdout on its own; the tables and status messages are left out.
+    echo = args.format != "json"
+    file_labels = stat_sweep.run_labels(file_paths)
+    if args.label_by:
+        file_labels = stat_sweep.config_labels(configs, args.label_by, file_labels)
     stats_list = []
-    file_labels = []
-    for file_path in args.file_paths:
-        active_cpu = find_active_cpu(file_path)
-        stats = extract_cpu_statistics(file_path, active_cpu)
+    active_cpus = []
+    interval_tables = []
+    for file_path, (active_cpu, stats, interval_rows) in zip(file_paths, records):
+        # A sweep has too many runs to report each one's active CPU.
+        if echo and not args.sweep:
+            report_active_cpu(active_cpu, stats)
         stats_list.append(stats)
-        file_labels.append(file_path.split('/')[-1])
+        active_cpus.append(active_cpu)
+        interval_tables.append(interval_rows)
 
-    display_statistics(stats_list, file_labels, args.category)
+    metric_names = []
+    tables = {}
+    if args.metrics:
+        try:
+            with stat_profile.stage("derive"):
+                rows, values = stat_derive.derive_files(args.metrics, file_paths, args.dumps, args.jobs)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        metric_names = list(values)
+        add_derived_stats(stats_list, rows, values)
+        if len(rows) > len(file_paths):
+            tables["derived_dumps"] = derived_dumps_table(file_labels, rows, values)
+    if args.sweep:
+        tables["sweep_runs"] = sweep_table(file_labels, file_paths, configs, config_keys)
+        if echo:
+            print_sweep_summary(file_paths, configs, config_keys)
+    if args.export is not None:
+        with stat_profile.stage("export"):
+            stat_export.write_table(args.export, file_paths, stats_list, configs)
+        if echo:
+            print(f"Table with {len(stats_list)} runs saved as {args.export}")
+    if args.group_by:
+        file_labels, stats_list = stat_sweep.group_stats(stats_list, configs, args.group_by, args.aggregate)
+        active_cpus = [None] * len(file_labels)
+        interval_tables = [[]] * len(file_labels)
+        if echo:
+            print(f"Showing the {args.aggregate} of {len(file_paths)} runs in {len(file_labels)} "
+                  f"group{'s' if len(file_labels) > 1 else ''} by "
+                  f"{', '.join(args.group_by)}")
+    if args.category is None and not tables and not metric_names:
+        return
+
+    layout = args.layout
+    if layout == "auto":
+        layout = "rows" if len(file_labels) > MAX_COLUMN_FILES else "columns"
+
+    if metric_names:
+        headers, rows = derived_table(stats_list, file_labels, metric_names)
+        if echo:
+            print("\nDerived Metrics:")
+        rows, headers = print_table(rows, headers, layout, echo=echo)
+        tables["derived"] = (headers, rows)
+        if echo and "derived_dumps" in tables:
+            print("\nDerived Metrics per Dump:")
+            print(format_table(tables["derived_dumps"][1], tables["derived_dumps"][0]))
+
+    categories = args.category or []
+    if not categories:
+        base_name = "sweep_statistics" if args.sweep else "derived_statistics"
+    elif len(categories) == 1:
+        base_name = f"{categories[0]}_statistics"
+    else:
+        base_name = "all_statistics" if categories == CATEGORIES else f"{'_'.join(categories)}_statistics"
+    workbook = new_workbook(f"{base_name}.xlsx") if args.format == "xlsx" else None
+    if workbook is not None:
+        for sheet_name, (headers, rows) in tables.items():
+            save_table_sheet(workbook, sheet_name, headers, rows)
+    for category in categories:
+        if echo and len(categories) > 1:
+            Fore, Style = terminal_colors()
+            print(f"\n{Fore.CYAN}== {category} =={Style.RESET_ALL}")
+        tables.update(display_statistics(stats_list, file_labels, category, layout, workbook, args.max_charts, echo))
+        if args.cpus is not False and category in stat_schema.per_core_categories():
+            tables.update(display_core_statistics(stats_list, file_labels, category, args.cpus, workbook, echo))
+    if workbook is not None:
+        with stat_profile.stage("xlsx"):
+            workbook.close()
+        print(f"Excel file saved as {base_name}.xlsx")
+    if args.format == "csv":
+        save_csv_tables(tables)
+    if args.format == "json":
+        with stat_profile.stage("json"):
+            json.dump(json_document(file_labels, active_cpus, tables, interval_tables), sys.stdout)
+            print()
+    else:
+        display_dump_intervals(interval_tables, file_labels)
+
+
+def non_negative_float(text):
+    value = float(text)
+    if not value >= 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative number, got {text}")
+    return value
+
+
+def report_diff(args):
+    """
+    Compare every stat of each file against the first one and show, save or print the
+    per-run summary and the biggest movers of each run.
+    """
+    baseline_path, file_paths = args.file_paths[0], args.file_paths[1:]
+    try:
+        with stat_profile.stage("parse"):
+            result = stat_diff.diff_files(baseline_path, file_paths, args.dumps, args.jobs,
+                                          name_filter=args.diff_filter, min_relative=args.min_change / 100,
+                                          min_absolute=args.min_delta, top=args.top)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    tables = stat_diff.diff_tables(file_paths, result)
+
+    if args.format == "json":
+        with stat_profile.stage("json"):
+            json.dump({"baseline": baseline_path, "stats": len(result['names']),
+                       "tables": {sheet_name: {"headers": headers, "rows": rows}
+                                  for sheet_name, (headers, rows) in tables.items()}}, sys.stdout)
+            print()
+        return
+
+    print(f"Baseline {baseline_path}: {len(result['names'])} stats aligned over {len(args.file_paths)} runs")
+    for sheet_name, (headers, rows) in tables.items():
+        print(format_table(rows, headers))
+    if args.format == "xlsx":
+        workbook = new_workbook("diff_statistics.xlsx")
+        for sheet_name, (headers, rows) in tables.items():
+            save_table_sheet(workbook, sheet_name, headers, rows)
+        with stat_profile.stage("xlsx"):
+            workbook.close()
+        print("Excel file saved as diff_statistics.xlsx")
+    elif args.format == "csv":
+        save_csv_tables(tables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract and display specific statistics from gem5 stat files.")
+    parser.add_argument("file_paths", nargs='+', help="Paths to the stat files", metavar="FILE")
+    parser.add_argument("--category", type=parse_categories, metavar="CATEGORY",
+                        help=f"Category of statistics to display ({', '.join(CATEGORIES)}), a comma-separated "
+                             "list of them, or 'all'. Several categories share one workbook with a sheet per category. "
+                             "Required unless --export, --derive, --follow, --serve, --sweep or --diff is given")
+    parser.add_argument("--dumps", type=parse_dump_selection, default=stat_parser.LAST_DUMP, metavar="SPEC",
+                        help="Stat dump blocks to parse: 'all', an index (e.g. 0, -1) or a range (e.g. 2:10, -5:). "
+                             "Categories show the last selected dump; with several dumps a per-interval "
+                             "table is printed as well (default: -1, the last dump)")
+    # None selects every core, so "not given" is False.
+    parser.add_argument("--cpus", type=parse_cpu_selection, default=False, metavar="SPEC",
+                        help="Also show per-core tables with the sum, mean, min and max over the cores for the "
+                             "per-CPU categories (" + ", ".join(stat_schema.per_core_categories()) + "): 'all', "
+                             "or core numbers and ranges such as 0,2,4-7")
+    parser.add_argument("--jobs", "-j", type=non_negative_int, default=1, metavar="N",
+                        help="Parse files in N worker processes (0: one per CPU core, default: 1)")
+    parser.add_argument("--layout", choices=["auto", "columns", "rows"], default="auto",
+                        help="Put files on table columns or rows (auto: rows when more than "
+                             f"{MAX_COLUMN_FILES} files are given)")
+    parser.add_argument("--scan", choices=stat_parser.SCAN_MODES, default="mmap",
+                        help="How files are read: 'mmap' scans the mapped bytes for tracked stats only, "
+                             "'lines' reads and decodes every line, 'index' seeks to the selected dumps and "
+                             "categories through a <file>.idx sidecar index, built on first use "
+                             "(default: %(default)s)")
+    parser.add_argument("--cache-dir", default=stat_cache.DEFAULT_CACHE_DIR,
+                        help="Directory of the parsed-stats cache (default: %(default)s)")
+    parser.add_argument("--cache-size", type=non_negative_int, default=stat_cache.DEFAULT_MAX_BYTES // 2 ** 20,
+                        metavar="MB", help="Size cap of the parsed-stats cache in MB (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="Always parse files, bypassing the cache")
+    parser.add_argument("--follow", action="store_true",
+                        help="Follow a single stat file that is still being written and show IPC, cache miss rate "
+                             "and DRAM bandwidth of each new dump as it completes")
+    parser.add_argument("--poll", type=float, default=2.0, metavar="SECONDS",
+                        help="Polling interval of --follow and --serve (default: %(default)s)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Load the given stat files, and those under the given directories, once and answer "
+                             "run, metric and category queries as JSON over HTTP on localhost; new and modified "
+                             "files are reparsed as they appear")
+    # stat_server (and asyncio) are only imported for --serve, so its default port is applied there.
+    parser.add_argument("--port", type=non_negative_int, metavar="PORT",
+                        help="With --serve, the port to listen on at 127.0.0.1 (default: 8350)")
+    parser.add_argument("--pattern", default=stat_sweep.DEFAULT_PATTERN, metavar="GLOB",
+                        help="With --serve or --sweep, the names of the stat files looked for under directories "
+                             "(default: %(default)s)")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Treat each FILE as a directory, or a quoted glob pattern ('**' recurses), to search "
+                             "for runs: every directory holding a file named --pattern, such as m5out/stats.txt. "
+                             "Runs are labelled by their directory, and cache sizes, CPU and DRAM types are read "
+                             "from the config.ini or config.json next to each stat file")
+    parser.add_argument("--label-by", type=config_key_list, metavar="KEYS",
+                        help="Label runs by these config values: " + ", ".join(stat_sweep.CONFIG_KEYS) +
+                             ", or parameter names such as system.cpu.numROBEntries, comma-separated")
+    parser.add_argument("--group-by", type=config_key_list, metavar="KEYS",
+                        help="Show one column per group of runs with the same values of these config keys "
+                             "(as for --label-by), aggregating their stats with --aggregate")
+    parser.add_argument("--aggregate", choices=list(stat_sweep.AGGREGATES), default="mean",
+                        help="With --group-by, how the stats of a group's runs are combined (default: %(default)s)")
+    parser.add_argument("--derive", type=derived_metric, action="append", default=[], metavar="'NAME = EXPR'",
+                        help="Show a metric computed from stat names, e.g. "
+                             "'mpki = cpu*.dcache.overallMisses::total / cpu*.committedInsts * 1000'. A name may be "
+                             "the end of a stat name, 'mem_ctrls*' sums the stats it matches and '{x}' in both the "
+                             "name and the expression makes one metric per match. Can be given several times")
+    parser.add_argument("--derive-file", type=derived_metric_file, action="append", default=[], metavar="FILE",
+                        help="Read --derive definitions from FILE, one per line ('#' starts a comment line)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="xlsx",
+                        help="Output of the displayed tables: printed and saved as an Excel workbook with charts, "
+                             "printed and saved as one CSV per sheet, printed only (none), or written to stdout as "
+                             "one JSON document instead of being printed (default: %(default)s)")
+    parser.add_argument("--no-excel", dest="format", action="store_const", const="none",
+                        help="Only print the tables; same as --format none")
+    parser.add_argument("--max-charts", type=non_negative_int, default=DEFAULT_MAX_CHARTS, metavar="N",
+                        help="Charts per sheet for categories charted per metric, controller or file "
+                             "(lsq, cache, mem_ctrl, mem_ctrl_balance); 0 disables charts (default: %(default)s)")
+    parser.add_argument("--diff", action="store_true",
+                        help="Compare every stat, tracked or not, of each file against the first file (the baseline) "
+                             "and rank the biggest relative changes of each run")
+    parser.add_argument("--diff-filter", metavar="REGEX",
+                        help="With --diff, only compare stats whose names match REGEX (e.g. 'dcache|mem_ctrls')")
+    parser.add_argument("--min-change", type=non_negative_float, default=0.0, metavar="PCT",
+                        help="With --diff, ignore changes below PCT percent of the baseline (default: %(default)s)")
+    parser.add_argument("--min-delta", type=non_negative_float, default=0.0, metavar="VALUE",
+                        help="With --diff, ignore changes smaller than VALUE in absolute terms (default: %(default)s)")
+    parser.add_argument("--top", type=non_negative_int, default=stat_diff.DEFAULT_TOP, metavar="N",
+                        help="With --diff, list the N biggest movers of each run (default: %(default)s)")
+    parser.add_argument("--profile", nargs='?', const="profile.json", metavar="JSON",
+                        help="Time the stages of the run (parse, derive, export, tabulate, xlsx, csv, json), count "
+                             "the lines scanned and the matches per stat in each file, record peak memory, and write "
+                             "the summary as JSON (default: %(const)s)")
+    parser.add_argument("--pstats", metavar="FILE", help="With --profile, also dump cProfile statistics to FILE")
+    parser.add_argument("--export", metavar="TABLE",
+                        help="Write every parsed stat as a columnar table with one row per file "
+                             f"({', '.join(stat_export.FORMATS)}; needs numpy, and pyarrow for Parquet/Feather)")
+
+    args = parser.parse_args()
+    # Definitions from files come first so the ones given inline can use them.
+    args.metrics = tuple(metric for metrics in args.derive_file for metric in metrics) + tuple(args.derive)
+    if args.follow:
+        if len(args.file_paths) != 1:
+            parser.error("--follow takes exactly one stat file")
+        if stat_parser.detect_compression(args.file_paths[0]) is not None:
+            parser.error("--follow needs an uncompressed stat file")
+        follow_statistics(args.file_paths[0], args.poll)
+        return
+    if args.serve:
+        import stat_server
+        port = stat_server.DEFAULT_PORT if args.port is None else args.port
+        stat_server.serve(args.file_paths, category_tables, port, args.poll, args.pattern, args.jobs,
+                          None if args.no_cache else args.cache_dir, args.cache_size * 2 ** 20)
+        return
+    if args.sweep and args.diff:
+        parser.error("--sweep cannot be combined with --diff")
+    if args.diff and (args.label_by or args.group_by):
+        parser.error("--label-by and --group-by cannot be combined with --diff")
+    if args.diff and args.metrics:
+        parser.error("--derive cannot be combined with --diff")
+    if args.diff:
+        if len(args.file_paths) < 2:
+            parser.error("--diff needs a baseline and at least one other stat file")
+        if args.diff_filter is not None:
+            try:
+                re.compile(args.diff_filter)
+            except re.error as e:
+                parser.error(f"invalid --diff-filter: {e}")
+    elif args.category is None and args.export is None and not args.sweep and not args.metrics:
+        parser.error("--category is required unless --export, --derive, --follow, --serve, --sweep or --diff "
+                     "is given")
+    if args.export is not None:
+        try:
+            stat_export.table_format(args.export)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.pstats is not None and args.profile is None:
+        parser.error("--pstats needs --profile")
+    report = report_diff if args.diff else report_files
+    if args.profile is None:
+        report(args)
+        return
 
+    profiler = stat_profile.start()
+    profile = None
+    if args.pstats is not None:
+        import cProfile
+        profile = cProfile.Profile()
+    try:
+        if profile is not None:
+            profile.enable()
+        report(args)
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.pstats)
+            print(f"cProfile statistics saved as {args.pstats} (read them with python -m pstats)", file=sys.stderr)
+        profiler.write(args.profile)
 
 if __name__ == "__main__":
     main()
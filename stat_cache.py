@@ -0,0 +1,123 @@
+"""
+Persistent cache of parsed stat file records.
+
+Records are stored in a SQLite database under the cache directory, keyed by the
+resolved file path and the dump selection. An entry is valid while the file's
+size and mtime are unchanged; if only the mtime moved (e.g. the file was copied,
+touched or rewritten by a re-run), a digest of the whole content decides. The
+database is kept under a size cap by evicting the least recently used entries.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+import stat_dist
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                                 "gem5-stat-parser")
+DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+# Files are hashed in blocks of this size.
+DIGEST_BLOCK_BYTES = 2 ** 20
+
+
+def file_digest(file_path):
+    """
+    Digest of the whole content of a file, read block by block.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        while block := file.read(DIGEST_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StatCache:
+    """
+    SQLite-backed store of parsed records. version identifies the record format;
+    a database written with another version is cleared on open.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, version=1):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(os.path.join(cache_dir, "records.sqlite"))
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != version:
+            self.connection.execute("DROP TABLE IF EXISTS records")
+            self.connection.execute(f"PRAGMA user_version = {int(version)}")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                path TEXT NOT NULL,
+                selection TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                record BLOB NOT NULL,
+                PRIMARY KEY (path, selection)
+            )""")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, file_path, selection):
+        """
+        Return the cached record for file_path and selection, or None on a miss.
+        """
+        path = os.path.realpath(file_path)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, digest, record FROM records WHERE path = ? AND selection = ?",
+            (path, selection)).fetchone()
+        if row is None:
+            return None
+
+        size, mtime_ns, digest, record = row
+        file_stat = os.stat(path)
+        if file_stat.st_size != size:
+            return None
+        if file_stat.st_mtime_ns != mtime_ns:
+            if file_digest(path) != digest:
+                return None
+            mtime_ns = file_stat.st_mtime_ns
+
+        self.connection.execute(
+            "UPDATE records SET last_used = ?, mtime_ns = ? WHERE path = ? AND selection = ?",
+            (time.time(), mtime_ns, path, selection))
+        self.connection.commit()
+        return json.loads(zlib.decompress(record), object_hook=stat_dist.json_object_hook)
+
+    def put(self, file_path, selection, record):
+        """
+        Store a JSON-serialisable record (Distributions included) for file_path and selection, then evict
+        least recently used entries until the cache is under its size cap.
+        """
+        path = os.path.realpath(file_path)
+        file_stat = os.stat(path)
+        blob = zlib.compress(json.dumps(record, separators=(',', ':'), default=stat_dist.json_default).encode())
+        self.connection.execute(
+            "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, selection, file_stat.st_size, file_stat.st_mtime_ns, file_digest(path),
+             time.time(), blob))
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        total = self.connection.execute("SELECT COALESCE(SUM(LENGTH(record)), 0) FROM records").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for path, selection, length in self.connection.execute(
+                "SELECT path, selection, LENGTH(record) FROM records ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM records WHERE path = ? AND selection = ?", (path, selection))
+            total -= length
@@ -0,0 +1,488 @@
+"""
+Derived metrics: named arithmetic expressions over stat names.
+
+    mpki = cpu*.dcache.overallMisses::total / cpu*.committedInsts * 1000
+    clusters.{cpu}.mpki = clusters.{cpu}.dcache.overallMisses::total / clusters.{cpu}.committedInsts * 1000
+    dram_reads = mem_ctrls*.readBursts
+    mem_ctrl_data.{ctrl}.read_share = coalesce(mem_ctrl_data.{ctrl}.bw_read / mem_ctrl_data.*.bw_read * 100, 0)
+
+A reference names a stat by its full name or by a trailing part of it that starts
+at a '.' (committedInsts matches system.cpu.committedInsts). When names at several
+depths match, the shallowest wins, so system.cpu.committedInsts is preferred over
+system.cpu.commit.committedInsts. A '*' inside a name matches any part of one name
+component, and the reference is the sum of every stat it matches. Without a '*'
+a reference must match a single stat per run. A '{name}' placeholder matches one
+component and makes one metric per value found, e.g. one read share per
+controller. Names that are not plain identifiers, such as buckets like '::0-7',
+go between backquotes. A '*' directly between name characters is a wildcard. Put
+spaces around '*' to multiply two names.
+
+Expressions support + - * / **, parentheses, numbers and the functions in
+FUNCTIONS. Missing stats are NaN, and so are results that are undefined, like
+0/0. coalesce(x, default) turns NaN back into a value.
+
+An expression is parsed and checked once into a Python code object. The same code
+evaluates one stats dict with floats (evaluate_stats), or a whole matrix of
+runs and dumps with NumPy arrays (evaluate_rows, derive_files), with one array
+operation per operator whatever the number of rows. compile_nested binds metrics
+to the stat names of a nested stats dict once and compiles them into a single
+code object that reads those stats directly, for evaluating many dicts with the
+same names (the parser's per-dump stat_schema.DERIVED stats).
+
+NumPy is imported when a matrix is evaluated. stat_parser, which compiles
+stat_schema.DERIVED with this module, and stat_diff are imported by derive_files,
+so this module imports no other module of the package.
+"""
+import ast
+import copy
+import functools
+import math
+import re
+
+# A '*' is a wildcard only when a name continues after it; otherwise it multiplies.
+WILDCARD = r'\*(?=[A-Za-z_{.]|::)'
+NAME_CHARACTER = r'(?:\w|\{\w+\}|' + WILDCARD + r')'
+REFERENCE = (r'(?:[A-Za-z_]|\{\w+\}|\*(?=\.|::))' + NAME_CHARACTER + r'*'
+             r'(?:(?:\.|::)' + NAME_CHARACTER + r'+)*')
+TOKEN = re.compile(r'`([^`]+)`|(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|(' + REFERENCE + r')')
+PLACEHOLDER = re.compile(r'\{(\w+)\}')
+DEFINITION = re.compile(r'\s*([^=\s]+)\s*=(?!=)(.+)')
+
+BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+UNARY_OPERATORS = (ast.UAdd, ast.USub)
+
+
+def scalar_divide(numerator, denominator):
+    if denominator == 0:
+        if numerator == 0 or math.isnan(numerator):
+            return math.nan
+        return math.copysign(math.inf, numerator) * math.copysign(1, denominator)
+    return numerator / denominator
+
+
+def scalar_power(base, exponent):
+    try:
+        return math.pow(base, exponent)
+    except ValueError:
+        return math.inf if base == 0 else math.nan
+    except OverflowError:
+        return math.inf
+
+
+def scalar_function(function):
+    """
+    A float function that returns NaN where it is undefined, as NumPy's ufuncs do.
+    """
+    def wrapper(*args):
+        if any(math.isnan(arg) for arg in args):
+            return math.nan
+        try:
+            return function(*args)
+        except (ValueError, OverflowError):
+            return -math.inf if function is math.log and args[0] == 0 else math.nan
+    return wrapper
+
+
+def scalar_coalesce(value, default):
+    return default if math.isnan(value) else value
+
+
+SCALAR_NAMESPACE = {
+    '_divide': scalar_divide,
+    '_power': scalar_power,
+    'min': scalar_function(min),
+    'max': scalar_function(max),
+    'abs': abs,
+    'sqrt': scalar_function(math.sqrt),
+    'log': scalar_function(math.log),
+    'coalesce': scalar_coalesce,
+}
+
+# Globals the compiled code runs with on floats: the functions and no builtins.
+SCALAR_GLOBALS = {'__builtins__': {}, **SCALAR_NAMESPACE}
+
+FUNCTIONS = ('min', 'max', 'abs', 'sqrt', 'log', 'coalesce')
+
+
+@functools.lru_cache(maxsize=1)
+def array_namespace():
+    import numpy as np
+
+    def guarded(function):
+        def wrapper(*args):
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                return function(*args)
+        return wrapper
+
+    divide = guarded(np.divide)
+
+    return {
+        '__builtins__': {},
+        '_divide': divide,
+        '_power': guarded(np.float_power),
+        'min': lambda *args: functools.reduce(np.minimum, args),
+        'max': lambda *args: functools.reduce(np.maximum, args),
+        'abs': np.abs,
+        'sqrt': guarded(np.sqrt),
+        'log': guarded(np.log),
+        'coalesce': lambda value, default: np.where(np.isnan(value), default, value),
+    }
+
+
+class Reference:
+    """
+    One stat reference of an expression: its text, whether it sums a wildcard, the
+    placeholders in it, and a regex over full stat names whose 'prefix' group is the
+    part of the name before the reference.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.wildcard = '*' in text
+        self.placeholders = PLACEHOLDER.findall(text)
+        if len(set(self.placeholders)) != len(self.placeholders):
+            raise ValueError(f"placeholder repeated in {text!r}")
+        self.regex = re.compile(r'(?P<prefix>(?:\S*\.)?)' + name_regex(text))
+
+
+def name_regex(text, capture=True):
+    """
+    A stat name with wildcards and placeholders as a regex over one or more name components.
+    """
+    parts = []
+    position = 0
+    for match in re.finditer(r'\*|\{(\w+)\}', text):
+        parts.append(re.escape(text[position:match.start()]))
+        if match.group(1) is None:
+            parts.append(r'[^.:\s]*')
+        else:
+            parts.append(f"(?P<{match.group(1)}>[^.:\\s]+)" if capture else r'[^.:\s]+')
+        position = match.end()
+    parts.append(re.escape(text[position:]))
+    return ''.join(parts)
+
+
+class Expression(ast.NodeTransformer):
+    """
+    Check the parsed expression against the supported syntax and route division and
+    powers through _divide and _power, so that division by zero and the like give inf
+    or NaN with floats as they do with arrays.
+    """
+
+    def __init__(self, reference_names):
+        self.reference_names = reference_names
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, BINARY_OPERATORS):
+            raise ValueError(f"unsupported operator {type(node.op).__name__}")
+        node = self.generic_visit(node)
+        for operator, function in ((ast.Div, '_divide'), (ast.Pow, '_power')):
+            if isinstance(node.op, operator):
+                return ast.copy_location(ast.Call(ast.Name(function, ast.Load()), [node.left, node.right], []), node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, UNARY_OPERATORS):
+            raise ValueError(f"unsupported operator {type(node.op).__name__}")
+        return self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise ValueError(f"unknown function (use {', '.join(FUNCTIONS)})")
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+    def visit_Name(self, node):
+        if node.id not in self.reference_names:
+            raise ValueError(f"unknown name {node.id!r}")
+        return node
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise ValueError(f"unsupported constant {node.value!r}")
+        return node
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Load) + BINARY_OPERATORS + UNARY_OPERATORS):
+            raise ValueError(f"unsupported syntax {type(node).__name__}")
+        return super().generic_visit(node)
+
+
+class DerivedMetric:
+    """
+    A compiled definition: the metric name (a template if it has placeholders), its
+    references, and its checked syntax tree and the code object evaluating it from
+    variables _r0, _r1, ...
+    """
+
+    def __init__(self, name, expression):
+        self.name = name
+        self.expression = expression.strip()
+        self.placeholders = PLACEHOLDER.findall(name)
+        references = {}
+
+        def replace(match):
+            quoted, number, reference = match.groups()
+            if number is not None:
+                return number
+            text = quoted if quoted is not None else reference
+            if quoted is None and text in FUNCTIONS and self.expression[match.end():].lstrip().startswith('('):
+                return text
+            if text not in references:
+                references[text] = f"_r{len(references)}"
+            return references[text]
+
+        source = TOKEN.sub(replace, self.expression)
+        try:
+            tree = ast.parse(source.strip(), mode='eval')
+        except SyntaxError:
+            raise ValueError(f"invalid expression for {name}: {self.expression!r}") from None
+        try:
+            tree = ast.fix_missing_locations(Expression(set(references.values())).visit(tree))
+        except ValueError as e:
+            raise ValueError(f"invalid expression for {name}: {e}") from None
+        self.references = [Reference(text) for text in references]
+        self.tree = tree
+        self.code = compile(tree, f"<{name}>", 'eval')
+
+        used = {placeholder for reference in self.references for placeholder in reference.placeholders}
+        if set(self.placeholders) != used:
+            raise ValueError(f"{name}: placeholders of the name and of the expression must be the same")
+        if self.placeholders and not any(set(reference.placeholders) == set(self.placeholders)
+                                         for reference in self.references):
+            raise ValueError(f"{name}: one reference must use every placeholder of the name")
+
+    def __repr__(self):
+        return f"DerivedMetric({self.name} = {self.expression})"
+
+    def bind(self, names):
+        """
+        Resolve the references against stat names. Returns [(metric name, [column
+        indexes of names per reference], [wildcard flag per reference])], one entry per
+        placeholder instance found.
+        """
+        # matches[reference][instance] = (depth, [column indexes]) keeping the shallowest
+        matches = [{} for reference in self.references]
+        for column, name in enumerate(names):
+            for reference, found in zip(self.references, matches):
+                match = reference.regex.fullmatch(name)
+                if match is None:
+                    continue
+                depth = match.group('prefix').count('.')
+                instance = tuple(match.group(placeholder) for placeholder in reference.placeholders)
+                best = found.get(instance)
+                if best is None or depth < best[0]:
+                    found[instance] = (depth, [column])
+                elif depth == best[0]:
+                    best[1].append(column)
+
+        # One metric per placeholder values found by a reference that has them all.
+        instances = set() if self.placeholders else {()}
+        for reference, found in zip(self.references, matches):
+            if set(reference.placeholders) == set(self.placeholders):
+                instances.update(tuple(sorted(zip(reference.placeholders, instance))) for instance in found)
+
+        bound = []
+        for instance in sorted(instances):
+            values = dict(instance)
+            columns = []
+            for reference, found in zip(self.references, matches):
+                key = tuple(values[placeholder] for placeholder in reference.placeholders)
+                columns.append(found.get(key, (0, []))[1])
+            name = PLACEHOLDER.sub(lambda match: values[match.group(1)], self.name)
+            bound.append((name, columns, [reference.wildcard for reference in self.references]))
+        return bound
+
+
+def parse_definition(text):
+    """
+    'name = expression' as a DerivedMetric. Raises ValueError if it is not valid.
+    """
+    match = DEFINITION.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f"expected 'name = expression', got {text!r}")
+    return DerivedMetric(match.group(1), match.group(2))
+
+
+def read_definitions(path):
+    """
+    The definitions of a file, one 'name = expression' per line; blank lines and
+    lines starting with '#' are skipped.
+    """
+    with open(path) as file:
+        return [parse_definition(line) for line in file if line.strip() and not line.lstrip().startswith('#')]
+
+
+def name_pattern(metrics):
+    """
+    One regex matching every stat name any of the metrics may reference, for reading
+    only those stats.
+    """
+    sources = sorted({name_regex(reference.text, capture=False) for metric in metrics
+                      for reference in metric.references})
+    return r'(?:\S*\.)?(?:' + '|'.join(sources) + ')'
+
+
+def ambiguous(metric_name, reference, names):
+    return ValueError(f"{metric_name}: {reference.text!r} matches {', '.join(names)}; "
+                      "name one of them, use a '*' to sum them or a '{placeholder}' for one metric each")
+
+
+@functools.lru_cache(maxsize=256)
+def bind_names(metric, names):
+    """
+    metric.bind(names), remembered: the dumps and runs of one configuration share
+    their stat names.
+    """
+    return metric.bind(names)
+
+
+def evaluate_stats(metrics, stats):
+    """
+    Evaluate metrics (a tuple of DerivedMetric) on one flat {stat name: value} dict
+    with Python floats. Returns {metric name: value}; later metrics may use earlier ones.
+    """
+    stats = dict(stats)
+    results = {}
+    for metric in metrics:
+        names = tuple(stats)
+        for name, columns, wildcards in bind_names(metric, names):
+            variables = {}
+            for position, (reference, reference_columns, wildcard) in enumerate(zip(metric.references, columns,
+                                                                                   wildcards)):
+                present = [stats[names[column]] for column in reference_columns]
+                if len(present) > 1 and not wildcard:
+                    raise ambiguous(name, reference, [names[index] for index in reference_columns])
+                variables[f"_r{position}"] = sum(present) if present else math.nan
+            value = eval(metric.code, SCALAR_GLOBALS, variables)
+            results[name] = value
+            stats[name] = value
+    return results
+
+
+class Inline(ast.NodeTransformer):
+    """
+    Replace the reference variables _r0, _r1, ... of an expression tree by expressions.
+    """
+
+    def __init__(self, replacements):
+        self.replacements = replacements
+
+    def visit_Name(self, node):
+        return self.replacements.get(node.id, node)
+
+
+def stat_lookup(name):
+    """
+    The expression reading a flattened stat name from a nested stats dict _stats:
+    'mem_ctrl_data.0.bw_read' -> _stats['mem_ctrl_data']['0']['bw_read'].
+    """
+    node = ast.Name('_stats', ast.Load())
+    for part in name.split('.'):
+        node = ast.Subscript(node, ast.Constant(part), ast.Load())
+    return node
+
+
+def compile_nested(metrics, names):
+    """
+    Bind metrics to the flattened scalar stat names of a nested stats dict and compile
+    them into one code object that reads the referenced stats straight from such a dict
+    and returns the metric values as a tuple. Metrics that use earlier ones evaluate
+    them inline. Returns (metric names, code); evaluate_nested runs the code. Worth it
+    for evaluating the same metrics over many stats dicts with the same names, such as
+    the dumps of a file: no flattening or binding is left for each dict.
+    """
+    names = list(names)
+    definitions = {}
+    for metric in metrics:
+        for name, columns, wildcards in metric.bind(tuple(names)):
+            replacements = {}
+            for position, (reference, reference_columns, wildcard) in enumerate(zip(metric.references, columns,
+                                                                                   wildcards)):
+                if len(reference_columns) > 1 and not wildcard:
+                    raise ambiguous(name, reference, [names[index] for index in reference_columns])
+                terms = [copy.deepcopy(definitions[names[index]]) if names[index] in definitions
+                         else stat_lookup(names[index]) for index in reference_columns]
+                replacements[f"_r{position}"] = (functools.reduce(lambda left, right: ast.BinOp(left, ast.Add(), right),
+                                                                  terms) if terms else ast.Constant(math.nan))
+            definitions[name] = Inline(replacements).visit(copy.deepcopy(metric.tree.body))
+            # Later metrics may refer to this one.
+            names.append(name)
+    tree = ast.fix_missing_locations(ast.Expression(ast.Tuple(list(definitions.values()), ast.Load())))
+    return list(definitions), compile(tree, "<derived>", 'eval')
+
+
+def evaluate_nested(code, stats):
+    """
+    Run code from compile_nested on a nested stats dict with the names it was compiled for.
+    """
+    return eval(code, SCALAR_GLOBALS, {'_stats': stats})
+
+
+def evaluate_rows(metrics, names, matrix):
+    """
+    Evaluate metrics over a float64 matrix with a row per run or dump and a column per
+    stat name (NaN where a row lacks a stat, as stat_diff.align_stats builds it). A
+    wildcard sums the columns it matches, skipping NaN; a row with none of them is
+    NaN. Returns {metric name: array with one value per row}.
+    """
+    import numpy as np
+
+    namespace = array_namespace()
+    names = list(names)
+    width = len(names)
+    results = {}
+
+    def column(index):
+        # Columns past the matrix are metrics computed earlier in this call.
+        return matrix[:, index] if index < width else results[names[index]]
+
+    for metric in metrics:
+        for name, columns, wildcards in metric.bind(tuple(names)):
+            variables = {}
+            for position, (reference, reference_columns, wildcard) in enumerate(zip(metric.references, columns,
+                                                                                   wildcards)):
+                if not reference_columns:
+                    values = np.full(len(matrix), np.nan)
+                elif len(reference_columns) == 1:
+                    values = column(reference_columns[0])
+                else:
+                    selected = np.column_stack([column(index) for index in reference_columns])
+                    present = ~np.isnan(selected)
+                    counts = present.sum(axis=1)
+                    if not wildcard and (counts > 1).any():
+                        raise ambiguous(name, reference, [names[index] for index in reference_columns])
+                    values = np.where(counts > 0, np.nansum(selected, axis=1), np.nan)
+                variables[f"_r{position}"] = values
+            value = eval(metric.code, namespace, variables)
+            results[name] = np.broadcast_to(np.asarray(value, dtype=np.float64), (len(matrix),)).copy()
+            # Later metrics may refer to this one.
+            names.append(name)
+    return results
+
+
+def derive_files(metrics, file_paths, dumps=None, jobs=1):
+    """
+    Evaluate metrics over the selected dumps (all by default) of many stat files. Only
+    the referenced stats are read, in jobs worker processes as stat_parser.iter_files
+    does, and all dumps of all files are evaluated together as rows of one matrix.
+    Returns (rows, values): rows lists (file index, dump index) and values maps each
+    metric name to an array with one value per row.
+    """
+    import stat_diff
+    import stat_parser
+
+    pattern = name_pattern(metrics)
+    rows = []
+    stats_list = []
+    for file_index, file_dumps in enumerate(stat_parser.iter_files(stat_parser.read_dump_stats, file_paths, jobs,
+                                                                   dumps, pattern)):
+        for dump_index, stats in file_dumps:
+            rows.append((file_index, dump_index))
+            stats_list.append(stats)
+    names, matrix = stat_diff.align_stats(stats_list)
+    return rows, evaluate_rows(metrics, names, matrix)
@@ -0,0 +1,141 @@
+"""
+Cross-run comparison of every stat against a baseline run.
+
+The stats of all runs, as read by stat_parser.read_all_stats, are aligned by name
+into one float64 matrix (a row per run, a column per stat name seen in any run,
+NaN where a run lacks the stat). Absolute and relative deltas against the
+baseline row, the significance tests and the ranking of the biggest movers are
+then whole-matrix NumPy operations, so comparing a baseline with a thousand
+runs of a few thousand stats each costs little more than reading the files.
+
+NumPy is imported when a comparison is computed.
+"""
+import itertools
+import re
+
+import stat_parser
+
+DEFAULT_TOP = 20
+
+DIFF_SUMMARY_HEADERS = ["Run", "Stats Compared", "Changed", "Missing", "Top Mover", "Top Change (%)"]
+DIFF_MOVER_HEADERS = ["Run", "Stat", "Baseline", "Value", "Delta", "Change (%)"]
+
+
+def align_stats(stats_list):
+    """
+    Align {name: value} dicts, from any iterable, by stat name. Returns (names, matrix)
+    where names lists every name in first-seen order and matrix[run, stat] is a float64
+    array, NaN where the run does not have the stat. Each dict is reduced to two arrays
+    as it arrives, so a generator of runs is never held in memory as dicts.
+    """
+    import numpy as np
+
+    index = {}
+    rows = []
+    for stats in stats_list:
+        columns = np.fromiter((index.setdefault(name, len(index)) for name in stats), dtype=np.intp,
+                              count=len(stats))
+        rows.append((columns, np.fromiter(stats.values(), dtype=np.float64, count=len(stats))))
+    matrix = np.full((len(rows), len(index)), np.nan)
+    for row, (columns, values) in enumerate(rows):
+        matrix[row, columns] = values
+    return list(index), matrix
+
+
+def compute_deltas(baseline, runs):
+    """
+    Absolute and relative deltas of every run (rows of runs) against the baseline
+    row. The relative delta is |baseline|-scaled; it is 0 where nothing changed and
+    inf where a zero baseline changed. Stats missing on either side are NaN.
+    """
+    import numpy as np
+
+    absolute = runs - baseline
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.abs(absolute) / np.abs(baseline)
+    relative[absolute == 0] = 0.0
+    return absolute, relative
+
+
+def diff_runs(baseline_stats, run_stats, name_filter=None, min_relative=0.0, min_absolute=0.0, top=DEFAULT_TOP):
+    """
+    Compare every stat of each run in run_stats (any iterable) against baseline_stats. A stat changed
+    if its relative delta is at least min_relative (a fraction) and its absolute delta
+    at least min_absolute; name_filter, a regex, limits the stats compared. Returns a
+    dict with 'names' (the compared stat names), and per run 'compared', 'changed'
+    and 'missing' counts (stats that only one of the baseline and the run has) plus
+    'movers': its top changed stats, biggest relative delta first and changes from a
+    zero baseline after them, as (name, baseline, value, delta, relative delta) tuples.
+    """
+    import numpy as np
+
+    names, matrix = align_stats(itertools.chain([baseline_stats], run_stats))
+    if name_filter is not None:
+        pattern = re.compile(name_filter)
+        keep = np.fromiter((pattern.search(name) is not None for name in names), dtype=bool, count=len(names))
+        names = [name for name, kept in zip(names, keep) if kept]
+        matrix = matrix[:, keep]
+    baseline, runs = matrix[0], matrix[1:]
+    absolute, relative = compute_deltas(baseline, runs)
+
+    present = ~np.isnan(absolute)
+    # Stats of other runs that neither the baseline nor this run has are not missing.
+    missing = np.isnan(baseline) ^ np.isnan(runs)
+    with np.errstate(invalid='ignore'):
+        changed = present & (absolute != 0) & (relative >= min_relative) & (np.abs(absolute) >= min_absolute)
+    # Rank changed stats by relative delta, then absolute delta. Stats that changed from a
+    # zero baseline have no finite relative delta and follow, by absolute delta; unchanged
+    # ones sort last.
+    finite = np.isfinite(relative)
+    tier = np.where(changed, np.where(finite, 2, 1), 0)
+    relative_key = np.where(changed & finite, relative, -1.0)
+    absolute_key = np.where(changed, np.abs(absolute), -1.0)
+    order = np.lexsort((-absolute_key, -relative_key, -tier), axis=-1)[:, :top]
+
+    movers = []
+    for row, columns in enumerate(order):
+        columns = columns[changed[row, columns]]
+        movers.append([(names[column], float(baseline[column]), float(runs[row, column]),
+                        float(absolute[row, column]), float(relative[row, column])) for column in columns])
+    return {
+        'names': names,
+        'compared': present.sum(axis=1).tolist(),
+        'changed': changed.sum(axis=1).tolist(),
+        'missing': missing.sum(axis=1).tolist(),
+        'movers': movers,
+    }
+
+
+def relative_percent(relative):
+    """
+    A relative delta as a table value in percent; 'N/A' where the baseline was zero.
+    """
+    return relative * 100 if relative != float('inf') else 'N/A'
+
+
+def diff_tables(run_labels, result):
+    """
+    The summary and movers tables of a diff_runs result, as {sheet: (headers, rows)}
+    like display_statistics returns.
+    """
+    summary_rows = []
+    mover_rows = []
+    for label, compared, changed, missing, movers in zip(run_labels, result['compared'], result['changed'],
+                                                        result['missing'], result['movers']):
+        top_name, top_change = (movers[0][0], relative_percent(movers[0][4])) if movers else ('N/A', 'N/A')
+        summary_rows.append([label, compared, changed, missing, top_name, top_change])
+        mover_rows.extend([label, name, baseline, value, delta, relative_percent(relative)]
+                          for name, baseline, value, delta, relative in movers)
+    return {
+        "diff_summary": (DIFF_SUMMARY_HEADERS, summary_rows),
+        "diff_movers": (DIFF_MOVER_HEADERS, mover_rows),
+    }
+
+
+def diff_files(baseline_path, file_paths, dumps=None, jobs=1, **options):
+    """
+    Read every stat of the baseline and of each file (the last selected dump of
+    each, see stat_parser.read_all_stats) and compare them with diff_runs.
+    """
+    stats_list = stat_parser.iter_files(stat_parser.read_all_stats, [baseline_path] + list(file_paths), jobs, dumps)
+    return diff_runs(next(stats_list), stats_list, **options)
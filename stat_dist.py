@@ -0,0 +1,213 @@
+"""
+Distribution, histogram and vector stats.
+
+gem5 prints these as one line per bucket under a common name:
+
+    system.mem_ctrls0.rdQLenPdf::0               1517   43.19%   43.19%
+    system.mem_ctrls0.rdPerTurnAround::samples    611
+    system.mem_ctrls0.rdPerTurnAround::mean      4.37
+    system.mem_ctrls0.rdPerTurnAround::0-7        498   81.51%   81.51%
+    system.mem_ctrls0.rdPerTurnAround::total      611
+
+A Distribution collects the lines of one such stat. Bucket bounds and counts are
+kept in float64 arrays and the bucket labels are interned, so a stat with a
+hundred buckets costs a few KB in memory however many runs are loaded. The
+summary lines (samples, mean, stdev, total, ...) are kept by name. Percentiles
+and the CDF are computed from the buckets.
+"""
+import itertools
+import math
+import sys
+from array import array
+
+# Sub-names gem5 prints for the summary of a distribution or vector, not a bucket.
+SUMMARY_NAMES = frozenset(('samples', 'mean', 'gmean', 'stdev', 'underflows', 'overflows', 'min_value',
+                           'max_value', 'total'))
+
+# Percentiles shown in tables and exported as columns.
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_bounds(label):
+    """
+    Value range (low, high) of a bucket label: '8-15' -> (8.0, 15.0), '3' -> (3.0, 3.0).
+    Named buckets (e.g. 'IntAlu' in a vector over op classes) have NaN bounds.
+    """
+    try:
+        value = float(label)
+        return value, value
+    except ValueError:
+        pass
+    # The separator is the first '-' that is neither a sign nor part of an exponent.
+    for position in range(1, len(label)):
+        if label[position] == '-' and label[position - 1] not in 'eE-':
+            try:
+                return float(label[:position]), float(label[position + 1:])
+            except ValueError:
+                break
+    return math.nan, math.nan
+
+
+class Distribution:
+    """
+    Buckets of one distribution or vector stat: labels, low and high bounds and
+    counts in bucket order, plus the summary values by name (see SUMMARY_NAMES).
+    """
+    __slots__ = ('labels', 'lows', 'highs', 'counts', 'summary')
+
+    def __init__(self, labels=(), counts=(), summary=None):
+        self.labels = []
+        self.lows = array('d')
+        self.highs = array('d')
+        self.counts = array('d')
+        self.summary = dict(summary or {})
+        for label, count in zip(labels, counts):
+            self.add_bucket(label, count)
+
+    def add(self, name, value):
+        """
+        Add one line of the stat by its sub-name (a bucket label or a summary name).
+        """
+        if name in SUMMARY_NAMES:
+            self.summary[name] = value
+        else:
+            self.add_bucket(name, value)
+
+    def add_bucket(self, label, count):
+        low, high = bucket_bounds(label)
+        self.labels.append(sys.intern(label))
+        self.lows.append(low)
+        self.highs.append(high)
+        self.counts.append(count)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def samples(self):
+        """
+        Number of samples: the samples (or total) line if printed, else the bucket sum.
+        """
+        samples = self.summary.get('samples', self.summary.get('total'))
+        if samples is None:
+            samples = sum(self.counts)
+        return int(samples) if float(samples).is_integer() else samples
+
+    def numeric_buckets(self):
+        """
+        (low, high, count) of the buckets with numeric bounds, in bucket order.
+        """
+        return [(low, high, count) for low, high, count in zip(self.lows, self.highs, self.counts)
+                if not math.isnan(low)]
+
+    @property
+    def mean(self):
+        """
+        The printed mean, or the count-weighted mean of the bucket midpoints; None
+        without numeric samples.
+        """
+        if 'mean' in self.summary:
+            return self.summary['mean']
+        buckets = self.numeric_buckets()
+        total = sum(count for low, high, count in buckets)
+        if not total:
+            return None
+        return sum((low + high) / 2 * count for low, high, count in buckets) / total
+
+    def percentile(self, percent):
+        """
+        Value below which percent of the bucketed samples fall, interpolated linearly
+        inside the bucket that crosses it; None without numeric samples.
+        """
+        buckets = self.numeric_buckets()
+        total = sum(count for low, high, count in buckets)
+        if not total:
+            return None
+        target = total * percent / 100
+        cumulative = 0.0
+        for low, high, count in buckets:
+            if count and cumulative + count >= target:
+                return low + (high - low) * max(0.0, target - cumulative) / count
+            cumulative += count
+        return buckets[-1][1]
+
+    def cdf(self):
+        """
+        [(high bound, cumulative fraction of samples)] over the numeric buckets.
+        """
+        buckets = self.numeric_buckets()
+        total = sum(count for low, high, count in buckets)
+        if not total:
+            return []
+        cumulative = itertools.accumulate(count for low, high, count in buckets)
+        return [(high, running / total) for (low, high, count), running in zip(buckets, cumulative)]
+
+    @property
+    def maximum(self):
+        """
+        The printed max_value, or the upper bound of the last non-empty bucket.
+        """
+        if 'max_value' in self.summary:
+            return self.summary['max_value']
+        highs = [high for low, high, count in self.numeric_buckets() if count]
+        return highs[-1] if highs else None
+
+    def summary_values(self):
+        """
+        {'samples', 'mean', 'p50', 'p90', 'p99', 'max'}, with None where undefined.
+        """
+        values = {'samples': self.samples, 'mean': self.mean}
+        for percent in PERCENTILES:
+            values[f"p{percent}"] = self.percentile(percent)
+        values['max'] = self.maximum
+        return values
+
+    def to_json(self):
+        return {'__dist__': 1, 'labels': self.labels, 'counts': list(self.counts), 'summary': self.summary}
+
+    @classmethod
+    def from_json(cls, document):
+        return cls(document['labels'], document['counts'], document['summary'])
+
+    def __eq__(self, other):
+        if not isinstance(other, Distribution):
+            return NotImplemented
+        return (self.labels, self.counts, self.summary) == (other.labels, other.counts, other.summary)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Distribution({len(self)} buckets, samples={self.samples})"
+
+
+def json_default(value):
+    """
+    json.dump default= hook writing Distributions as tagged objects.
+    """
+    if isinstance(value, Distribution):
+        return value.to_json()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_object_hook(document):
+    """
+    json.load object_hook= reviving the Distributions written through json_default.
+    """
+    if document.get('__dist__') == 1:
+        return Distribution.from_json(document)
+    return document
+
+
+def flatten_distributions(stats, prefix=""):
+    """
+    {flattened name: Distribution} of the distributions in nested stats, named like
+    stat_export.flatten_stats names scalars (e.g. 'mem_ctrl_data.0.rd_queue_length').
+    """
+    flat = {}
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_distributions(value, f"{name}."))
+        elif isinstance(value, Distribution):
+            flat[name] = value
+    return flat
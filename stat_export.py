@@ -0,0 +1,141 @@
+"""
+Columnar export of parsed stats.
+
+Runs become rows and flattened stat names become columns, each stored as one
+typed array: int64 when every run has an integer value, float64 (NaN for runs
+without the stat) otherwise. Distribution stats become summary columns
+(name.samples, name.mean, name.p50, name.p90, name.p99, name.max). Tables are written as .npz with NumPy, or as
+.parquet/.feather with pyarrow, so cross-run aggregates can be computed with
+vectorized operations and reloaded without re-parsing.
+
+NumPy is needed for every format and pyarrow for Parquet/Feather; both are
+imported only when a table is built or written.
+"""
+import os
+
+import stat_dist
+
+RUN_COLUMN = "run"
+FORMATS = {".npz": "npz", ".parquet": "parquet", ".feather": "feather"}
+
+
+def flatten_stats(stats, prefix=""):
+    """
+    Flatten nested stats into {name: number}, joining nested keys with '.'
+    (e.g. 'FU_Busy.IntAlu.count', 'mem_ctrl_data.0.bw_read').
+    """
+    flat = {}
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_stats(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def summary_columns(stats):
+    """
+    Flattened scalar stats plus the summary values of every distribution stat.
+    """
+    flat = flatten_stats(stats)
+    for name, distribution in stat_dist.flatten_distributions(stats).items():
+        for summary, value in distribution.summary_values().items():
+            if value is not None:
+                flat[f"{name}.{summary}"] = value
+    return flat
+
+
+def build_columns(stats_list):
+    """
+    Build {stat name: array} with one element per run, in first-seen column order.
+    """
+    import numpy as np
+
+    flat_list = [summary_columns(stats) for stats in stats_list]
+    names = list(dict.fromkeys(name for flat in flat_list for name in flat))
+    columns = {}
+    for name in names:
+        values = [flat.get(name) for flat in flat_list]
+        if all(isinstance(value, int) for value in values):
+            columns[name] = np.array(values, dtype=np.int64)
+        else:
+            columns[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return columns
+
+
+def config_columns(configs):
+    """
+    Build {'config.<key>': array} from per-run config dicts (see stat_sweep): numeric
+    columns as for stats, anything else as strings, empty where a run lacks the key.
+    """
+    import numpy as np
+
+    keys = list(dict.fromkeys(key for config in configs for key in config))
+    columns = {}
+    for key in keys:
+        values = [config.get(key) for config in configs]
+        numbers = [value for value in values if value is not None]
+        if all(isinstance(value, int) for value in values):
+            columns[f"config.{key}"] = np.array(values, dtype=np.int64)
+        elif all(isinstance(value, (int, float)) for value in numbers):
+            columns[f"config.{key}"] = np.array([np.nan if value is None else value for value in values],
+                                                dtype=np.float64)
+        else:
+            columns[f"config.{key}"] = np.array(['' if value is None else str(value) for value in values], dtype=str)
+    return columns
+
+
+def table_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported table format {extension!r} (use {', '.join(FORMATS)})")
+    return FORMATS[extension]
+
+
+def write_table(path, run_labels, stats_list, configs=None):
+    """
+    Write the runs as a columnar table; the format follows the file extension. With
+    configs, the run parameters of each run are added as config.<key> columns.
+    """
+    import numpy as np
+
+    file_format = table_format(path)
+    columns = {RUN_COLUMN: np.array(run_labels, dtype=str)}
+    if configs is not None:
+        columns.update(config_columns(configs))
+    columns.update(build_columns(stats_list))
+
+    if file_format == "npz":
+        with open(path, 'wb') as file:
+            np.savez_compressed(file, **columns)
+        return
+
+    import pyarrow
+    table = pyarrow.table(columns)
+    if file_format == "parquet":
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path)
+    else:
+        import pyarrow.feather
+        pyarrow.feather.write_feather(table, path)
+
+
+def read_table(path):
+    """
+    Load a table written by write_table as {column name: NumPy array}.
+    """
+    import numpy as np
+
+    file_format = table_format(path)
+    if file_format == "npz":
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    if file_format == "parquet":
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(path)
+    else:
+        import pyarrow.feather
+        table = pyarrow.feather.read_table(path)
+    return {name: table.column(name).to_numpy() for name in table.column_names}
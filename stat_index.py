@@ -0,0 +1,215 @@
+"""
+Sidecar index of byte offsets into plain stat files.
+
+gem5 writes the stats of one SimObject (system.clusters.cpu0,
+system.clusters.cpu0.dcache, system.mem_ctrls0.dram, ...) as a contiguous run of
+lines. The index records, for every dump block, where each of these runs starts
+and where the block's end marker is, so a parse that only needs a few objects
+(e.g. the branch predictors, or the memory controllers) of the last dump can seek
+straight to them instead of scanning the whole file.
+
+The index is built with a single byte-level scan and kept next to the stat file
+as <file>.idx: a small JSON header with the object names, followed by one int64
+array holding, per block, the end marker offset and (object id, start offset)
+pairs, all zlib-compressed. A run ends where the next one starts. The source's
+size, mtime and content digest are stored with it; an index that no longer
+matches its source is rebuilt.
+Compressed stat files cannot be seeked into and are not indexed.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from array import array
+
+import stat_cache
+import stat_schema
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+
+END_MARKER = b'---------- End Simulation Statistics'
+
+# A run of stat lines of one object, or an end marker, at the start of a line. The
+# first group is the object: the stat name without its last component and any
+# ::subname. The backreference swallows the following lines of the same object, so
+# the regex engine rather than Python steps over them.
+INDEX_LINE = re.compile(rb'^(?:(system(?:\.\w+)*)\.\w+(?:::\S*)?[ \t][^\n]*'
+                        rb'(?:\n\1\.\w+(?:::\S*)?[ \t][^\n]*)*|' + re.escape(END_MARKER) + rb')', re.MULTILINE)
+
+HEADER_LENGTH = struct.Struct('<I')
+
+
+def index_path(file_path):
+    return file_path + INDEX_SUFFIX
+
+
+class StatIndex:
+    """
+    Object names and, per dump block, the end marker offset followed by the object id
+    and start offset of each run, all in one int64 array; block_starts holds where
+    each block begins in it.
+    """
+
+    def __init__(self, size, mtime_ns, digest, objects, block_starts, offsets):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.objects = objects
+        self.block_starts = block_starts
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.block_starts)
+
+    def matching_objects(self, object_filter):
+        """
+        Ids of the objects whose names fully match the compiled object_filter.
+        """
+        return {object_id for object_id, name in enumerate(self.objects) if object_filter.fullmatch(name)}
+
+    def block_ranges(self, block_index, object_ids):
+        """
+        (start, end) byte ranges of the given objects in one dump block, with
+        adjacent runs merged.
+        """
+        first = self.block_starts[block_index]
+        last = self.block_starts[block_index + 1] if block_index + 1 < len(self) else len(self.offsets)
+        block_end = self.offsets[first]
+        ranges = []
+        for position in range(first + 1, last, 2):
+            if self.offsets[position] not in object_ids:
+                continue
+            start = self.offsets[position + 1]
+            end = self.offsets[position + 3] if position + 3 < last else block_end
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return ranges
+
+    def to_bytes(self):
+        header = json.dumps({'version': INDEX_VERSION, 'size': self.size, 'mtime_ns': self.mtime_ns,
+                             'digest': self.digest, 'objects': self.objects,
+                             'block_starts': list(self.block_starts)}, separators=(',', ':')).encode()
+        return zlib.compress(HEADER_LENGTH.pack(len(header)) + header + self.offsets.tobytes(), 1)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        header_end = HEADER_LENGTH.size + HEADER_LENGTH.unpack_from(data)[0]
+        header = json.loads(data[HEADER_LENGTH.size:header_end])
+        if header.get('version') != INDEX_VERSION:
+            raise ValueError("index version mismatch")
+        offsets = array('q')
+        offsets.frombytes(data[header_end:])
+        return cls(header['size'], header['mtime_ns'], header['digest'], header['objects'],
+                   header['block_starts'], offsets)
+
+
+def object_filter(patterns):
+    """
+    Compile the objects of schema stat-name patterns into one regex over object names,
+    e.g. 'system.clusters.{cpu}.dcache.overallHits::total' -> system\\.clusters\\.cpu\\d+\\.dcache.
+    """
+    sources = set()
+    for pattern in patterns:
+        name = pattern.split('::', 1)[0]
+        object_name = name.rsplit('.', 1)[0]
+        sources.add(''.join(stat_schema.PLACEHOLDERS.get(token, re.escape(token))
+                            for token in stat_schema.tokenize(object_name)))
+    return re.compile('|'.join(sorted(sources)))
+
+
+def build_index(file_path):
+    """
+    Scan a plain stat file once and return its StatIndex. A trailing block without an
+    end marker is indexed (up to the end of the file) if it has any stat lines.
+    """
+    file_stat = os.stat(file_path)
+    object_ids = {}
+    block_starts = []
+    offsets = array('q')
+    block_runs = array('q')
+    with open(file_path, 'rb') as file:
+        if file_stat.st_size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, 'madvise'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                matches = INDEX_LINE.finditer(mapped)
+                try:
+                    for match in matches:
+                        object_name = match.group(1)
+                        if object_name is None:
+                            block_starts.append(len(offsets))
+                            offsets.append(match.start())
+                            offsets += block_runs
+                            block_runs = array('q')
+                        else:
+                            block_runs.append(object_ids.setdefault(object_name, len(object_ids)))
+                            block_runs.append(match.start())
+                finally:
+                    del matches
+    if block_runs:
+        block_starts.append(len(offsets))
+        offsets.append(file_stat.st_size)
+        offsets += block_runs
+    objects = [name.decode() for name in object_ids]
+    return StatIndex(file_stat.st_size, file_stat.st_mtime_ns, stat_cache.file_digest(file_path),
+                     objects, block_starts, offsets)
+
+
+def load_index(file_path):
+    """
+    The sidecar index of a stat file, or None if there is none or it no longer
+    matches the file (size changed, or mtime changed along with the content digest).
+    An index whose file was only touched is saved again with the new mtime.
+    """
+    try:
+        with open(index_path(file_path), 'rb') as file:
+            index = StatIndex.from_bytes(file.read())
+    except (OSError, ValueError, KeyError, struct.error, zlib.error):
+        return None
+    file_stat = os.stat(file_path)
+    if file_stat.st_size != index.size:
+        return None
+    if file_stat.st_mtime_ns != index.mtime_ns:
+        if stat_cache.file_digest(file_path) != index.digest:
+            return None
+        # The content is unchanged: record the new mtime so later loads skip the digest.
+        index.mtime_ns = file_stat.st_mtime_ns
+        save_index(file_path, index)
+    return index
+
+
+def save_index(file_path, index):
+    """
+    Write the sidecar atomically. Returns False if the directory is not writable.
+    """
+    path = index_path(file_path)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(index.to_bytes())
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def ensure_index(file_path):
+    """
+    Load the sidecar index of a stat file, building and saving it first if it is
+    missing or stale. The built index is still returned if it cannot be saved.
+    """
+    index = load_index(file_path)
+    if index is None:
+        index = build_index(file_path)
+        save_index(file_path, index)
+    return index
@@ -0,0 +1,1002 @@
+"""
+gem5 stats.txt parser.
+
+parse() reads one stat file into a StatsRecord, parse_dumps() yields one record
+per dump block, and parse_many() parses many files (optionally in worker
+processes and through a StatCache) into records in the order given. Nothing here
+prints or writes output; the tables, workbooks and JSON of main.py are a layer on
+top of this module.
+"""
+import bz2
+import collections
+import contextlib
+import functools
+import gzip
+import io
+import itertools
+import lzma
+import math
+import mmap
+import os
+import re
+import shutil
+import time
+import zlib
+
+import stat_derive
+import stat_export
+import stat_schema
+from stat_dist import Distribution
+from stat_record import StatsRecord, nest, split_name
+
+# Single-pass parse engine.
+#
+# gem5 stat lines are always ``name  value  [pct  cum]  # desc``. The tracked
+# stats are declared in stat_schema.STAT_SCHEMA and compiled into a single
+# trie-shaped pattern, so each line is resolved by one match instead of running
+# a regex per metric. Stats are collected for every ``system.clusters.cpuN``
+# during the scan and the active CPU is chosen afterwards, so a file only has to
+# be read once.
+#
+# gem5 appends a new ``Begin/End Simulation Statistics`` block on every
+# ``m5 dumpstats``. Blocks are scanned one at a time and yielded as they end,
+# so memory use is bounded by a single dump rather than by the whole file.
+#
+# The mmap scan mode skips the per-line work for untracked lines: the same
+# pattern, compiled for bytes, finds the tracked stat lines (and end markers) in
+# the mapped file, and only those lines are decoded and scanned. Where most lines
+# are tracked, filtering costs more than it saves and lines are decoded whole.
+#
+# The index scan mode goes further and reads only the selected dump blocks, and
+# in them only the SimObjects of the requested categories, at the byte offsets
+# recorded in a stat_index sidecar next to the file.
+
+END_MARKER = '---------- End Simulation Statistics'
+
+STAT_PATTERN, STAT_LEAVES = stat_schema.compile_matcher()
+STAT_MATCHER = re.compile(STAT_PATTERN + r'(?=[ \t])')
+
+
+def to_float(text):
+    """
+    Convert a stat value to float, returning None for nan/inf or non-numeric values.
+    """
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def to_int(text):
+    """
+    Convert a stat value to int, truncating fractional values such as bandwidths.
+    """
+    if text.isdigit():
+        return int(text)
+    value = to_float(text)
+    return None if value is None else int(value)
+
+
+def to_busy(fields):
+    """
+    Convert the 'value  pct%' fields of a vector entry to {'count', 'rate'}.
+    """
+    if len(fields) < 2 or not fields[1].endswith('%'):
+        return None
+    count = to_int(fields[0])
+    rate = to_float(fields[1][:-1])
+    if count is None or rate is None:
+        return None
+    return {'count': count, 'rate': rate}
+
+
+# Schema type -> converter of the whitespace-split fields after the stat name
+CONVERTERS = {
+    'int': lambda fields: to_int(fields[0]),
+    'float': lambda fields: to_float(fields[0]),
+    'busy': to_busy,
+    'dist': lambda fields: to_float(fields[0]),
+}
+
+
+def scan_stat_lines(lines, hits=None):
+    """
+    Scan stat lines up to the end of the current dump block and collect the schema stats.
+    Returns (cpu_stats, mem_ctrl_data, system_stats, complete) where cpu_stats maps 'cpuN'
+    to its stats dict, mem_ctrl_data maps controller ids to theirs, system_stats holds the
+    stats of neither scope, and complete tells whether the block's end marker was reached
+    (False means the lines ran out first). A hits Counter, if given, counts the matches
+    of each STAT_LEAVES entry.
+    """
+    cpu_stats = {}
+    mem_ctrl_data = {}
+    system_stats = {}
+    match_stat = STAT_MATCHER.match
+    leaves = STAT_LEAVES
+
+    for line in lines:
+        if not line.startswith('system.'):
+            if line.startswith(END_MARKER):
+                return cpu_stats, mem_ctrl_data, system_stats, True
+            continue
+        match = match_stat(line)
+        if match is None:
+            continue
+        if hits is not None:
+            hits[match.lastindex] += 1
+        key, kind, scope, scope_group, wildcard_groups, bucket_group = leaves[match.lastindex]
+        fields = line[match.end():].split(None, 2)
+        if not fields:
+            continue
+        value = CONVERTERS[kind](fields)
+        if value is None:
+            continue
+
+        if scope == 'system':
+            target = system_stats
+        else:
+            scope_stats = cpu_stats if scope == 'cpu' else mem_ctrl_data
+            scope_id = match.group(scope_group)
+            target = scope_stats.get(scope_id)
+            if target is None:
+                target = scope_stats[scope_id] = {}
+        for group in wildcard_groups:
+            target = target.setdefault(key, {})
+            key = match.group(group)
+        if bucket_group is not None:
+            distribution = target.get(key)
+            if distribution is None:
+                distribution = target[key] = Distribution()
+            distribution.add(match.group(bucket_group), value)
+        else:
+            target[key] = value
+
+    return cpu_stats, mem_ctrl_data, system_stats, False
+
+
+def build_line_filter():
+    """
+    Compile a bytes pattern matching, right after a newline, every line whose stat
+    name is in the schema, plus the dump end marker.
+    """
+    pattern = r'\n((?:' + STAT_PATTERN + r')[ \t][^\n]*|' + re.escape(END_MARKER) + r'[^\n]*)'
+    return re.compile(pattern.encode())
+
+
+LINE_FILTER = build_line_filter()
+
+# The filter only pays off while it skips most lines: the scanner matches every line it
+# passes again, so where more than this share of lines is tracked, decoding them all is
+# cheaper. Each window decides on its first FILTER_SAMPLE bytes.
+FILTER_DENSITY = 0.5
+FILTER_SAMPLE = 2 ** 16
+
+
+def filtered_lines(data, start, end):
+    """
+    The lines of data[start:end] (bytes or a mapped file) that scan_stat_lines can use,
+    as a list. start must be the offset of a newline, which anchors the first line, and
+    end the offset of a newline or the end of data. The lines of a sample at the start
+    are filtered; if most of them were tracked, the rest is decoded whole instead.
+    """
+    sample_end = data.find(b'\n', start + FILTER_SAMPLE, end) if start + FILTER_SAMPLE < end else -1
+    if sample_end < 0:
+        return [match.group(1).decode() for match in LINE_FILTER.finditer(data, start, end)]
+    lines = [match.group(1).decode() for match in LINE_FILTER.finditer(data, start, sample_end)]
+    if len(lines) <= FILTER_DENSITY * data[start:sample_end].count(b'\n'):
+        lines.extend(match.group(1).decode() for match in LINE_FILTER.finditer(data, sample_end, end))
+    else:
+        lines.extend(data[sample_end + 1:end].decode().split('\n'))
+    return lines
+
+
+# The mapped file is scanned in windows of this size; pages of finished windows are
+# dropped from the process so resident memory stays around one window.
+MMAP_WINDOW = 4 * 2 ** 20
+
+
+def iter_mapped_lines(file, start=0, stop=None):
+    """
+    Memory-map a stat file opened in binary mode and yield the lines that
+    scan_stat_lines can use, window by window as filtered_lines picks them. A non-zero
+    start must be the offset of a newline; stop limits the scan to the bytes before it.
+    """
+    size = os.fstat(file.fileno()).st_size
+    if stop is not None:
+        size = min(size, stop)
+    if size <= start:
+        return
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        can_advise = hasattr(mapped, 'madvise')
+        if can_advise:
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        if start == 0:
+            # The pattern anchors on a preceding newline, so the first line is passed through as is.
+            start = mapped.find(b'\n', 0, size)
+            if start < 0:
+                start = size
+            yield mapped[:start].decode()
+
+        while start < size:
+            # Windows end on a newline, which then anchors the first line of the next window.
+            end = size
+            if start + MMAP_WINDOW < size:
+                end = mapped.rfind(b'\n', start + 1, start + MMAP_WINDOW)
+                if end < 0:
+                    end = mapped.find(b'\n', start + MMAP_WINDOW, size)
+                if end < 0:
+                    end = size
+            yield from filtered_lines(mapped, start, end)
+            if can_advise:
+                done = end - end % mmap.PAGESIZE
+                if done:
+                    mapped.madvise(mmap.MADV_DONTNEED, 0, done)
+            start = end
+
+
+# Compressed stat files are recognised by their magic bytes, not their extension.
+COMPRESSION_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bz2',
+    b'\xfd7zXZ\x00': 'xz',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+# Decompressed bytes are scanned in chunks of this size.
+STREAM_CHUNK = 8 * 2 ** 20
+
+# External gzip decompressors preferred over the gzip module when installed: they
+# decompress in separate threads and stream to us through a pipe, never to disk.
+GZIP_TOOLS = ('igzip', 'pigz')
+
+
+def detect_compression(file_path):
+    """
+    Return 'gzip', 'bz2', 'xz' or 'zstd' for a compressed stat file, None otherwise.
+    """
+    with open(file_path, 'rb') as file:
+        head = file.read(6)
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+# What the decompressors raise for a truncated or corrupt archive.
+DECOMPRESSION_ERRORS = (EOFError, zlib.error, lzma.LZMAError, gzip.BadGzipFile)
+
+
+@contextlib.contextmanager
+def open_decompressed(file_path, compression):
+    """
+    Open a compressed stat file as a binary stream of its decompressed bytes.
+    Multi-member gzip files (e.g. from pigz or concatenated archives) are read whole.
+    A truncated or corrupt archive raises ValueError.
+    """
+    if compression == 'gzip':
+        tool = next((tool for tool in GZIP_TOOLS if shutil.which(tool)), None)
+        if tool is not None:
+            import subprocess
+            process = subprocess.Popen([tool, '-dc', file_path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                       bufsize=STREAM_CHUNK)
+            finished = False
+            try:
+                yield process.stdout
+                # Once all the output was read, the exit status tells whether the archive was whole.
+                finished = not process.stdout.read(1)
+            finally:
+                process.stdout.close()
+                if not finished:
+                    process.kill()
+                returncode = process.wait()
+            if finished and returncode != 0:
+                raise ValueError(f"{file_path} is truncated or corrupt ({tool} exited with status {returncode})")
+            return
+        stream = gzip.open(file_path, 'rb')
+    elif compression == 'bz2':
+        stream = bz2.open(file_path, 'rb')
+    elif compression == 'xz':
+        stream = lzma.open(file_path, 'rb')
+    else:
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(f"{file_path} is zstd-compressed; install the zstandard package to read it")
+        raw = open(file_path, 'rb')
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, read_size=STREAM_CHUNK, closefd=True)
+    errors = DECOMPRESSION_ERRORS + ((zstandard.ZstdError,) if compression == 'zstd' else ())
+    with stream:
+        try:
+            yield stream
+        except errors as e:
+            raise ValueError(f"{file_path} is truncated or corrupt ({e})") from None
+
+
+def iter_stream_lines(stream, chunk_size=STREAM_CHUNK):
+    """
+    Byte-level scan of a binary stream: read it in large chunks and yield the lines
+    filtered_lines picks from each, like iter_mapped_lines does for mapped files.
+    """
+    # A leading newline anchors the first line; a partial last line is carried over.
+    carry = b'\n'
+    while chunk := stream.read(chunk_size):
+        data = carry + chunk
+        cut = data.rfind(b'\n')
+        yield from filtered_lines(data, 0, cut)
+        carry = data[cut:]
+    yield from filtered_lines(carry, 0, len(carry))
+
+
+@contextlib.contextmanager
+def open_stat_lines(file_path, scan="mmap"):
+    """
+    Open a plain or compressed stat file and yield an iterator over the lines to scan.
+    For compressed files the 'mmap' mode scans decompressed chunks at the byte level.
+    """
+    compression = detect_compression(file_path)
+    if compression is not None:
+        with open_decompressed(file_path, compression) as stream:
+            if scan == "mmap":
+                yield iter_stream_lines(stream)
+            else:
+                yield io.TextIOWrapper(stream)
+    elif scan == "mmap":
+        with open(file_path, 'rb') as file:
+            yield iter_mapped_lines(file)
+    else:
+        with open(file_path, 'r') as file:
+            yield file
+
+
+def iter_range_lines(mapped, ranges):
+    """
+    Yield the lines LINE_FILTER matches in the given (start, end) byte ranges of a
+    mapped stat file; every start must be the offset of a line start.
+    """
+    for start, end in ranges:
+        if start == 0:
+            start = mapped.find(b'\n', 0, end)
+            if start < 0:
+                start = end
+            yield mapped[:start].decode()
+        else:
+            start -= 1
+        matches = LINE_FILTER.finditer(mapped, start, end)
+        try:
+            for match in matches:
+                yield match.group(1).decode()
+        finally:
+            del matches
+
+
+# Stats read from an index for any category selection: the active core is picked
+# by the first two, and the per-interval table shows the others.
+INDEX_BASE_KEYS = ('numCycles', 'committedInsts', 'cache_misses', 'bw_read', 'bw_write')
+
+
+def index_patterns(categories):
+    """
+    Stat-name patterns an indexed scan has to read for the given categories.
+    """
+    return [pattern for category, entries in stat_schema.STAT_SCHEMA.items() for key, pattern, kind, label in entries
+            if category in categories or key in INDEX_BASE_KEYS]
+
+
+def iter_indexed_dumps(mapped, index, dumps=None, categories=None, counters=None):
+    """
+    Yield (dump_index, (cpu_stats, mem_ctrl_data, system_stats)) for the dumps picked
+    by dumps, scanning only the objects of the categories (all if None) in each.
+    """
+    if categories is None:
+        object_ids = set(range(len(index.objects)))
+    else:
+        import stat_index
+        object_ids = index.matching_objects(stat_index.object_filter(index_patterns(categories)))
+    hits = counters.hits if counters is not None else None
+    for dump_index in range(len(index))[dumps or slice(None)]:
+        lines = itertools.chain(iter_range_lines(mapped, index.block_ranges(dump_index, object_ids)), (END_MARKER,))
+        if counters is not None:
+            lines = counters.count_lines(lines)
+        # The appended end marker always completes the block.
+        cpu_stats, mem_ctrl_data, system_stats, _ = scan_stat_lines(lines, hits)
+        yield dump_index, (cpu_stats, mem_ctrl_data, system_stats)
+
+
+@contextlib.contextmanager
+def open_stat_dumps(file_path, dumps=None, scan="mmap", counters=None, categories=None):
+    """
+    Open a stat file and yield an iterator over (dump_index, (cpu_stats, mem_ctrl_data,
+    system_stats)) for the selected dumps. The index scan mode builds or loads the
+    file's sidecar index and reads only the selected dumps and categories; compressed
+    files, which cannot be indexed, are scanned in mmap mode instead.
+    """
+    if scan == "index" and detect_compression(file_path) is None:
+        import stat_index
+        index = stat_index.ensure_index(file_path)
+        if not len(index):
+            yield iter(())
+            return
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield iter_indexed_dumps(mapped, index, dumps, categories, counters)
+        return
+
+    with open_stat_lines(file_path, "mmap" if scan == "index" else scan) as lines:
+        hits = None
+        if counters is not None:
+            lines = counters.count_lines(lines)
+            hits = counters.hits
+        yield select_dumps(iter_stat_dumps(lines, hits), dumps)
+
+
+def iter_stat_dumps(lines, hits=None):
+    """
+    Yield (cpu_stats, mem_ctrl_data, system_stats) for each dump block in order. Trailing
+    lines without an end marker (or a file without any markers) are yielded as a final
+    block if they contain any tracked stats.
+    """
+    lines = iter(lines)
+    while True:
+        cpu_stats, mem_ctrl_data, system_stats, complete = scan_stat_lines(lines, hits)
+        if complete or cpu_stats or mem_ctrl_data or system_stats:
+            yield cpu_stats, mem_ctrl_data, system_stats
+        if not complete:
+            return
+
+
+def select_dumps(dumps, selection):
+    """
+    Yield (index, dump) pairs for the dumps picked by selection (None or a slice).
+    Non-negative ranges stream; negative bounds only buffer as many dumps as they reach back.
+    """
+    dumps = enumerate(dumps)
+    if selection is None:
+        yield from dumps
+        return
+
+    start, stop, step = selection.start or 0, selection.stop, selection.step or 1
+    if start >= 0 and (stop is None or stop >= 0):
+        yield from itertools.islice(dumps, start, stop, step)
+    elif start >= 0:
+        # Stop counts back from the end: hold back the last -stop dumps.
+        pending = collections.deque()
+        for index, dump in dumps:
+            pending.append((index, dump))
+            if len(pending) > -stop:
+                index, dump = pending.popleft()
+                if index >= start and (index - start) % step == 0:
+                    yield index, dump
+    else:
+        tail = collections.deque(dumps, maxlen=-start)
+        if tail:
+            wanted = set(range(tail[-1][0] + 1)[selection])
+            yield from (pair for pair in tail if pair[0] in wanted)
+
+
+def select_active_cpu(cpu_stats):
+    """
+    Pick the active core by the number of clocks and instructions.
+    """
+    return max(cpu_stats, key=lambda cpu: (cpu_stats[cpu].get('numCycles', 0),
+                                           cpu_stats[cpu].get('committedInsts', 0)))
+
+
+@functools.lru_cache(maxsize=1)
+def derived_metrics():
+    """
+    The stat_schema.DERIVED expressions, compiled on first use.
+    """
+    return tuple(stat_derive.DerivedMetric(name, expression) for name, expression in stat_schema.DERIVED.items())
+
+
+# stat_schema.DERIVED compiled by stat_derive.compile_nested, for each shape of the memory
+# controller stats (controller ids and stat keys) it was evaluated on: (paths, code).
+DERIVED_PROGRAMS = {}
+
+
+def derived_program(stats):
+    """
+    The compiled stat_schema.DERIVED for the memory controller stats of a stats dict:
+    the (parents, key) paths of the metrics and the code returning their values.
+    """
+    mem_ctrl_data = stats['mem_ctrl_data']
+    shape = tuple((ctrl, tuple(mem_ctrl)) for ctrl, mem_ctrl in mem_ctrl_data.items())
+    program = DERIVED_PROGRAMS.get(shape)
+    if program is None:
+        names = stat_export.flatten_stats({'mem_ctrl_data': mem_ctrl_data})
+        metric_names, code = stat_derive.compile_nested(derived_metrics(), tuple(names))
+        program = DERIVED_PROGRAMS[shape] = [split_name(name) for name in metric_names], code
+    return program
+
+
+def build_cpu_statistics(cpu_stats, mem_ctrl_data, active_cpu, system_stats=None):
+    """
+    Assemble the stats dict for one CPU, including system-wide stats and the derived
+    stats of stat_schema.DERIVED (e.g. memory controller balance shares). The stats
+    of every core are kept under 'cpus'.
+    """
+    stats = dict(system_stats or {})
+    stats.update(cpu_stats.get(active_cpu, {}))
+    stats['cpus'] = cpu_stats
+    stats['mem_ctrl_data'] = mem_ctrl_data
+
+    paths, code = derived_program(stats)
+    for (parents, key), value in zip(paths, stat_derive.evaluate_nested(code, stats)):
+        nest(stats, parents, key, value)
+    return stats
+
+
+def cpu_number(cpu):
+    return int(cpu[len('cpu'):])
+
+
+def core_names(stats, cpus=None):
+    """
+    Names of the cores in stats['cpus'] in numeric order. cpus limits them to the
+    given core numbers or 'cpuN' names; None keeps every core.
+    """
+    names = sorted(stats.get('cpus', {}), key=cpu_number)
+    if cpus is None:
+        return names
+    wanted = {f"cpu{cpu}" if isinstance(cpu, int) else cpu for cpu in cpus}
+    return [name for name in names if name in wanted]
+
+
+def core_value(core_stats, name):
+    """
+    Value of a stat of one core by its flattened name (e.g. 'ipc', 'FU_Busy.IntAlu.count'),
+    or None if the core does not have it.
+    """
+    value = core_stats
+    for key in name.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+AGGREGATES = ('sum', 'mean', 'min', 'max')
+
+
+def aggregate_cores(stats, name, cpus=None):
+    """
+    System-wide sum, mean, min and max of a per-core stat over the selected cores
+    that have it, as a dict keyed by AGGREGATES (empty if no core has the stat).
+    """
+    values = [core_value(stats['cpus'][cpu], name) for cpu in core_names(stats, cpus)]
+    values = [value for value in values if value is not None]
+    if not values:
+        return {}
+    total = sum(values)
+    return {'sum': total, 'mean': total / len(values), 'min': min(values), 'max': max(values)}
+
+
+SCAN_MODES = ["lines", "mmap", "index"]
+
+
+class ScanCounters:
+    """
+    Lines handed to the scanner and matches per STAT_LEAVES entry, counted while profiling.
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.hits = collections.Counter()
+
+    def count_lines(self, lines):
+        for line in lines:
+            self.lines += 1
+            yield line
+
+    def hits_by_key(self):
+        return {STAT_LEAVES[index][0]: count for index, count in self.hits.items()}
+
+
+def parse_stats_dumps(file_path, dumps=None, active_cpu=None, scan="mmap", counters=None, categories=None):
+    """
+    Stream a stat file and yield (dump_index, active_cpu, stats) for every selected dump
+    block. If active_cpu is None the active core is chosen per dump after its scan.
+    scan is 'lines' (read the file line by line), 'mmap' (byte-level scan of the mapped
+    file, or of decompressed chunks for gzip/bz2/xz/zstd files) or 'index' (seek to the
+    selected dumps through a sidecar index, see open_stat_dumps). categories limits an
+    index scan to the stats of those schema categories (plus INDEX_BASE_KEYS); other
+    modes always collect every stat. counters, a ScanCounters, is updated with the lines
+    scanned and the stats matched.
+    """
+    with open_stat_dumps(file_path, dumps, scan, counters, categories) as selected_dumps:
+        for dump_index, (cpu_stats, mem_ctrl_data, system_stats) in selected_dumps:
+            dump_cpu = active_cpu
+            if dump_cpu is None:
+                if not cpu_stats:
+                    raise ValueError(f"No CPU statistics found in dump {dump_index} of {file_path}")
+                dump_cpu = select_active_cpu(cpu_stats)
+            yield dump_index, dump_cpu, build_cpu_statistics(cpu_stats, mem_ctrl_data, dump_cpu, system_stats)
+
+
+def parse_stats_file(file_path, active_cpu=None, dumps=None, scan="mmap", categories=None):
+    """
+    Parse a stat file in a single pass and return (active_cpu, stats) for the last
+    selected dump block (by default the last dump in the file).
+    """
+    result = None
+    for _, dump_cpu, stats in parse_stats_dumps(file_path, dumps, active_cpu, scan, categories=categories):
+        result = dump_cpu, stats
+    if result is None:
+        raise ValueError(f"No statistics dumps selected in {file_path}")
+    return result
+
+
+def last_block_end(file, start, size):
+    """
+    Offset of the newline that ends the last complete dump block between start and
+    size of a binary stat file, or None if no block has ended there yet.
+    """
+    if size <= start:
+        return None
+    marker = END_MARKER.encode()
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        position = mapped.rfind(marker, start, size)
+        while position >= 0:
+            line_end = mapped.find(b'\n', position, size)
+            if line_end >= 0:
+                return line_end
+            position = mapped.rfind(marker, start, position)
+    return None
+
+
+def follow_stats_dumps(file_path, poll_interval=2.0):
+    """
+    Follow a stat file that is still being written and yield, per poll, the list of
+    (dump_index, active_cpu, stats) of the dump blocks completed since the last poll
+    (polls without new blocks yield nothing). Only bytes after the last complete block
+    are scanned; a file that shrinks is treated as rewritten and read from the start.
+    """
+    offset = 0
+    dump_index = 0
+    while True:
+        size = os.path.getsize(file_path)
+        if size < offset:
+            offset = dump_index = 0
+        with open(file_path, 'rb') as file:
+            end = last_block_end(file, offset, size)
+            if end is not None:
+                batch = []
+                for cpu_stats, mem_ctrl_data, system_stats in iter_stat_dumps(iter_mapped_lines(file, offset, end)):
+                    if cpu_stats:
+                        active_cpu = select_active_cpu(cpu_stats)
+                        batch.append((dump_index, active_cpu,
+                                      build_cpu_statistics(cpu_stats, mem_ctrl_data, active_cpu, system_stats)))
+                    dump_index += 1
+                offset = end
+                if batch:
+                    yield batch
+        time.sleep(poll_interval)
+
+
+def parse_file_record(file_path, dumps=None, scan="mmap", active_cpu=None, categories=None, counters=None):
+    """
+    Parse one stat file into the compact record the CLI needs: (active_cpu, stats,
+    interval_rows) for the last selected dump plus one interval row per selected dump.
+    Runs in worker processes, so only this record is sent back to the parent.
+    """
+    record_cpu = stats = None
+    interval_rows = []
+    for dump_index, dump_cpu, dump_stats in parse_stats_dumps(file_path, dumps, active_cpu, scan, counters, categories):
+        interval_rows.append(dump_interval_row(dump_index, dump_stats, stats))
+        record_cpu, stats = dump_cpu, dump_stats
+    if stats is None:
+        raise ValueError(f"No statistics dumps selected in {file_path}")
+    return record_cpu, stats, interval_rows
+
+
+def profile_file_record(file_path, dumps=None, scan="mmap", active_cpu=None, categories=None):
+    """
+    parse_file_record plus a profile of the parse: (record, {'path', 'bytes',
+    'lines_scanned', 'wall_seconds', 'cpu_seconds', 'hits'}) where hits counts the
+    matched lines per stat key. Runs in worker processes like parse_file_record.
+    """
+    counters = ScanCounters()
+    wall, cpu = time.perf_counter(), time.process_time()
+    record = parse_file_record(file_path, dumps, scan, active_cpu, categories, counters)
+    return record, {
+        'path': file_path,
+        'bytes': os.path.getsize(file_path),
+        'lines_scanned': counters.lines,
+        'wall_seconds': time.perf_counter() - wall,
+        'cpu_seconds': time.process_time() - cpu,
+        'hits': counters.hits_by_key(),
+    }
+
+
+def iter_files(function, file_paths, jobs=1, *args):
+    """
+    Yield function(file_path, *args) for each file in the order of file_paths, computed
+    in a process pool when jobs > 1 (0 means one worker per core).
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(file_paths))
+    if jobs <= 1:
+        for file_path in file_paths:
+            yield function(file_path, *args)
+        return
+    import concurrent.futures
+    chunksize = max(1, len(file_paths) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(function, file_paths, *(itertools.repeat(arg) for arg in args), chunksize=chunksize)
+
+
+def map_files(function, file_paths, jobs=1, *args):
+    """
+    iter_files as a list.
+    """
+    return list(iter_files(function, file_paths, jobs, *args))
+
+
+# Bump when the record returned by parse_file_record changes shape, so cached records are dropped.
+RECORD_VERSION = 4
+
+# The version the parsed-stats cache is opened with: the record version and a digest of the
+# tracked and derived stats, so cached records are also dropped when a metric is added or changed.
+# SQLite keeps it as a signed 32-bit user_version.
+CACHE_VERSION = zlib.crc32(repr((RECORD_VERSION, stat_schema.STAT_SCHEMA, stat_schema.DERIVED)).encode()) & 0x7fffffff
+
+
+def dump_selection_key(dumps, active_cpu=None, categories=None):
+    """
+    Stable text form of a dump selection (and a fixed CPU, and the categories an index
+    scan was limited to), used as part of the cache key.
+    """
+    key = 'all' if dumps is None else f"{dumps.start}:{dumps.stop}:{dumps.step}"
+    if active_cpu is not None:
+        key = f"{key}@{active_cpu}"
+    if categories is not None:
+        key = f"{key}#{','.join(sorted(categories))}"
+    return key
+
+
+def parse_files(file_paths, dumps=None, jobs=1, cache=None, scan="mmap", active_cpu=None, profiles=None,
+                categories=None):
+    """
+    Parse many stat files, using a process pool when jobs > 1 (0 means one worker per core).
+    Records are returned in the order of file_paths regardless of completion order.
+    With a StatCache, valid cached records are reused and fresh ones are stored.
+    If profiles is a list, one profile per file (see profile_file_record; cached files
+    only get {'path', 'cached': True}) is appended to it in the order of file_paths.
+    categories limits 'index' scans as in parse_stats_dumps and is ignored otherwise.
+    """
+    if scan != "index":
+        categories = None
+    records = [None] * len(file_paths)
+    selection = dump_selection_key(dumps, active_cpu, categories)
+    if cache is not None:
+        for index, file_path in enumerate(file_paths):
+            records[index] = cache.get(file_path, selection)
+    missing = [index for index, record in enumerate(records) if record is None]
+    missing_paths = [file_paths[index] for index in missing]
+
+    parse_file = parse_file_record if profiles is None else profile_file_record
+    parsed = map_files(parse_file, missing_paths, jobs, dumps, scan, active_cpu, categories)
+    if profiles is not None:
+        file_profiles = {index: profile for index, (record, profile) in zip(missing, parsed)}
+        profiles.extend(file_profiles.get(index, {'path': file_path, 'cached': True})
+                        for index, file_path in enumerate(file_paths))
+        parsed = [record for record, profile in parsed]
+
+    for index, record in zip(missing, parsed):
+        records[index] = record
+        if cache is not None:
+            cache.put(file_paths[index], selection, record)
+    return records
+
+
+def counter_delta(current, previous):
+    """
+    Interval delta of a cumulative counter. A counter that went down was reset by
+    m5 dumpresetstats, so the current value already is the interval value.
+    """
+    if current is None:
+        return None
+    if previous is None or current < previous:
+        return current
+    return current - previous
+
+
+def dump_interval_row(dump_index, stats, previous):
+    """
+    Build one row of the per-interval table: IPC over the interval, cache misses and
+    total DRAM read/write bandwidth, each alongside its change since the previous dump.
+    """
+    previous = previous or {}
+    cycles = counter_delta(stats.get('numCycles'), previous.get('numCycles'))
+    insts = counter_delta(stats.get('committedInsts'), previous.get('committedInsts'))
+    interval_ipc = insts / cycles if cycles and insts is not None else 'N/A'
+
+    def total_bw(dump_stats, key):
+        mem_ctrls = dump_stats.get('mem_ctrl_data', {})
+        return sum(mem_ctrl.get(key, 0) for mem_ctrl in mem_ctrls.values()) if mem_ctrls else None
+
+    def change(current, before):
+        return current - before if current is not None and before is not None else 'N/A'
+
+    misses = stats.get('cache_misses')
+    read_bw, write_bw = total_bw(stats, 'bw_read'), total_bw(stats, 'bw_write')
+    return [
+        dump_index,
+        interval_ipc,
+        counter_delta(misses, previous.get('cache_misses')) if misses is not None else 'N/A',
+        read_bw if read_bw is not None else 'N/A',
+        change(read_bw, total_bw(previous, 'bw_read')),
+        write_bw if write_bw is not None else 'N/A',
+        change(write_bw, total_bw(previous, 'bw_write')),
+    ]
+
+
+DUMP_INTERVAL_HEADERS = ["Dump", "Interval IPC", "Interval Cache Misses", "DRAM Read BW (Bytes/s)",
+                         "Read BW Change", "DRAM Write BW (Bytes/s)", "Write BW Change"]
+
+
+# Every stat of a dump, tracked by the schema or not: the name and its first value field
+# (gem5 pads them with spaces). Like LINE_FILTER it anchors on the preceding newline,
+# which is much faster to search for than a multi-line ^.
+RAW_STAT_LINE = re.compile(r'\n([A-Za-z_]\S*) +(\S+)')
+
+
+def dump_block_bounds(data):
+    """
+    (start, end) byte offsets of every dump block in a stat file's contents. Trailing
+    bytes without an end marker count as a block if they hold any stat line.
+    """
+    marker = END_MARKER.encode()
+    bounds = []
+    start = 0
+    while (end := data.find(marker, start)) >= 0:
+        bounds.append((start, end))
+        start = end + len(marker)
+    if re.search(rb'^[A-Za-z_]', data[start:], re.MULTILINE):
+        bounds.append((start, len(data)))
+    return bounds
+
+
+def iter_stream_blocks(stream, chunk_size=STREAM_CHUNK):
+    """
+    Yield the bytes of every dump block of a binary stream, split like
+    dump_block_bounds splits a mapped file, reading the stream in chunks so that
+    only the current block and chunk are held in memory.
+    """
+    marker = END_MARKER.encode()
+    pending = b''
+    while chunk := stream.read(chunk_size):
+        # The pending bytes hold no marker, except one cut by the chunk boundary.
+        search_from = max(0, len(pending) - len(marker) + 1)
+        data = pending + chunk
+        start = 0
+        while (end := data.find(marker, max(start, search_from))) >= 0:
+            yield data[start:end]
+            start = end + len(marker)
+        pending = data[start:]
+    if re.search(rb'^[A-Za-z_]', pending, re.MULTILINE):
+        yield pending
+
+
+@contextlib.contextmanager
+def open_dump_blocks(file_path, dumps=None):
+    """
+    Yield an iterator over (dump index, block bytes) of the selected dump blocks (all
+    by default). Plain files are mapped and only the selected blocks are copied out;
+    compressed files are decompressed and split into blocks as they stream. Raises
+    ValueError if no dump is selected.
+    """
+    compression = detect_compression(file_path)
+    if compression is not None:
+        with open_decompressed(file_path, compression) as stream:
+            yield require_dumps(select_dumps(iter_stream_blocks(stream), dumps), file_path)
+        return
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield require_dumps(iter(()), file_path)
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            bounds = dump_block_bounds(mapped)
+            yield require_dumps(((index, mapped[bounds[index][0]:bounds[index][1]])
+                                 for index in range(len(bounds))[dumps or slice(None)]), file_path)
+
+
+def require_dumps(blocks, file_path):
+    """
+    Pass (dump index, block) pairs through, raising ValueError if there are none.
+    """
+    empty = True
+    for pair in blocks:
+        empty = False
+        yield pair
+    if empty:
+        raise ValueError(f"No statistics dumps selected in {file_path}")
+
+
+def raw_value(text):
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+def raw_stats(lines):
+    """
+    {stat name: float} of (name, value) pairs found by RAW_STAT_LINE.
+    """
+    try:
+        return {name: float(value) for name, value in lines}
+    except ValueError:
+        return {name: raw_value(value) for name, value in lines}
+
+
+def read_all_stats(file_path, dumps=None):
+    """
+    Every stat of the last selected dump block (by default the last dump) as
+    {stat name: float}, including the stats the schema does not track. Values that
+    are not numbers become NaN.
+    """
+    with open_dump_blocks(file_path, dumps or LAST_DUMP) as blocks:
+        dump_index, block = collections.deque(blocks, maxlen=1)[0]
+    return raw_stats(RAW_STAT_LINE.findall('\n' + block.decode()))
+
+
+@functools.lru_cache(maxsize=16)
+def raw_stat_line(names):
+    """
+    RAW_STAT_LINE limited to the stat names matching the regex source names.
+    """
+    return re.compile(r'\n(' + names + r') +(\S+)')
+
+
+def read_dump_stats(file_path, dumps=None, names=None):
+    """
+    The stats of every selected dump block (all dumps by default) as [(dump index,
+    {stat name: float})], read like read_all_stats. With names, a regex source
+    (e.g. from stat_derive.name_pattern), only the stats whose names match it.
+    """
+    line = RAW_STAT_LINE if names is None else raw_stat_line(names)
+    with open_dump_blocks(file_path, dumps) as blocks:
+        return [(index, raw_stats(line.findall('\n' + block.decode()))) for index, block in blocks]
+
+
+# Library API
+
+# The default dump selection: only the last dump of each file.
+LAST_DUMP = slice(-1, None)
+
+
+def parse_dumps(file_path, cpu=None, dumps=None, scan="mmap", categories=None):
+    """
+    Yield a StatsRecord for every selected dump of a stat file (all dumps by default).
+    Per-core stats come from cpu, or from the active core of each dump if cpu is None.
+    With scan='index', categories limits the stats read to those schema categories.
+    """
+    for dump_index, dump_cpu, stats in parse_stats_dumps(file_path, dumps, cpu, scan, categories=categories):
+        yield StatsRecord.from_stats(file_path, dump_index, dump_cpu, stats)
+
+
+def parse(file_path, cpu=None, dumps=LAST_DUMP, scan="mmap", categories=None):
+    """
+    Parse a stat file into the StatsRecord of its last selected dump.
+    dumps is None (all dumps) or a slice of dump indexes; by default only the last
+    dump is built.
+    """
+    record = None
+    for record in parse_dumps(file_path, cpu, dumps, scan, categories):
+        pass
+    if record is None:
+        raise ValueError(f"No statistics dumps selected in {file_path}")
+    return record
+
+
+def parse_many(file_paths, cpu=None, dumps=LAST_DUMP, jobs=1, cache=None, scan="mmap", categories=None):
+    """
+    Parse many stat files into a list of StatsRecord, one per file in the given order,
+    like parse(). jobs > 1 parses in that many worker processes (0: one per core);
+    with a stat_cache.StatCache, unchanged files are not parsed again.
+    """
+    records = parse_files(file_paths, dumps, jobs, cache, scan, cpu, categories=categories)
+    return [StatsRecord.from_stats(file_path, interval_rows[-1][0], active_cpu, stats)
+            for file_path, (active_cpu, stats, interval_rows) in zip(file_paths, records)]
@@ -0,0 +1,116 @@
+"""
+Run profiling for --profile.
+
+A Profiler accumulates wall and CPU time per named stage (parsing, table
+rendering, workbook writing, ...), keeps the per-file scan profiles returned by
+stat_parser.parse_files and reports the peak memory of the run. The summary is
+written as JSON; cProfile output can be dumped next to it.
+
+Stages are timed through the module-level stage() helper and the timed()
+decorator, which do nothing unless a profiler was installed with start(), so the
+timing points cost next to nothing in normal runs.
+"""
+import collections
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import time
+
+ACTIVE = None
+
+
+class Profiler:
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.worker_cpu = self.children_cpu()
+        self.stages = {}
+        self.files = []
+
+    @staticmethod
+    def children_cpu():
+        children = os.times()
+        return children.children_user + children.children_system
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+            totals['wall_seconds'] += time.perf_counter() - wall
+            totals['cpu_seconds'] += time.process_time() - cpu
+            totals['calls'] += 1
+
+    def summary(self):
+        """
+        The run as a JSON-serialisable dict: total and per-stage times, per-file
+        profiles, stat matches summed over all files, and peak RSS of this process
+        and of its worker processes in MB.
+        """
+        hits = collections.Counter()
+        for profile in self.files:
+            hits.update(profile.get('hits', {}))
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return {
+            'command': sys.argv,
+            'wall_seconds': time.perf_counter() - self.wall,
+            'cpu_seconds': time.process_time() - self.cpu,
+            'worker_cpu_seconds': self.children_cpu() - self.worker_cpu,
+            'stages': self.stages,
+            'files': self.files,
+            'bytes_scanned': sum(profile.get('bytes', 0) for profile in self.files if not profile.get('cached')),
+            'lines_scanned': sum(profile.get('lines_scanned', 0) for profile in self.files),
+            'hits': dict(hits.most_common()),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20,
+            'worker_peak_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20,
+        }
+
+    def write(self, path):
+        """
+        Write the summary to path and print its headline figures to stderr.
+        """
+        summary = self.summary()
+        with open(path, 'w') as file:
+            json.dump(summary, file, indent=1)
+
+        print(f"Profile: {summary['wall_seconds']:.3f} s wall, {summary['cpu_seconds']:.3f} s CPU "
+              f"(+{summary['worker_cpu_seconds']:.3f} s in workers), peak RSS {summary['peak_rss_mb']:.1f} MB, "
+              f"{summary['bytes_scanned'] / 2 ** 20:.1f} MB / {summary['lines_scanned']} lines scanned",
+              file=sys.stderr)
+        for name, totals in sorted(self.stages.items(), key=lambda item: -item[1]['wall_seconds']):
+            print(f"  {name:<10} {totals['wall_seconds']:8.3f} s wall {totals['cpu_seconds']:8.3f} s CPU "
+                  f"({totals['calls']} calls)", file=sys.stderr)
+        print(f"Profile summary saved as {path}", file=sys.stderr)
+
+
+def start():
+    global ACTIVE
+    ACTIVE = Profiler()
+    return ACTIVE
+
+
+def stage(name):
+    """
+    Time a stage of the active profiler; a no-op context without one.
+    """
+    if ACTIVE is None:
+        return contextlib.nullcontext()
+    return ACTIVE.stage(name)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as the given stage.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,158 @@
+"""
+Compact record of one parsed stat dump.
+
+A StatsRecord holds the stats of one file (or one dump) as two typed arrays,
+int64 and float64, instead of nested dicts. Nested stats are addressed by their
+flattened names, joined with '.' as in stat_export (e.g. 'ipc',
+'FU_Busy.IntAlu.count', 'mem_ctrl_data.0.bw_read'). The names live in a layout
+shared by every record with the same set of stats, so a record costs little more
+than its two arrays: about 0.8 KB with the default schema, against 5.5 KB for
+the nested dicts it replaces. Distribution and vector stats are kept apart, by
+flattened name, as stat_dist.Distribution objects whose buckets are arrays too.
+"""
+import sys
+from array import array
+
+import stat_dist
+import stat_export
+
+
+def split_name(name):
+    """
+    'mem_ctrl_data.0.bw_read' -> (('mem_ctrl_data', '0'), 'bw_read').
+    """
+    *parents, key = name.split('.')
+    return tuple(parents), key
+
+
+def nest(stats, parents, key, value):
+    for parent in parents:
+        stats = stats.setdefault(parent, {})
+    stats[key] = value
+
+
+class StatsLayout:
+    """
+    Stat names of a record in parse order, whether each value is a float, and
+    where it is stored: index maps a name to (is_float, position in the int or
+    float array). paths holds each name split into its parent keys and last key,
+    for rebuilding the nested dict.
+    """
+    __slots__ = ('names', 'float_flags', 'index', 'paths')
+
+    def __init__(self, names, float_flags):
+        self.names = names
+        self.float_flags = float_flags
+        self.paths = tuple(split_name(name) for name in names)
+        self.index = {}
+        counts = [0, 0]
+        for name, is_float in zip(names, float_flags):
+            self.index[name] = (is_float, counts[is_float])
+            counts[is_float] += 1
+
+
+# Layouts by (names, float flags). Runs of one simulator configuration share a single
+# layout, so this stays as small as the number of distinct configurations parsed.
+LAYOUTS = {}
+
+
+def shared_layout(names, float_flags):
+    key = (names, float_flags)
+    layout = LAYOUTS.get(key)
+    if layout is None:
+        layout = LAYOUTS[key] = StatsLayout(tuple(sys.intern(name) for name in names), float_flags)
+    return layout
+
+
+def restore_record(path, dump, cpu, names, float_flags, ints, floats, distributions=None):
+    """
+    Unpickle a StatsRecord onto the shared layout of this process.
+    """
+    return StatsRecord(path, dump, cpu, shared_layout(names, float_flags), ints, floats, distributions)
+
+
+class StatsRecord:
+    """
+    Stats of one dump of a stat file: the file path, the dump index, the CPU the
+    per-core stats were taken from, and the values by flattened stat name.
+    Behaves as a read-only mapping of the scalar stats; distributions maps the
+    flattened names of distribution stats to their Distribution (and indexing by
+    such a name returns it too). to_dict() rebuilds the nested stats dict.
+    """
+    __slots__ = ('path', 'dump', 'cpu', 'layout', 'ints', 'floats', 'distributions')
+
+    def __init__(self, path, dump, cpu, layout, ints, floats, distributions=None):
+        self.path = path
+        self.dump = dump
+        self.cpu = cpu
+        self.layout = layout
+        self.ints = ints
+        self.floats = floats
+        self.distributions = distributions or {}
+
+    @classmethod
+    def from_stats(cls, path, dump, cpu, stats):
+        """
+        Build a record from a nested stats dict as returned by the parser.
+        """
+        flat = stat_export.flatten_stats(stats)
+        names = tuple(flat)
+        float_flags = tuple(isinstance(value, float) for value in flat.values())
+        layout = shared_layout(names, float_flags)
+        ints = array('q', (value for value in flat.values() if not isinstance(value, float)))
+        floats = array('d', (value for value in flat.values() if isinstance(value, float)))
+        return cls(path, dump, cpu, layout, ints, floats, stat_dist.flatten_distributions(stats))
+
+    def __reduce__(self):
+        return restore_record, (self.path, self.dump, self.cpu, self.layout.names, self.layout.float_flags,
+                                self.ints, self.floats, self.distributions)
+
+    def __getitem__(self, name):
+        location = self.layout.index.get(name)
+        if location is None:
+            return self.distributions[name]
+        return self.floats[location[1]] if location[0] else self.ints[location[1]]
+
+    def get(self, name, default=None):
+        location = self.layout.index.get(name)
+        if location is None:
+            return self.distributions.get(name, default)
+        return self.floats[location[1]] if location[0] else self.ints[location[1]]
+
+    def __contains__(self, name):
+        return name in self.layout.index or name in self.distributions
+
+    def __iter__(self):
+        return iter(self.layout.names)
+
+    def __len__(self):
+        return len(self.layout.names)
+
+    def keys(self):
+        return self.layout.names
+
+    def items(self):
+        return [(name, self[name]) for name in self.layout.names]
+
+    def to_dict(self):
+        """
+        The nested stats dict this record was built from.
+        """
+        stats = {}
+        ints, floats = iter(self.ints), iter(self.floats)
+        for (parents, key), is_float in zip(self.layout.paths, self.layout.float_flags):
+            nest(stats, parents, key, next(floats) if is_float else next(ints))
+        for name, distribution in self.distributions.items():
+            nest(stats, *split_name(name), distribution)
+        return stats
+
+    def __eq__(self, other):
+        if not isinstance(other, StatsRecord):
+            return NotImplemented
+        return (self.path, self.dump, self.cpu) == (other.path, other.dump, other.cpu) and \
+            self.items() == other.items() and self.distributions == other.distributions
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"StatsRecord(path={self.path!r}, dump={self.dump}, cpu={self.cpu!r}, {len(self)} stats)"
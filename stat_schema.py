@@ -0,0 +1,202 @@
+"""
+Declarative stat schema.
+
+Every tracked stat is one STAT_SCHEMA entry: (key, stat-name pattern, type, label).
+The key is where the value is stored in the parsed stats, the label is the row
+name in reports (None: parsed but not displayed). Adding a metric only takes a
+new entry here.
+
+Patterns use:
+    {cpu}   the core component of system.clusters.cpuN; the stat is stored per CPU
+    {ctrl}  the number of system.mem_ctrlsN; the stat is stored per memory controller
+    {n}     an index that is matched but ignored (e.g. lsq{n})
+    *       a name component that becomes a nested key (e.g. statFuBusy::*)
+    {bucket} the bucket or summary sub-name of a 'dist' stat (e.g. rdQLenPdf::{bucket})
+Stats without {cpu} or {ctrl} are stored once per dump for the whole system.
+
+Types are 'int', 'float', 'busy' for vector entries stored as
+{'count': value, 'rate': percentage}, and 'dist' for distribution, histogram and
+vector stats whose lines are collected into one stat_dist.Distribution.
+statFuBusy is a vector too but stays 'busy': its entries are flattened into
+scalars (FU_Busy.IntAlu.count) that records keep in their shared-layout
+arrays, which is smaller than a Distribution per core and run, and tables,
+exports and sweeps address them by those names.
+
+DERIVED holds the stats computed from the parsed ones, as stat_derive
+expressions over the flattened stat names (mem_ctrl_data.0.bw_read), keyed by
+the flattened name they are stored under.
+
+compile_matcher() turns all patterns into one regular expression shaped like a
+trie over name components, so resolving a stat name costs about the same
+whether 30 or 300 stats are tracked.
+"""
+import re
+
+STAT_SCHEMA = {
+    'cpu': [
+        ('numCycles', 'system.clusters.{cpu}.numCycles', 'int', 'Cycles'),
+        ('instsIssued', 'system.clusters.{cpu}.instsIssued', 'int', 'Instructions Issued'),
+        ('committedInsts', 'system.clusters.{cpu}.committedInsts', 'int', 'Instructions Committed'),
+        ('cpi', 'system.clusters.{cpu}.cpi', 'float', 'CPI'),
+        ('ipc', 'system.clusters.{cpu}.ipc', 'float', 'IPC'),
+    ],
+    'lsq': [
+        ('lsq_forw_loads', 'system.clusters.{cpu}.lsq{n}.forwLoads', 'int', 'Forwarded Loads'),
+        ('lsq_squashed_loads', 'system.clusters.{cpu}.lsq{n}.squashedLoads', 'int', 'Squashed Loads'),
+        ('lsq_squashed_stores', 'system.clusters.{cpu}.lsq{n}.squashedStores', 'int', 'Squashed Stores'),
+        ('lsq_ignored_responses', 'system.clusters.{cpu}.lsq{n}.ignoredResponses', 'int', 'Ignored Responses'),
+        ('lsq_mem_order_violations', 'system.clusters.{cpu}.lsq{n}.memOrderViolation', 'int',
+         'Memory Order Violations'),
+        ('lsq_rescheduled_loads', 'system.clusters.{cpu}.lsq{n}.rescheduledLoads', 'int', 'Rescheduled Loads'),
+        ('lsq_blocked_by_cache', 'system.clusters.{cpu}.lsq{n}.blockedByCache', 'int', 'Blocked By Cache'),
+        ('MemDepUnit', 'system.clusters.{cpu}.MemDepUnit__*.*', 'int', None),
+    ],
+    'fu': [
+        ('FU_Busy', 'system.clusters.{cpu}.statFuBusy::*', 'busy', None),
+    ],
+    'cache': [
+        ('cache_hits', 'system.clusters.{cpu}.dcache.overallHits::total', 'int', 'Cache Hits'),
+        ('cache_misses', 'system.clusters.{cpu}.dcache.overallMisses::total', 'int', 'Cache Misses'),
+        ('cache_miss_rate', 'system.clusters.{cpu}.dcache.overallMissRate::total', 'float', 'Cache Miss Rate'),
+        ('cache_miss_latency', 'system.clusters.{cpu}.dcache.overallAvgMissLatency::total', 'float',
+         'Cache Miss Latency'),
+    ],
+    'bp': [
+        ('btb_lookups', 'system.clusters.{cpu}.branchPred.BTBLookups', 'int', 'BTB Lookups'),
+        ('btb_hits', 'system.clusters.{cpu}.branchPred.BTBHits', 'int', 'BTB Hits'),
+        ('btb_hit_ratio', 'system.clusters.{cpu}.branchPred.BTBHitRatio', 'float', 'BTB Hit Ratio'),
+    ],
+    'mem_ctrl': [
+        ('bw_read', 'system.mem_ctrls{ctrl}.dram.bwRead::total', 'int', 'Read Bandwidth (Bytes/s)'),
+        ('bw_write', 'system.mem_ctrls{ctrl}.dram.bwWrite::total', 'int', 'Write Bandwidth (Bytes/s)'),
+        ('read_bursts', 'system.mem_ctrls{ctrl}.dram.readBursts', 'int', 'Read Bursts'),
+        ('write_bursts', 'system.mem_ctrls{ctrl}.dram.writeBursts', 'int', 'Write Bursts'),
+        ('queue_latency', 'system.mem_ctrls{ctrl}.dram.avgQueueLatency', 'float', 'Queue Latency'),
+        ('accesses', 'system.mem_ctrls{ctrl}.dram.accesses::total', 'int', 'Total Accesses'),
+    ],
+    'icache': [
+        ('icache_hits', 'system.clusters.{cpu}.icache.overallHits::total', 'int', 'ICache Hits'),
+        ('icache_misses', 'system.clusters.{cpu}.icache.overallMisses::total', 'int', 'ICache Misses'),
+        ('icache_miss_rate', 'system.clusters.{cpu}.icache.overallMissRate::total', 'float', 'ICache Miss Rate'),
+        ('icache_miss_latency', 'system.clusters.{cpu}.icache.overallAvgMissLatency::total', 'float',
+         'ICache Miss Latency'),
+    ],
+    'l2cache': [
+        ('l2_hits', 'system.l2.overallHits::total', 'int', 'L2 Hits'),
+        ('l2_misses', 'system.l2.overallMisses::total', 'int', 'L2 Misses'),
+        ('l2_miss_rate', 'system.l2.overallMissRate::total', 'float', 'L2 Miss Rate'),
+        ('l2_miss_latency', 'system.l2.overallAvgMissLatency::total', 'float', 'L2 Miss Latency'),
+    ],
+    'tlb': [
+        ('dtb_read_hits', 'system.clusters.{cpu}.mmu.dtb.readHits', 'int', 'DTB Read Hits'),
+        ('dtb_read_misses', 'system.clusters.{cpu}.mmu.dtb.readMisses', 'int', 'DTB Read Misses'),
+        ('dtb_write_hits', 'system.clusters.{cpu}.mmu.dtb.writeHits', 'int', 'DTB Write Hits'),
+        ('dtb_write_misses', 'system.clusters.{cpu}.mmu.dtb.writeMisses', 'int', 'DTB Write Misses'),
+        ('itb_inst_hits', 'system.clusters.{cpu}.mmu.itb.instHits', 'int', 'ITB Instruction Hits'),
+        ('itb_inst_misses', 'system.clusters.{cpu}.mmu.itb.instMisses', 'int', 'ITB Instruction Misses'),
+    ],
+    'dist': [
+        ('load_to_use', 'system.clusters.{cpu}.lsq{n}.loadToUse::{bucket}', 'dist', 'Load-to-Use Latency (Cycles)'),
+        ('rd_queue_length', 'system.mem_ctrls{ctrl}.rdQLenPdf::{bucket}', 'dist', 'Read Queue Length'),
+        ('wr_queue_length', 'system.mem_ctrls{ctrl}.wrQLenPdf::{bucket}', 'dist', 'Write Queue Length'),
+        ('rd_per_turnaround', 'system.mem_ctrls{ctrl}.rdPerTurnAround::{bucket}', 'dist', 'Reads per Turnaround'),
+        ('wr_per_turnaround', 'system.mem_ctrls{ctrl}.wrPerTurnAround::{bucket}', 'dist', 'Writes per Turnaround'),
+        ('bytes_per_activate', 'system.mem_ctrls{ctrl}.dram.bytesPerActivate::{bucket}', 'dist',
+         'Bytes per Activate'),
+    ],
+}
+
+# Each controller's share of the total DRAM bandwidth, in percent (0 when there is no traffic).
+DERIVED = {
+    'mem_ctrl_data.{ctrl}.read_share':
+        'coalesce(coalesce(mem_ctrl_data.{ctrl}.bw_read, 0) / mem_ctrl_data.*.bw_read * 100, 0)',
+    'mem_ctrl_data.{ctrl}.write_share':
+        'coalesce(coalesce(mem_ctrl_data.{ctrl}.bw_write, 0) / mem_ctrl_data.*.bw_write * 100, 0)',
+}
+
+TOKEN_SPLIT = re.compile(r'(\{cpu\}|\{ctrl\}|\{n\}|\{bucket\}|\*|\.|::)')
+
+# Placeholder -> regex; capturing placeholders open a group in the compiled matcher.
+PLACEHOLDERS = {
+    '{cpu}': r'(cpu\d+)',
+    '{ctrl}': r'(\d+)',
+    '{n}': r'\d+',
+    '*': r'(\w+)',
+    '{bucket}': r'([\w.+-]+)',
+}
+
+
+def tokenize(pattern):
+    return [token for token in TOKEN_SPLIT.split(pattern) if token]
+
+
+def compile_matcher(schema=STAT_SCHEMA):
+    """
+    Compile every schema pattern into one trie-shaped regex source. Each pattern
+    ends in an empty group, so match.lastindex identifies the stat. Returns
+    (source, leaves) where leaves maps that group index to
+    (key, type, scope, scope_group, wildcard_groups, bucket_group); scope is 'cpu',
+    'mem_ctrl' or 'system' and the groups are indexes into the match (bucket_group
+    is None for stats without a {bucket}).
+    """
+    trie = {}
+    for category, entries in schema.items():
+        for key, pattern, kind, label in entries:
+            node = trie
+            for token in tokenize(pattern):
+                node = node.setdefault(token, {})
+            if None in node:
+                raise ValueError(f"Duplicate stat pattern {pattern!r} in category {category!r}")
+            node[None] = (key, kind)
+
+    leaves = {}
+    group_count = 0
+
+    def branch_order(token):
+        # Literal components first, placeholders next, the end of a pattern last.
+        return 2 if token is None else 1 if token in PLACEHOLDERS else 0
+
+    def emit(node, captures):
+        nonlocal group_count
+        branches = []
+        for token in sorted(node, key=branch_order):
+            if token is None:
+                group_count += 1
+                key, kind = node[None]
+                scope, scope_group = 'system', None
+                for placeholder, group in captures:
+                    if placeholder in ('{cpu}', '{ctrl}'):
+                        scope, scope_group = ('cpu' if placeholder == '{cpu}' else 'mem_ctrl'), group
+                wildcard_groups = tuple(group for placeholder, group in captures if placeholder == '*')
+                bucket_group = next((group for placeholder, group in captures if placeholder == '{bucket}'), None)
+                leaves[group_count] = (key, kind, scope, scope_group, wildcard_groups, bucket_group)
+                branches.append('()')
+                continue
+
+            child_captures = captures
+            if token in PLACEHOLDERS:
+                regex = PLACEHOLDERS[token]
+                if regex.startswith('('):
+                    group_count += 1
+                    child_captures = captures + [(token, group_count)]
+            else:
+                regex = re.escape(token)
+            branches.append(regex + emit(node[token], child_captures))
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return emit(trie, []), leaves
+
+
+def category_entries(category, schema=STAT_SCHEMA):
+    """
+    Displayed (key, label) pairs of a category, in schema order.
+    """
+    return [(key, label) for key, pattern, kind, label in schema.get(category, []) if label is not None]
+
+
+def per_core_categories(schema=STAT_SCHEMA):
+    """
+    Categories with at least one per-CPU ({cpu}) scalar stat, in schema order.
+    """
+    return [category for category, entries in schema.items()
+            if any('{cpu}' in pattern and kind != 'dist' for key, pattern, kind, label in entries)]
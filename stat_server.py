@@ -0,0 +1,353 @@
+"""
+Local HTTP JSON service over a warm in-memory store of parsed stat files.
+
+serve() loads the stat files found under the given files and directories once,
+as StatsRecords (through the parsed-stats cache when one is given), and answers
+queries from memory:
+
+    GET /runs                          every run: label, path, dump, active CPU
+    GET /runs/<label>                  every stat of one run
+    GET /metric/<name>[?runs=a,b]      one flattened stat (e.g. ipc,
+                                       mem_ctrl_data.0.bw_read) across runs
+    GET /category/<name>[?runs=a,b]    the tables the CLI shows for a category
+
+A watcher polls the files for changes and reparses only new or modified ones.
+Responses are kept, already encoded, in a small LRU cache that is emptied
+whenever the store changes. The server listens on 127.0.0.1 only, rejects
+requests whose Host header is not local, and never opens outbound connections.
+
+asyncio is imported when the server starts, so the CLI does not load it otherwise.
+"""
+import collections
+import json
+import math
+import os
+import urllib.parse
+
+import stat_cache
+import stat_parser
+import stat_sweep
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8350
+RESPONSE_CACHE_SIZE = 256
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def discover_stat_files(paths, pattern=stat_sweep.DEFAULT_PATTERN):
+    """
+    The stat files of the runs under paths, found and labelled as --sweep does
+    (stat_sweep.discover_runs and run_labels), as {label: path}.
+    """
+    file_paths = stat_sweep.discover_runs(paths, pattern)
+    return dict(zip(stat_sweep.run_labels(file_paths), file_paths))
+
+
+def file_signature(file_path):
+    """
+    (size, mtime_ns) of a file, or None if it has gone.
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+def load_records(file_paths, jobs=1, cache_dir=None, cache_size=stat_cache.DEFAULT_MAX_BYTES):
+    """
+    Parse stat files into {path: StatsRecord}. Files that cannot be parsed yet (e.g.
+    a first dump still being written) are left out and retried on the next poll.
+    """
+    if not file_paths:
+        return {}
+    cache = None
+    if cache_dir is not None:
+        cache = stat_cache.StatCache(cache_dir, cache_size, stat_parser.CACHE_VERSION)
+    try:
+        try:
+            return dict(zip(file_paths, stat_parser.parse_many(file_paths, jobs=jobs, cache=cache)))
+        except (ValueError, OSError):
+            records = {}
+            for file_path in file_paths:
+                try:
+                    records[file_path] = stat_parser.parse_many([file_path], cache=cache)[0]
+                except (ValueError, OSError):
+                    pass
+            return records
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+class ResponseCache:
+    """
+    Encoded responses by request target, least recently used dropped first.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        response = self.entries.get(key)
+        if response is not None:
+            self.entries.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        self.entries[key] = response
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def nested_stats(record):
+    """
+    The nested stats dict of a record, as display_statistics takes it.
+    """
+    stats = record.to_dict()
+    stats.setdefault('cpus', {})
+    stats.setdefault('mem_ctrl_data', {})
+    return stats
+
+
+def json_value(value):
+    """
+    A stat value as JSON allows it: NaN and infinities become null.
+    """
+    return None if isinstance(value, float) and not math.isfinite(value) else value
+
+
+class StatStore:
+    """
+    Parsed records of the served files by label, with their nested stats dicts,
+    which category queries render, and the (size, mtime_ns) of each file by path as
+    it was parsed. category_tables(stats_list, labels, category) renders a category
+    as {sheet: (headers, rows)}, as the CLI does.
+    """
+
+    def __init__(self, paths, category_tables, pattern=stat_sweep.DEFAULT_PATTERN, jobs=1, cache_dir=None,
+                 cache_size=stat_cache.DEFAULT_MAX_BYTES):
+        self.paths = paths
+        self.category_tables = category_tables
+        self.pattern = pattern
+        self.jobs = jobs
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.records = {}
+        self.nested = {}
+        self.labels = {}
+        self.signatures = {}
+        self.responses = ResponseCache()
+
+    def find_changes(self):
+        """
+        Discover the served files and parse the new and modified ones. Returns
+        (parsed {path: (signature, record, nested stats)}, served files {label: path}).
+        Reads the store but does not change it, so it can run outside the event loop.
+        """
+        files = discover_stat_files(self.paths, self.pattern)
+        changed = {}
+        for file_path in files.values():
+            signature = file_signature(file_path)
+            if signature is not None and self.signatures.get(file_path) != signature:
+                changed[file_path] = signature
+        records = load_records(list(changed), self.jobs, self.cache_dir, self.cache_size)
+        parsed = {file_path: (signature, records[file_path], nested_stats(records[file_path]))
+                  for file_path, signature in changed.items() if file_path in records}
+        return parsed, files
+
+    def apply_changes(self, parsed, files):
+        """
+        Update the store with the result of find_changes. Runs keep their parsed
+        records when a new or removed run changes their labels. Returns True if the
+        store changed.
+        """
+        loaded = {file_path: (self.records[label], self.nested[label]) for file_path, label in self.labels.items()}
+        for file_path, (signature, record, stats) in parsed.items():
+            loaded[file_path] = (record, stats)
+            self.signatures[file_path] = signature
+        records = {}
+        nested = {}
+        labels = {}
+        for label, file_path in sorted(files.items()):
+            if file_path in loaded:
+                records[label], nested[label] = loaded[file_path]
+                labels[file_path] = label
+        if not parsed and labels == self.labels:
+            return False
+        self.records, self.nested, self.labels = records, nested, labels
+        self.signatures = {file_path: signature for file_path, signature in self.signatures.items()
+                           if file_path in labels}
+        self.responses.clear()
+        return True
+
+    def selected_labels(self, query):
+        """
+        Labels picked by a runs=a,b query parameter (all runs without one).
+        Raises KeyError for an unknown label.
+        """
+        if 'runs' not in query:
+            return list(self.records)
+        labels = [label for value in query['runs'] for label in value.split(',') if label]
+        for label in labels:
+            if label not in self.records:
+                raise KeyError(label)
+        return labels
+
+    def query(self, target):
+        """
+        Answer a GET request target. Returns (status, JSON document).
+        """
+        url = urllib.parse.urlsplit(target)
+        parts = [urllib.parse.unquote(part) for part in url.path.split('/') if part]
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            labels = self.selected_labels(query)
+        except KeyError as e:
+            return 404, {"error": f"unknown run {e.args[0]!r}"}
+
+        if not parts or parts == ["runs"]:
+            return 200, {"runs": [{"label": label, "path": record.path, "dump": record.dump, "cpu": record.cpu,
+                                   "stats": len(record), "distributions": len(record.distributions)}
+                                  for label, record in self.records.items() if label in labels]}
+        resource, name = parts[0], '/'.join(parts[1:])
+        if resource == "runs" and name:
+            record = self.records.get(name)
+            if record is None:
+                return 404, {"error": f"unknown run {name!r}"}
+            return 200, {"label": name, "path": record.path, "dump": record.dump, "cpu": record.cpu,
+                         "stats": {stat: json_value(value) for stat, value in record.items()},
+                         "distributions": {stat: {key: json_value(value)
+                                                  for key, value in distribution.summary_values().items()}
+                                           for stat, distribution in record.distributions.items()}}
+        if resource == "metric" and name:
+            values = {label: self.records[label].get(name) for label in labels}
+            if all(value is None for value in values.values()):
+                return 404, {"error": f"no run has the stat {name!r}"}
+            return 200, {"metric": name, "values": {label: json_value(value) if not hasattr(value, 'summary_values')
+                                                    else value.summary_values() for label, value in values.items()}}
+        if resource == "category" and name:
+            try:
+                tables = self.category_tables([self.nested[label] for label in labels], labels, name)
+            except ValueError as e:
+                return 404, {"error": str(e)}
+            return 200, {"category": name, "runs": labels,
+                         "tables": {sheet_name: {"headers": headers, "rows": rows}
+                                    for sheet_name, (headers, rows) in tables.items()}}
+        return 404, {"error": f"unknown resource {url.path!r}"}
+
+    def response(self, target):
+        """
+        (status, encoded JSON body) for a request target, from the response cache
+        when the store has not changed since it was computed.
+        """
+        response = self.responses.get(target)
+        if response is None:
+            status, document = self.query(target)
+            response = status, json.dumps(document, separators=(',', ':')).encode()
+            if status == 200:
+                self.responses.put(target, response)
+        return response
+
+
+def host_name(host):
+    """
+    A Host header without its port: 'localhost:8350' -> 'localhost', '[::1]:8350' -> '[::1]'.
+    """
+    if host.startswith('['):
+        return host.split(']', 1)[0] + ']'
+    return host.rsplit(':', 1)[0]
+
+
+def http_response(status, body, keep_alive):
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+async def handle_connection(store, reader, writer):
+    """
+    Serve GET requests on one connection until the client closes it or asks to.
+    """
+    import asyncio
+
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+            except ValueError:
+                writer.write(http_response(400, b'{"error":"malformed request"}', False))
+                break
+            keep_alive = version == "HTTP/1.1" and headers.get('connection', '').lower() != 'close'
+            if host_name(headers.get('host', HOST)) not in LOCAL_HOSTS:
+                status, body = 403, b'{"error":"only local clients are served"}'
+            elif method != "GET":
+                status, body = 405, b'{"error":"only GET is supported"}'
+            else:
+                status, body = store.response(target)
+            writer.write(http_response(status, body, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def watch(store, poll_interval):
+    """
+    Reparse new and modified files every poll_interval seconds. Parsing runs in a
+    worker thread so queries are answered meanwhile.
+    """
+    import asyncio
+
+    while True:
+        await asyncio.sleep(poll_interval)
+        parsed, files = await asyncio.to_thread(store.find_changes)
+        if store.apply_changes(parsed, files):
+            print(f"Reloaded {len(parsed)} files; serving {len(store.records)} runs", flush=True)
+
+
+async def run_server(store, port=DEFAULT_PORT, poll_interval=2.0):
+    import asyncio
+
+    store.apply_changes(*await asyncio.to_thread(store.find_changes))
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(store, reader, writer), HOST, port)
+    print(f"Serving {len(store.records)} runs on http://{HOST}:{port}/ (Ctrl-C to stop)", flush=True)
+    async with server:
+        watcher = asyncio.create_task(watch(store, poll_interval))
+        try:
+            await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def serve(paths, category_tables, port=DEFAULT_PORT, poll_interval=2.0, pattern=stat_sweep.DEFAULT_PATTERN, jobs=1,
+          cache_dir=None, cache_size=stat_cache.DEFAULT_MAX_BYTES):
+    """
+    Load the stat files under paths and serve them on 127.0.0.1:port until interrupted.
+    Without a cache_dir every file is parsed at startup.
+    """
+    import asyncio
+
+    store = StatStore(paths, category_tables, pattern, jobs, cache_dir, cache_size)
+    try:
+        asyncio.run(run_server(store, port, poll_interval))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,355 @@
+"""
+Sweep ingestion: run discovery, run labels, configuration metadata and group-by.
+
+A sweep is a tree of gem5 output directories, one per run (.../m5out/stats.txt
+next to config.ini and/or config.json). discover_runs walks the trees with a
+pool of threads, one directory listing per task, and stops descending at the
+first directory holding a stat file, so the checkpoints and traces inside an
+m5out directory are never listed.
+
+Run parameters are read from the run's config.ini, or its config.json when there
+is no config.ini. Both are reduced to flattened '<SimObject path>.<param>' names
+('system.cpu0.dcache.size'), and only the parameters asked for are kept: a named
+key of CONFIG_KEYS (cpu_type, l2_size, dram_type, ...) or a raw parameter name.
+The values label runs and key the groups whose stats group_stats aggregates.
+"""
+import fnmatch
+import json
+import os
+import re
+
+import stat_dist
+import stat_export
+import stat_record
+
+DEFAULT_PATTERN = "stats.txt*"
+DISCOVERY_THREADS = 16
+CONFIG_FILES = ("config.ini", "config.json")
+
+# Sidecar and temporary files that match the pattern but are not stat files.
+IGNORED_SUFFIXES = (".idx", ".tmp")
+
+# Named run parameters: (regexes over flattened config names, tried in order, and
+# how the value is read: the first matching value, a byte size, a clock period in
+# ticks, or the number of distinct matching objects).
+CONFIG_KEYS = {
+    'cpu_type': ((r'system\.(?:\w+\.)*cpu\d*\.type',), 'first'),
+    'num_cpus': ((r'system\.(?:\w+\.)*cpu\d*\.type',), 'count'),
+    'cpu_clock': ((r'system\.cpu_clk_domain\.clock', r'system\.(?:\w+\.)*clk_domain\.clock'), 'clock'),
+    'l1i_size': ((r'system\.(?:\w+\.)*cpu\d*\.icache\.size',), 'size'),
+    'l1d_size': ((r'system\.(?:\w+\.)*cpu\d*\.dcache\.size',), 'size'),
+    'l2_size': ((r'system\.(?:\w+\.)*l2(?:cache)?\d*\.size',), 'size'),
+    'l3_size': ((r'system\.(?:\w+\.)*l3(?:cache)?\d*\.size',), 'size'),
+    'dram_type': ((r'system\.(?:\w+\.)*mem_ctrls?\d*\.dram\.type', r'system\.(?:\w+\.)*mem_ctrls?\d*\.type'),
+                  'first'),
+}
+
+AGGREGATES = ('mean', 'median', 'min', 'max', 'sum')
+
+CONFIG_KEY_SYNTAX = re.compile(r'\w+(?:\.\w+)*')
+
+
+def parse_config_keys(text):
+    """
+    Comma-separated config keys: names of CONFIG_KEYS or raw parameter names such as
+    system.cpu.numROBEntries. Raises ValueError for anything else.
+    """
+    keys = [key.strip() for key in text.split(',') if key.strip()]
+    if not keys:
+        raise ValueError("no config keys given")
+    for key in keys:
+        if key not in CONFIG_KEYS and ('.' not in key or not CONFIG_KEY_SYNTAX.fullmatch(key)):
+            raise ValueError(f"unknown config key {key!r} (choose from {', '.join(CONFIG_KEYS)} "
+                             "or give a parameter name such as system.cpu.numROBEntries)")
+    return keys
+
+
+def scan_directory(path, pattern):
+    """
+    (stat files, subdirectories) of one directory; unreadable directories are empty.
+    """
+    stat_files = []
+    subdirectories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        subdirectories.append(entry.path)
+                    elif fnmatch.fnmatch(entry.name, pattern) and not entry.name.endswith(IGNORED_SUFFIXES):
+                        stat_files.append(entry.path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return sorted(stat_files), subdirectories
+
+
+def discover_runs(roots, pattern=DEFAULT_PATTERN, threads=DISCOVERY_THREADS):
+    """
+    Stat files of the runs under roots: stat files given directly, and the files named
+    pattern under the given directories. A root may also be a glob pattern ('**'
+    recurses). The search does not descend below a directory that holds a stat file.
+    Returns sorted, de-duplicated paths.
+    """
+    import concurrent.futures
+    import glob
+
+    stat_files = set()
+    directories = []
+    for root in roots:
+        for path in (sorted(glob.glob(root, recursive=True)) if glob.has_magic(root) else [root]):
+            if os.path.isdir(path):
+                directories.append(path)
+            else:
+                stat_files.add(path)
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        while directories:
+            next_level = []
+            for found, subdirectories in executor.map(scan_directory, directories,
+                                                      [pattern] * len(directories)):
+                if found:
+                    stat_files.update(found)
+                else:
+                    next_level.extend(subdirectories)
+            directories = next_level
+    return sorted(stat_files)
+
+
+def run_labels(file_paths):
+    """
+    Short unique labels for stat files: their paths relative to the common directory,
+    without 'm5out' components and without the file name when every file has the
+    same one (sweep/l2_1MB/m5out/stats.txt -> 'l2_1MB'). A single file is labelled
+    by its name.
+    """
+    if len(file_paths) <= 1:
+        return [os.path.basename(file_path) for file_path in file_paths]
+    absolute = [os.path.abspath(file_path) for file_path in file_paths]
+    common = os.path.commonpath([os.path.dirname(path) for path in absolute])
+    relative = [os.path.relpath(path, common) for path in absolute]
+    same_name = len({os.path.basename(path) for path in absolute}) == 1
+    labels = []
+    for path in relative:
+        parts = path.split(os.sep)
+        if same_name:
+            parts = parts[:-1]
+        labels.append('/'.join(part for part in parts if part != 'm5out') or os.path.basename(common))
+    return labels if len(set(labels)) == len(labels) else relative
+
+
+def iter_ini_params(file_path, objects, params):
+    """
+    (flattened name, value) of the parameters named in params (e.g. 'size') in the
+    sections of a gem5 config.ini whose names fully match the regex objects.
+    """
+    with open(file_path, encoding='utf-8', errors='replace') as file:
+        text = '\n' + file.read()
+    # The regex engine finds the few sections of interest among hundreds and the wanted
+    # lines inside them; Python only sees those.
+    headers = re.compile(r'\n\[(' + objects + r')\]')
+    lines = re.compile(r'\n(' + '|'.join(map(re.escape, sorted(params))) + r')=([^\n]*)')
+    for header in headers.finditer(text):
+        end = text.find('\n[', header.end())
+        for line in lines.finditer(text, header.end(), end if end >= 0 else len(text)):
+            yield f"{header.group(1)}.{line.group(1)}", line.group(2).strip()
+
+
+def iter_json_params(node, params, path=None):
+    """
+    (flattened name, value) of the parameters named in params in a parsed gem5
+    config.json. Each SimObject carries its own 'path'; lists of scalars are joined
+    with spaces.
+    """
+    path = node.get('path', path)
+    for key, value in node.items():
+        if isinstance(value, dict):
+            yield from iter_json_params(value, params, f"{path}.{key}")
+        elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            for position, item in enumerate(value):
+                yield from iter_json_params(item, params, f"{path}.{key}{position}")
+        elif key in params:
+            yield f"{path}.{key}", ' '.join(map(str, value)) if isinstance(value, list) else str(value)
+
+
+def config_params(run_directory, objects, params):
+    """
+    The parameters named in params of a run directory's config.ini (only in the
+    objects matching the regex objects), or config.json; empty without either.
+    """
+    ini_path, json_path = (os.path.join(run_directory, name) for name in CONFIG_FILES)
+    try:
+        if os.path.exists(ini_path):
+            yield from iter_ini_params(ini_path, objects, params)
+        elif os.path.exists(json_path):
+            with open(json_path, encoding='utf-8') as file:
+                yield from iter_json_params(json.load(file), params)
+    except (OSError, ValueError):
+        return
+
+
+def config_value(text):
+    """
+    A config value as a number if it is one, else the string.
+    """
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def read_run_config(file_path, keys):
+    """
+    {key: value} of the requested config keys for the run of a stat file, read from the
+    config next to it. Keys the config lacks are left out.
+    """
+    # One alternation over the distinct patterns of every key; the group that matched
+    # tells which keys (several may share a pattern) the parameter feeds.
+    uses = {}
+    for key in keys:
+        regexes, how = CONFIG_KEYS.get(key, ((re.escape(key),), 'first'))
+        for rank, regex in enumerate(regexes):
+            uses.setdefault(regex, []).append((key, rank, how))
+    matcher = re.compile('|'.join(f"({regex})" for regex in uses))
+    pattern_uses = list(uses.values())
+    # Every pattern is an object pattern followed by a literal parameter name; other
+    # objects and parameters are skipped before a name is even built.
+    objects = '|'.join(dict.fromkeys(regex.rsplit(r'\.', 1)[0] for regex in uses))
+    params = {regex.rsplit(r'\.', 1)[-1] for regex in uses}
+
+    found = {}
+    counted = {}
+    for name, value in config_params(os.path.dirname(file_path), objects, params):
+        match = matcher.fullmatch(name)
+        if match is None:
+            continue
+        for key, rank, how in pattern_uses[match.lastindex - 1]:
+            if how == 'count':
+                counted.setdefault(key, set()).add(name)
+            elif key not in found or rank < found[key][0]:
+                found[key] = (rank, value)
+
+    config = {}
+    for key in keys:
+        how = CONFIG_KEYS.get(key, ((), 'first'))[1]
+        if how == 'count':
+            if key in counted:
+                config[key] = len(counted[key])
+        elif key in found:
+            config[key] = config_value(found[key][1])
+    return config
+
+
+def format_size(value):
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if value < 1024 or value % 1024:
+            return f"{value:g}{unit}"
+        value //= 1024
+    return f"{value:g}TB"
+
+
+def format_config_value(key, value):
+    """
+    A config value for a label: sizes as 64kB/1MB, clock periods (in 1 ps ticks) as GHz.
+    """
+    how = CONFIG_KEYS.get(key, ((), 'first'))[1]
+    if how == 'size' and isinstance(value, int):
+        return format_size(value)
+    if how == 'clock' and isinstance(value, (int, float)) and value > 0:
+        return f"{1000 / value:g}GHz"
+    return str(value)
+
+
+def config_label(config, keys):
+    return ' '.join(f"{key}={format_config_value(key, config.get(key, 'N/A'))}" for key in keys)
+
+
+def config_labels(configs, keys, labels):
+    """
+    Labels made of the values of keys; runs sharing them keep their own label too.
+    """
+    new_labels = [config_label(config, keys) for config in configs]
+    counts = {}
+    for label in new_labels:
+        counts[label] = counts.get(label, 0) + 1
+    return [label if counts[label] == 1 else f"{label} [{run_label}]"
+            for label, run_label in zip(new_labels, labels)]
+
+
+def sort_key(values):
+    # Numbers before strings, each in natural order, so 64kB sorts before 1MB.
+    return tuple((0, value, '') if isinstance(value, (int, float)) else (1, 0, str(value)) for value in values)
+
+
+def group_runs(configs, keys):
+    """
+    {values of keys: indexes of the runs with them}, in value order. Missing values
+    group under 'N/A'.
+    """
+    groups = {}
+    for index, config in enumerate(configs):
+        groups.setdefault(tuple(config.get(key, 'N/A') for key in keys), []).append(index)
+    return dict(sorted(groups.items(), key=lambda item: sort_key(item[0])))
+
+
+def pool_distributions(distributions):
+    """
+    One Distribution holding the samples of several with the same buckets, or None
+    if their buckets differ. Only the sample count is kept of the summaries; the
+    mean and percentiles then come from the pooled buckets.
+    """
+    labels = distributions[0].labels
+    if any(distribution.labels != labels for distribution in distributions):
+        return None
+    counts = [sum(bucket_counts) for bucket_counts in zip(*(distribution.counts for distribution in distributions))]
+    return stat_dist.Distribution(labels, counts, {'samples': sum(distribution.samples
+                                                                  for distribution in distributions)})
+
+
+def aggregate_function(how):
+    """
+    The function of an AGGREGATES name.
+    """
+    import statistics
+    return {'mean': statistics.fmean, 'median': statistics.median, 'min': min, 'max': max, 'sum': sum}[how]
+
+
+def aggregate_stats(stats_list, how='mean'):
+    """
+    One nested stats dict aggregating the scalar stats of several runs by name with
+    an AGGREGATES function; a stat is aggregated over the runs that have it.
+    Distribution stats with the same buckets in every run are pooled.
+    """
+    values = {}
+    distributions = {}
+    for stats in stats_list:
+        for name, value in stat_export.flatten_stats(stats).items():
+            values.setdefault(name, []).append(value)
+        for name, distribution in stat_dist.flatten_distributions(stats).items():
+            distributions.setdefault(name, []).append(distribution)
+    function = aggregate_function(how)
+    aggregated = {'cpus': {}, 'mem_ctrl_data': {}}
+    for name, run_values in values.items():
+        stat_record.nest(aggregated, *stat_record.split_name(name), function(run_values))
+    for name, run_distributions in distributions.items():
+        pooled = pool_distributions(run_distributions)
+        if pooled is not None:
+            stat_record.nest(aggregated, *stat_record.split_name(name), pooled)
+    return aggregated
+
+
+def group_stats(stats_list, configs, keys, how='mean'):
+    """
+    Aggregate runs grouped by their config values of keys. Returns (group labels,
+    aggregated stats dicts); each label ends with the number of runs in the group.
+    """
+    labels = []
+    aggregated = []
+    for values, indexes in group_runs(configs, keys).items():
+        labels.append(f"{config_label(dict(zip(keys, values)), keys)} (n={len(indexes)})")
+        aggregated.append(aggregate_stats([stats_list[index] for index in indexes], how))
+    return labels, aggregated
@@ -0,0 +1,88 @@
+"""
+Invalidation of the parsed-stats cache and of the sidecar index.
+"""
+import os
+
+import pytest
+
+import stat_cache
+import stat_index
+
+SELECTION = "last"
+RECORD = {"stats": {"ipc": 0.5}}
+
+
+def write_stats(path, middle=b"0.927459"):
+    # Well over the head and tail a sampled digest would read, with the value in the middle.
+    filler = b"system.cpu.filler 1 # Synthetic statistic\n" * 60000
+    path.write_bytes(filler + b"system.cpu.ipc " + middle + b" # IPC\n" + filler)
+
+
+def move_mtime(path, seconds=10):
+    file_stat = os.stat(path)
+    os.utime(path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + seconds * 10 ** 9))
+
+
+@pytest.fixture
+def stat_file(tmp_path):
+    path = tmp_path / "stats.txt"
+    write_stats(path)
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with stat_cache.StatCache(str(tmp_path / "cache")) as cache:
+        yield cache
+
+
+def test_hit_while_unchanged(cache, stat_file):
+    cache.put(str(stat_file), SELECTION, RECORD)
+    assert cache.get(str(stat_file), SELECTION) == RECORD
+    assert cache.get(str(stat_file), "all") is None
+
+
+def test_miss_when_content_changes_at_the_same_size(cache, stat_file):
+    cache.put(str(stat_file), SELECTION, RECORD)
+    write_stats(stat_file, b"0.527459")
+    move_mtime(stat_file)
+    assert cache.get(str(stat_file), SELECTION) is None
+
+
+def test_miss_when_size_changes(cache, stat_file):
+    cache.put(str(stat_file), SELECTION, RECORD)
+    with open(stat_file, "ab") as file:
+        file.write(b"system.cpu.extra 1\n")
+    assert cache.get(str(stat_file), SELECTION) is None
+
+
+def test_touched_file_hits_and_keeps_its_new_mtime(cache, stat_file, monkeypatch):
+    cache.put(str(stat_file), SELECTION, RECORD)
+    move_mtime(stat_file)
+    assert cache.get(str(stat_file), SELECTION) == RECORD
+    # The new mtime was stored, so the next lookup does not hash the file again.
+    monkeypatch.setattr(stat_cache, "file_digest", lambda file_path: pytest.fail("file hashed again"))
+    assert cache.get(str(stat_file), SELECTION) == RECORD
+
+
+def test_other_version_clears_the_cache(tmp_path, stat_file):
+    with stat_cache.StatCache(str(tmp_path / "cache"), version=1) as cache:
+        cache.put(str(stat_file), SELECTION, RECORD)
+    with stat_cache.StatCache(str(tmp_path / "cache"), version=2) as cache:
+        assert cache.get(str(stat_file), SELECTION) is None
+
+
+def test_index_rebuilt_when_content_changes_at_the_same_size(stat_file):
+    stat_index.save_index(str(stat_file), stat_index.build_index(str(stat_file)))
+    assert stat_index.load_index(str(stat_file)) is not None
+    write_stats(stat_file, b"0.527459")
+    move_mtime(stat_file)
+    assert stat_index.load_index(str(stat_file)) is None
+
+
+def test_touched_index_saved_with_its_new_mtime(stat_file, monkeypatch):
+    stat_index.save_index(str(stat_file), stat_index.build_index(str(stat_file)))
+    move_mtime(stat_file)
+    assert stat_index.load_index(str(stat_file)) is not None
+    monkeypatch.setattr(stat_cache, "file_digest", lambda file_path: pytest.fail("file hashed again"))
+    assert stat_index.load_index(str(stat_file)).mtime_ns == os.stat(stat_file).st_mtime_ns
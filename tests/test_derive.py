@@ -0,0 +1,52 @@
+"""
+stat_derive accepts arithmetic over stat names and nothing else of Python.
+"""
+import math
+
+import pytest
+
+import stat_derive
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('true')",
+    "eval('1')",
+    "open('stats.txt')",
+    "getattr(ipc, 'real')",
+    "_divide(1, 0)",
+    "(lambda: 1)()",
+    "(ipc).__class__",
+    "(1).__class__.__bases__",
+    "max(ipc, 1).real",
+    "`system.cpu.ipc`.__class__",
+    "ipc[0]",
+    "[ipc]",
+    "'ipc'",
+    "ipc if cpi else 0",
+    "ipc and cpi",
+    "ipc < cpi",
+    "ipc := 1",
+])
+def test_rejects_python_beyond_arithmetic(expression):
+    with pytest.raises(ValueError):
+        stat_derive.parse_definition(f"x = {expression}")
+
+
+@pytest.mark.parametrize("name", ["__import__", "__builtins__", "__class__.__name__", "_r0"])
+def test_names_are_stat_references(name):
+    metric = stat_derive.parse_definition(f"x = {name}")
+    assert math.isnan(stat_derive.evaluate_stats((metric,), {"ipc": 2.0})["x"])
+    assert stat_derive.evaluate_stats((metric,), {name: 3.0})["x"] == 3.0
+
+
+def test_evaluates_arithmetic_and_functions():
+    metrics = (stat_derive.parse_definition("mpki = cpu*.misses / cpu*.insts * 1000"),
+               stat_derive.parse_definition("capped = coalesce(min(mpki, 10), 0) + sqrt(abs(-4)) ** 2"))
+    stats = {"system.cpu0.misses": 3.0, "system.cpu1.misses": 1.0, "system.cpu0.insts": 1000.0,
+             "system.cpu1.insts": 1000.0}
+    assert stat_derive.evaluate_stats(metrics, stats) == {"mpki": 2.0, "capped": 6.0}
+
+
+def test_undefined_results_are_nan():
+    metric = stat_derive.parse_definition("x = a / b")
+    assert math.isnan(stat_derive.evaluate_stats((metric,), {"a": 0.0, "b": 0.0})["x"])
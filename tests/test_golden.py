@@ -0,0 +1,38 @@
+"""
+The tables of every original category, in every scan mode, against the output of
+the original two-pass parser.
+
+tests/golden/<category>.txt is what the baseline main.py printed for
+tests/data/run_a.txt and run_b.txt (synthetic files from benchmark.py with 2 and 4
+cores), minus a debug line the mem_ctrl_balance report no longer prints.
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+
+ORIGINAL_CATEGORIES = ["cpu", "lsq", "fu", "cache", "bp", "mem_ctrl", "mem_ctrl_balance"]
+RUNS = ["run_a.txt", "run_b.txt"]
+
+
+@pytest.fixture(scope="module")
+def run_dir(tmp_path_factory):
+    # Index scans write a sidecar next to each file, so the files are copied first.
+    directory = tmp_path_factory.mktemp("runs")
+    for run in RUNS:
+        shutil.copy(os.path.join(TESTS_DIR, "data", run), directory)
+    return directory
+
+
+@pytest.mark.parametrize("scan", ["lines", "mmap", "index"])
+@pytest.mark.parametrize("category", ORIGINAL_CATEGORIES)
+def test_tables_match_baseline(run_dir, category, scan):
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, "main.py"), *RUNS, "--category", category,
+                             "--scan", scan, "--no-cache"], cwd=run_dir, capture_output=True, text=True, check=True)
+    with open(os.path.join(TESTS_DIR, "golden", f"{category}.txt")) as file:
+        assert result.stdout == file.read()